@@ -0,0 +1,76 @@
+# Import libraries
+import os
+import sys
+import time
+
+# Make the scraping modules importable
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'mercadona', 'scraping'))
+
+from async_crawler import async_full_scraper
+from http_engine import HttpEngine, product_to_row
+from fake_storefront import start_fake_storefront, synthetic_catalogue
+
+
+
+# Functions
+
+def sequential_crawl(base_url, zip='46001'):
+
+    """
+    Crawl the catalogue with the same requests as the async pipeline (tree, every subcategory and every product), one after the other. Baseline of this benchmark.
+
+    Args:
+        base_url (str): The API root of the fake storefront.
+        zip (str, optional): The postal code. Defaults to '46001'.
+
+    Returns:
+        int: The number of products crawled.
+    """
+
+    engine = HttpEngine(zip, base_url=base_url)
+    rows = []
+    for category in engine.category_tree():
+        for subcategory in category["categories"]:
+            data = engine.get_json(f"/categories/{subcategory['id']}/")
+            for section in data["categories"]:
+                for product in section["products"]:
+                    detail = engine.get_json(f"/products/{product['id']}/")
+                    rows.append(product_to_row(detail, category["name"], subcategory["name"]))
+    engine.close()
+    return len(rows)
+
+def run_benchmark(n_categories=5, n_subcategories=4, n_products=25, latency=0.01, concurrency=None):
+
+    """
+    Compare the throughput of a sequential crawl and the async pipeline against a fake storefront with simulated network latency.
+
+    Args:
+        n_categories, n_subcategories, n_products: The size of the synthetic catalogue. See synthetic_catalogue().
+        latency (float, optional): The latency of every request of the fake storefront, in seconds. Defaults to 0.01.
+        concurrency (dict, optional): The concurrency per stage of the async pipeline. Defaults to its default.
+
+    Returns:
+        dict: The products per second of each crawl and the speedup.
+    """
+
+    server, base_url = start_fake_storefront(synthetic_catalogue(n_categories, n_subcategories, n_products), latency=latency)
+    try:
+        start = time.perf_counter()
+        sequential_products = sequential_crawl(base_url)
+        sequential_seconds = time.perf_counter() - start
+
+        product_info, stats = async_full_scraper('46001', base_url=base_url, concurrency=concurrency)
+    finally:
+        server.shutdown()
+
+    sequential_rate = sequential_products / sequential_seconds
+    async_rate = stats["products"] / stats["seconds"]
+    return {"sequential_products_per_second": sequential_rate, "async_products_per_second": async_rate, "speedup": async_rate / sequential_rate, "failed": stats["failed"]}
+
+
+
+if __name__ == '__main__':
+    results = run_benchmark()
+    print(f"sequential:     {results['sequential_products_per_second']:.1f} products/s")
+    print(f"async pipeline: {results['async_products_per_second']:.1f} products/s")
+    print(f"speedup:        {results['speedup']:.1f}x ({results['failed']} failed requests)")
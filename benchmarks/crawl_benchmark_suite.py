@@ -0,0 +1,408 @@
+# Import libraries
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+# Make the scraping and order history modules importable
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'mercadona', 'scraping'))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'mercadona', 'order_history'))
+
+from fake_storefront import start_fake_storefront, synthetic_catalogue, synthetic_orders
+
+# Throughput of every crawl mode relative to a reference workload run in the same process (see reference_throughput()), recorded with --save-baseline (the committed one has the browser-free modes). Comparing ratios instead of products per second lets the same baseline be checked on faster or slower machines. The suite fails when a mode gets slower than this by more than the threshold, or has no baseline
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'crawl_baseline.json')
+
+# Crawl modes, in the order they run. The ones that drive a browser are skipped when Chrome is not installed
+MODES = ["parsing", "http", "async", "selenium-detail", "selenium-grid", "orders"]
+BROWSER_MODES = ["selenium-detail", "selenium-grid", "orders"]
+
+# Postal code and credentials used against the fake storefront (it accepts any)
+ZIP = '46001'
+USER = 'benchmark@example.com'
+PASSWORD = 'benchmark'
+
+
+
+# Functions
+
+def chrome_available():
+
+    """
+    Check whether Chrome is installed, which the browser modes need.
+
+    Returns:
+        bool: True if chromedriver_autoinstaller finds a Chrome version.
+    """
+
+    try:
+        import chromedriver_autoinstaller
+        return chromedriver_autoinstaller.get_chrome_version() is not None
+    except:
+        return False
+
+def peak_memory_mb():
+
+    """
+    Peak resident memory of the current process (the crawl runs in a process of its own, see run_mode()). The browsers started by Selenium are not included.
+
+    Returns:
+        float: The peak memory in MB, or None where the resource module is not available (Windows).
+    """
+
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    # Linux reports it in KB, macOS in bytes
+    return peak / 2**20 if sys.platform == 'darwin' else peak / 2**10
+
+def point_scrapers_to(site_url):
+
+    """
+    Make the Selenium scrapers and the order history retrieval open the pages of the fake storefront instead of the website. Their URLs are module constants read on every call.
+
+    Args:
+        site_url (str): The root of the fake storefront pages (e.g. "http://127.0.0.1:54321").
+    """
+
+    import scraper
+    import order_history_retrieving
+
+    scraper.MERCADONA_URL = site_url + '/'
+    scraper.CATEGORIES_URL = site_url + '/categories'
+    order_history_retrieving.MERCADONA_URL = site_url + '/'
+    order_history_retrieving.STORE_URL = site_url + '/'
+
+def catalogue_rows(catalogue):
+
+    """
+    Convert every product of a catalogue to a scraped row, to be used as the previous snapshot of a delta crawl.
+
+    Args:
+        catalogue (dict): The catalogue served by the fake storefront.
+
+    Returns:
+        pandas.DataFrame: A row per product listed, with the columns returned by get_product_info() in scraper.py.
+    """
+
+    import pandas as pd
+    from http_engine import product_to_row
+
+    return pd.DataFrame([
+        product_to_row(product, category["name"], subcategory["name"])
+        for category in catalogue["categories"] for subcategory in category["categories"] for section in subcategory["categories"] for product in section["products"]
+    ])
+
+def crawl_engine(engine, retry=3, **kwargs):
+
+    """
+    Scrape every subcategory with an engine, one after the other, restarting it when it gets throttled.
+
+    Args:
+        engine (SeleniumEngine or HttpEngine): The engine.
+        retry (int, optional): The number of attempts per subcategory. Defaults to 3.
+        **kwargs: Extra arguments of get_product_info() (e.g. mode="grid").
+
+    Returns:
+        products (int): The number of products scraped.
+        page_seconds (list): The seconds every subcategory took.
+    """
+
+    products, page_seconds = 0, []
+    for category in engine.get_categories():
+        for subcategory in engine.get_subcategories(category):
+            start = time.perf_counter()
+            for attempt in range(retry):
+                result = engine.get_product_info(category, subcategory, **kwargs)
+                if not isinstance(result, str):
+                    break
+                engine.restart()
+            else:
+                raise RuntimeError(f'"{subcategory}" was throttled {retry} times')
+            page_seconds.append(time.perf_counter() - start)
+            products += result[1]
+    return products, page_seconds
+
+def reference_throughput(catalogue, passes=5):
+
+    """
+    Measure the speed of the host with a workload that uses none of the scraping code: a JSON round trip of every subcategory of the catalogue and a DataFrame of its products built with plain pandas.
+    The baseline stores the throughput of every mode relative to this one, so that it can be checked on faster or slower machines.
+
+    Args:
+        catalogue (dict): The catalogue served.
+        passes (int, optional): The number of times the whole catalogue is processed. Defaults to 5.
+
+    Returns:
+        float: The products processed per second.
+    """
+
+    import pandas as pd
+
+    products = 0
+    start = time.perf_counter()
+    for n in range(passes):
+        for category in catalogue["categories"]:
+            for subcategory in category["categories"]:
+                sections = json.loads(json.dumps(subcategory))["categories"]
+                rows = pd.DataFrame([{**product, "category": category["name"], "subcategory": subcategory["name"]} for section in sections for product in section["products"]])
+                rows.astype(str)
+                products += len(rows)
+    return products / (time.perf_counter() - start)
+
+def crawl(mode, base_url, catalogue):
+
+    """
+    Run a crawl of the fake storefront in one of the modes:
+
+        "parsing":          no requests, only the conversion of every product to a row (product_to_row()) and of every subcategory to a typed DataFrame (typed_products()).
+        "http":             HttpEngine, a subcategory at a time.
+        "async":            the asyncio pipeline of async_crawler.py.
+        "selenium-detail":  SeleniumEngine opening the detail of every product.
+        "selenium-grid":    SeleniumEngine in "grid" mode, with the catalogue itself as the previous snapshot (a delta crawl where nothing changed).
+        "orders":           get_purchase_history() of the orders served.
+
+    Args:
+        mode (str): The crawl mode.
+        base_url (str): The API root of the fake storefront. Its pages are served from the same URL without "/api".
+        catalogue (dict): The catalogue served.
+
+    Returns:
+        products (int): The number of products (order lines in "orders" mode) scraped.
+        page_seconds (list): The seconds every subcategory (order in "orders" mode) took, or their average in "async" and "orders" modes, where they are fetched concurrently or in a single call.
+    """
+
+    site_url = base_url[:-len('/api')]
+
+    if mode == "parsing":
+        from http_engine import product_to_row
+        from output import typed_products
+        import pandas as pd
+
+        products, page_seconds = 0, []
+        for category in catalogue["categories"]:
+            for subcategory in category["categories"]:
+                start = time.perf_counter()
+                rows = [product_to_row(product, category["name"], subcategory["name"]) for section in subcategory["categories"] for product in section["products"]]
+                typed_products(pd.DataFrame(rows))
+                page_seconds.append(time.perf_counter() - start)
+                products += len(rows)
+        return products, page_seconds
+
+    if mode == "http":
+        from http_engine import HttpEngine
+
+        engine = HttpEngine(ZIP, base_url=base_url)
+        try:
+            return crawl_engine(engine)
+        finally:
+            engine.close()
+
+    if mode == "async":
+        from async_crawler import async_full_scraper
+
+        product_info, stats = async_full_scraper(ZIP, base_url=base_url)
+        return stats["products"], [stats["seconds"] / max(stats["subcategories"], 1)] * stats["subcategories"]
+
+    if mode in ("selenium-detail", "selenium-grid"):
+        from scraper import SeleniumEngine, index_known_products
+
+        point_scrapers_to(site_url)
+        engine = SeleniumEngine(ZIP, headless=True)
+        try:
+            if mode == "selenium-grid":
+                return crawl_engine(engine, mode="grid", known_products=index_known_products(catalogue_rows(catalogue)))
+            return crawl_engine(engine, mode="detail")
+        finally:
+            engine.close()
+
+    if mode == "orders":
+        from order_history_retrieving import get_purchase_history
+
+        point_scrapers_to(site_url)
+        start = time.perf_counter()
+        orders = get_purchase_history(ZIP, USER, PASSWORD, headless=True)
+        seconds = time.perf_counter() - start
+        n_orders = orders["order_number"].nunique()
+        return len(orders), [seconds / max(n_orders, 1)] * n_orders
+
+    raise ValueError(f'Unknown crawl mode "{mode}", use one of {", ".join(MODES)}')
+
+def _run_mode(mode, base_url, catalogue, repeat, connection):
+
+    # Run a crawl mode several times in this (child) process, each time right after the reference workload, and send the best run, the best reference and the peak memory to the parent
+    try:
+        best, reference = None, 0
+        for run in range(repeat):
+            reference = max(reference, reference_throughput(catalogue))
+            start = time.perf_counter()
+            products, page_seconds = crawl(mode, base_url, catalogue)
+            seconds = time.perf_counter() - start
+            if best is None or products / seconds > best["products_per_second"]:
+                best = {
+                    "products": products,
+                    "seconds": seconds,
+                    "products_per_second": products / seconds,
+                    "seconds_per_page": sum(page_seconds) / max(len(page_seconds), 1),
+                    "slowest_page_seconds": max(page_seconds, default=0),
+                }
+        best["reference_products_per_second"] = reference
+        best["relative"] = best["products_per_second"] / reference
+        best["peak_memory_mb"] = peak_memory_mb()
+        connection.send(best)
+    except Exception as e:
+        connection.send({"error": f"{type(e).__name__}: {e}"})
+    finally:
+        connection.close()
+
+def run_mode(mode, base_url, catalogue, repeat=3):
+
+    """
+    Run a crawl mode in a new process, so that its peak memory is not mixed with the one of the other modes or of the fake storefront.
+
+    Args:
+        mode (str): The crawl mode, see crawl().
+        base_url (str): The API root of the fake storefront.
+        catalogue (dict): The catalogue served.
+        repeat (int, optional): The number of crawls, the fastest one is kept. Defaults to 3.
+
+    Returns:
+        dict: The "products", "seconds", "products_per_second", "seconds_per_page" (per subcategory, or per order in "orders" mode), "slowest_page_seconds" and "peak_memory_mb" of the fastest crawl, with the fastest run of the reference workload ("reference_products_per_second", see reference_throughput()) and the ratio of both ("relative"), or the "error" that stopped it.
+    """
+
+    context = multiprocessing.get_context('spawn')
+    receiver, sender = context.Pipe(duplex=False)
+    process = context.Process(target=_run_mode, args=(mode, base_url, catalogue, repeat, sender))
+    process.start()
+    sender.close()
+    try:
+        result = receiver.recv()
+    except EOFError:
+        result = {"error": f"the process stopped with exit code {process.exitcode}"}
+    process.join()
+    return result
+
+def run_suite(modes=None, n_categories=5, n_subcategories=4, n_products=25, n_orders=10, repeat=3, latency=0):
+
+    """
+    Serve a synthetic catalogue and orders with the fake storefront and run every crawl mode against it.
+
+    Args:
+        modes (list, optional): The crawl modes to run. Defaults to every mode (MODES), skipping the browser ones if Chrome is not installed.
+        n_categories, n_subcategories, n_products: The size of the catalogue. See synthetic_catalogue(). Defaults to 500 products in 20 subcategories.
+        n_orders (int, optional): The number of orders, of 25 lines each. Defaults to 10.
+        repeat (int, optional): The number of crawls per mode, the fastest one is kept. Defaults to 3.
+        latency (float, optional): The latency of every request of the fake storefront, in seconds. Defaults to 0, which measures the cost of the scraping code itself.
+
+    Returns:
+        dict: The results of every mode (see run_mode()), or {"skipped": reason} for the browser modes without Chrome.
+    """
+
+    modes = modes or MODES
+    browser = chrome_available() if any(mode in BROWSER_MODES for mode in modes) else False
+
+    catalogue = synthetic_catalogue(n_categories, n_subcategories, n_products)
+    server, base_url = start_fake_storefront(catalogue, latency=latency, orders=synthetic_orders(catalogue, n_orders))
+    results = {}
+    try:
+        for mode in modes:
+            if mode in BROWSER_MODES and not browser:
+                results[mode] = {"skipped": "Chrome is not installed"}
+                continue
+            results[mode] = run_mode(mode, base_url, catalogue, repeat=repeat)
+    finally:
+        server.shutdown()
+    return results
+
+def load_baseline(path=BASELINE):
+
+    """
+    Load the throughput recorded for every mode with save_baseline().
+
+    Returns:
+        dict: The baseline of every mode, empty if none was recorded.
+    """
+
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+def save_baseline(results, path=BASELINE):
+
+    """
+    Record the throughput of the modes that ran as the new baseline, keeping the baseline of the modes that did not run.
+    Every mode gets its products per second relative to the reference workload ("relative"), which is what check_regressions() compares, and its products per second on this host for information.
+
+    Args:
+        results (dict): The results of run_suite().
+        path (str, optional): The path of the baseline. Defaults to BASELINE.
+    """
+
+    baseline = load_baseline(path)
+    for mode, result in results.items():
+        if "products_per_second" in result:
+            baseline[mode] = {"relative": round(result["relative"], 4), "products_per_second": round(result["products_per_second"], 1)}
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(baseline, f, indent=4)
+
+def check_regressions(results, baseline, threshold=0.25):
+
+    """
+    Compare the throughput of every mode, relative to the reference workload run with it, with its baseline.
+
+    Args:
+        results (dict): The results of run_suite().
+        baseline (dict): The baseline, see load_baseline().
+        threshold (float, optional): The largest slowdown allowed, as a fraction of the baseline. Defaults to 0.25 (25% fewer products per second than the baseline on a host as fast as this one).
+
+    Returns:
+        list: A message per mode that failed, got slower than allowed or has no baseline to compare with. Empty if there is no regression.
+    """
+
+    regressions = []
+    for mode, result in results.items():
+        if "error" in result:
+            regressions.append(f"{mode}: {result['error']}")
+        elif "products_per_second" in result and "relative" not in baseline.get(mode, {}):
+            regressions.append(f"{mode}: no baseline, record one with --save-baseline")
+        elif "products_per_second" in result:
+            expected = baseline[mode]["relative"] * result["reference_products_per_second"]
+            if result["products_per_second"] < expected * (1 - threshold):
+                regressions.append(f"{mode}: {result['products_per_second']:.1f} products/s, {1 - result['products_per_second'] / expected:.0%} slower than the baseline ({expected:.1f} products/s on this host)")
+    return regressions
+
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark every crawl mode against the fake storefront and fail if any of them got slower than its baseline.")
+    parser.add_argument('--modes', nargs='+', choices=MODES, help="the crawl modes to run (default: all)")
+    parser.add_argument('--repeat', type=int, default=3, help="crawls per mode, the fastest one is kept (default: 3)")
+    parser.add_argument('--threshold', type=float, default=0.25, help="largest slowdown allowed, as a fraction of the baseline (default: 0.25)")
+    parser.add_argument('--latency', type=float, default=0, help="latency of every request of the fake storefront, in seconds (default: 0)")
+    parser.add_argument('--save-baseline', action='store_true', help="record the results as the new baseline")
+    args = parser.parse_args()
+
+    results = run_suite(args.modes, repeat=args.repeat, latency=args.latency)
+    for mode, result in results.items():
+        if "skipped" in result or "error" in result:
+            print(f"{mode:16} {result.get('skipped') or result.get('error')}")
+            continue
+        page = "order" if mode == "orders" else "subcategory"
+        memory = f"{result['peak_memory_mb']:.0f} MB peak" if result["peak_memory_mb"] is not None else "peak memory not available"
+        print(f"{mode:16} {result['products_per_second']:10,.1f} products/s  {result['seconds_per_page'] * 1000:8.1f} ms/{page} (slowest {result['slowest_page_seconds'] * 1000:.1f} ms)  {result['relative']:.3f}x reference  {memory}")
+
+    if args.save_baseline:
+        save_baseline(results)
+        print(f"Baseline saved to {BASELINE}")
+        sys.exit(0)
+
+    regressions = check_regressions(results, load_baseline(), threshold=args.threshold)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    sys.exit(1 if regressions else 0)
@@ -0,0 +1,151 @@
+# Import libraries
+import os
+import random
+import sys
+import time
+
+import pandas as pd
+
+# Make the scraping and order history modules importable
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'mercadona', 'scraping'))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'mercadona', 'order_history'))
+
+from output import typed_products
+from order_history_retrieving import orders_frame
+from date_parsing_benchmark import convert_date_string_legacy
+
+# Spanish weekday and month names used to build delivery dates as the website shows them (e.g. "Jueves 16 de marzo")
+WEEKDAYS = ["Lunes", "Martes", "Miércoles", "Jueves", "Viernes", "Sábado", "Domingo"]
+MONTHS = ["enero", "febrero", "marzo", "abril", "mayo", "junio", "julio", "agosto", "septiembre", "octubre", "noviembre", "diciembre"]
+
+
+
+# Functions
+
+def synthetic_orders(n_orders=2000, lines_per_order=50, n_products=3000, seed=0):
+
+    """
+    Generate the raw scraped content of an order history, as fetch_order() reads it from every order page.
+
+    Returns:
+        list: An (order number, delivery date text, products, units, prices) tuple per order.
+    """
+
+    rng = random.Random(seed)
+    orders = []
+    for n in range(n_orders):
+        date = f"{rng.choice(WEEKDAYS)} {rng.randint(1, 28)} de {rng.choice(MONTHS)}"
+        products = [f"Producto {rng.randrange(n_products)} Hacendado" for line in range(lines_per_order)]
+        units = [rng.randint(1, 6) for line in range(lines_per_order)]
+        prices = [round(rng.uniform(0.5, 30), 2) for line in range(lines_per_order)]
+        orders.append((str(13000000 + n), date, products, units, prices))
+    return orders
+
+def synthetic_subcategories(n_subcategories=2000, products_per_subcategory=50, seed=0):
+
+    """
+    Generate the product rows of every subcategory of a crawl, as get_product_info() builds them.
+
+    Returns:
+        list: A list of rows (dictionaries) per subcategory.
+    """
+
+    rng = random.Random(seed)
+    subcategories = []
+    for s in range(n_subcategories):
+        rows = []
+        for p in range(products_per_subcategory):
+            code = s * products_per_subcategory + p
+            rows.append({
+                "product": f"Producto {code} Hacendado", "product_type": rng.choice(["Botella", "Bote", "Paquete", "Garrafa"]),
+                "product_volume": f"{rng.randint(1, 5)} L", "product_price_per_unit": f"{rng.uniform(0.5, 20):.2f} €/L".replace(".", ","),
+                "product_price": round(rng.uniform(0.5, 30), 2), "product_unit": rng.choice(["ud", "kg", "pack"]),
+                "product_category": f"Categoría {s // 6}", "product_subcategory": f"Subcategoría {s}",
+                "product_url": f"https://tienda.mercadona.es/product/{code}/producto-{code}", "product_code": str(code),
+                "collected_timestamp": pd.Timestamp("2023-03-16 15:10:00"),
+            })
+        subcategories.append(rows)
+    return subcategories
+
+def build_orders_legacy(orders):
+
+    """
+    Build the order history the way get_purchase_history() used to: a DataFrame per order, a row-by-row date conversion and a pd.concat per order. Baseline of this benchmark.
+    """
+
+    pedidos_to_return = pd.DataFrame({})
+    for order_number, date, products, units, prices in orders:
+        order_details_df = pd.DataFrame({"product": products, "units": units, "price": prices})
+        order_details_df = order_details_df.assign(order_number=order_number)
+        order_details_df = order_details_df.assign(fecha=date)
+        order_details_df["fecha"] = order_details_df["fecha"].apply(convert_date_string_legacy)
+        pedidos_to_return = pd.concat([pedidos_to_return, order_details_df], ignore_index=True)
+    return pedidos_to_return
+
+def build_orders(orders):
+
+    """
+    Build the order history the way get_purchase_history() does now: row buffers and a single typed DataFrame (orders_frame()), which converts every date at once.
+    """
+
+    rows = []
+    for order_number, date, products, units, prices in orders:
+        rows.extend({"product": product, "units": unit, "price": price, "order_number": order_number, "fecha": date} for product, unit, price in zip(products, units, prices))
+    return orders_frame(rows)
+
+def build_products_legacy(subcategories):
+
+    """
+    Build the crawl output the way mercadona_full_scraper() used to: a pd.concat per subcategory. Baseline of this benchmark.
+    """
+
+    product_info = pd.DataFrame({})
+    for rows in subcategories:
+        product_info = pd.concat([product_info, pd.DataFrame(rows)], ignore_index=True)
+    return product_info
+
+def build_products(subcategories):
+
+    """
+    Build the crawl output from row buffers at once, with compact dtypes (typed_products()).
+    """
+
+    return typed_products(pd.DataFrame([row for rows in subcategories for row in rows]))
+
+def measure(build, data):
+
+    """
+    Run a build function, measuring its time and the memory of the resulting DataFrame.
+
+    Returns:
+        dict: The number of "rows", the "seconds" it took and the "frame_mb" of the result.
+    """
+
+    start = time.perf_counter()
+    df = build(data)
+    seconds = time.perf_counter() - start
+    return {"rows": len(df), "seconds": seconds, "frame_mb": df.memory_usage(deep=True).sum() / 2**20}
+
+def run_benchmark():
+
+    """
+    Compare the legacy and current ways of building 100,000-row order histories and crawl outputs. The legacy builds are quadratic and take about a minute.
+
+    Returns:
+        dict: The measure() of every build, by name.
+    """
+
+    orders = synthetic_orders()
+    subcategories = synthetic_subcategories()
+    return {
+        "orders (concat per order)": measure(build_orders_legacy, orders),
+        "orders (row buffer, typed)": measure(build_orders, orders),
+        "products (concat per subcategory)": measure(build_products_legacy, subcategories),
+        "products (row buffer, typed)": measure(build_products, subcategories),
+    }
+
+
+
+if __name__ == '__main__':
+    for name, result in run_benchmark().items():
+        print(f"{name:36} {result['rows']} rows  {result['seconds']:6.2f} s  {result['frame_mb']:6.1f} MB")
@@ -0,0 +1,98 @@
+# Import libraries
+import os
+import random
+import sys
+import time
+
+import pandas as pd
+
+# Make the order history functions importable
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'mercadona', 'order_history'))
+
+from order_history_retrieving import months, parse_spanish_dates
+
+# Spanish weekday and month names used to build delivery dates as the website shows them (e.g. "Jueves 16 de marzo")
+WEEKDAYS = ["Lunes", "Martes", "Miércoles", "Jueves", "Viernes", "Sábado", "Domingo"]
+MONTHS = list(months)
+
+
+
+# Functions
+
+def convert_date_string_legacy(date_string):
+
+    """
+    Convert a single date string the way convert_date_string() used to, with split() calls and a hard-coded year. Kept only as the baseline of this benchmark.
+    Dates that do not exist in the hard-coded year (29 February) give NaT instead of raising an error.
+
+    Args:
+        date_string (str): A date string like "Jueves 16 de marzo".
+
+    Returns:
+        pandas.Timestamp: The date.
+    """
+
+    day = int(date_string.split()[1])
+    month_name = date_string.split()[3]
+    month = months[month_name]
+    year = 2022 if (month <= 12 and month >=10) else 2023
+    return pd.to_datetime(f"{year}-{month}-{day}", errors="coerce")
+
+def synthetic_history(n_rows=1_000_000, lines_per_order=50, seed=0):
+
+    """
+    Generate the delivery dates and order numbers of an order history, going back in time from today with an order every few days.
+
+    Returns:
+        dates (pandas.Series): A date string per row, without the year (as the website shows them).
+        order_numbers (pandas.Series): The order number of every row.
+        expected (pandas.Series): The actual date of every row.
+    """
+
+    rng = random.Random(seed)
+    n_orders = n_rows // lines_per_order
+    day = pd.Timestamp.now().normalize()
+    order_dates = []
+    for n in range(n_orders):
+        order_dates.append(day)
+        day -= pd.Timedelta(days=rng.randint(1, 10))
+    order_dates = order_dates[::-1]
+
+    texts = [f"{WEEKDAYS[d.weekday()]} {d.day} de {MONTHS[d.month - 1]}" for d in order_dates]
+    dates = pd.Series([text for text in texts for line in range(lines_per_order)])
+    order_numbers = pd.Series([str(10000000 + n) for n in range(n_orders) for line in range(lines_per_order)])
+    expected = pd.Series([d for d in order_dates for line in range(lines_per_order)])
+    return dates, order_numbers, expected
+
+def run_benchmark(n_rows=1_000_000, apply_rows=100_000):
+
+    """
+    Compare .apply(convert_date_string_legacy) and parse_spanish_dates() on an order history of n_rows.
+    The row-by-row baseline takes several minutes on a million rows, so it only parses the newest apply_rows and its time is scaled to n_rows (it is linear).
+
+    Returns:
+        dict: The seconds each parser took (for n_rows), the speedup and the share of dates each one got right.
+    """
+
+    dates, order_numbers, expected = synthetic_history(n_rows)
+
+    start = time.perf_counter()
+    legacy = dates.tail(apply_rows).apply(convert_date_string_legacy)
+    legacy_seconds = (time.perf_counter() - start) * n_rows / apply_rows
+
+    start = time.perf_counter()
+    parsed = parse_spanish_dates(dates, order_numbers=order_numbers)
+    seconds = time.perf_counter() - start
+
+    return {
+        "apply_seconds": legacy_seconds, "vectorized_seconds": seconds, "speedup": legacy_seconds / seconds,
+        "apply_correct": (legacy == expected.tail(apply_rows)).mean(), "vectorized_correct": (parsed == expected).mean(),
+    }
+
+
+
+if __name__ == '__main__':
+    results = run_benchmark()
+    print(f".apply(convert_date_string): {results['apply_seconds']:.2f} s, {results['apply_correct']:.1%} of the dates right")
+    print(f"parse_spanish_dates():       {results['vectorized_seconds']:.2f} s, {results['vectorized_correct']:.1%} of the dates right")
+    print(f"speedup:                     {results['speedup']:.0f}x")
@@ -0,0 +1,295 @@
+# Import libraries
+import datetime
+import json
+import os
+import random
+import re
+import threading
+import time
+from http.cookies import SimpleCookie
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import storefront_pages
+
+# Recorded catalogue and orders served by default
+FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'catalogue.json')
+ORDERS_FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'orders.json')
+
+# Names of the weekdays and months, as the order pages show the delivery date (e.g. "Sábado 18 de marzo")
+WEEKDAYS = ["Lunes", "Martes", "Miércoles", "Jueves", "Viernes", "Sábado", "Domingo"]
+MONTHS = ["enero", "febrero", "marzo", "abril", "mayo", "junio", "julio", "agosto", "septiembre", "octubre", "noviembre", "diciembre"]
+
+
+
+# Functions
+
+def load_catalogue(path=FIXTURE):
+
+    """
+    Load a recorded catalogue.
+
+    Args:
+        path (str, optional): The path of the JSON catalogue. Defaults to the one in "fixtures".
+
+    Returns:
+        dict: The catalogue, with the "warehouse" and the category tree under "categories". Every subcategory has its "products" grouped in sections under "categories", like the API returns them.
+    """
+
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+def synthetic_catalogue(n_categories=25, n_subcategories=6, n_products=35, seed=0):
+
+    """
+    Generate a catalogue of the size of the real one (about 25 categories, 150 subcategories and 5,000 products) to benchmark the engines.
+
+    Args:
+        n_categories (int, optional): The number of categories. Defaults to 25.
+        n_subcategories (int, optional): The number of subcategories per category. Defaults to 6.
+        n_products (int, optional): The number of products per subcategory. Defaults to 35.
+        seed (int, optional): The seed of the random prices. Defaults to 0.
+
+    Returns:
+        dict: The catalogue, with the same structure as load_catalogue().
+    """
+
+    rng = random.Random(seed)
+    categories = []
+    product_id = 1000
+    for c in range(n_categories):
+        subcategories = []
+        for s in range(n_subcategories):
+            products = []
+            for p in range(n_products):
+                product_id += 1
+                unit_price = round(rng.uniform(0.5, 20), 2)
+                products.append({
+                    "id": str(product_id),
+                    "display_name": f"Producto {product_id} Hacendado",
+                    "packaging": rng.choice(["Botella", "Bote", "Paquete", "Garrafa"]),
+                    "share_url": f"https://tienda.mercadona.es/product/{product_id}/producto-{product_id}-hacendado",
+                    "price_instructions": {"unit_price": f"{unit_price:.2f}", "unit_size": 1.0, "size_format": "kg", "reference_price": f"{unit_price:.2f}", "reference_format": "kg", "is_pack": False, "selling_method": 0},
+                })
+            subcategories.append({"id": (c + 1) * 100 + s, "name": f"Subcategoría {c + 1}.{s + 1}", "categories": [{"id": ((c + 1) * 100 + s) * 10, "name": "Sección", "products": products}]})
+        categories.append({"id": c + 1, "name": f"Categoría {c + 1}", "categories": subcategories})
+    return {"warehouse": "fake1", "categories": categories}
+
+def load_orders(path=ORDERS_FIXTURE):
+
+    """
+    Load recorded orders.
+
+    Args:
+        path (str, optional): The path of the JSON orders. Defaults to the ones in "fixtures".
+
+    Returns:
+        list: The orders, newest first, each one with its "order_number", delivery "date" (as shown) and "lines" (the "product" name, "units" and "price" of every line).
+    """
+
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+def synthetic_orders(catalogue, n_orders=20, n_lines=25, seed=0):
+
+    """
+    Generate weekly orders of products of a catalogue, to benchmark the order history retrieval.
+
+    Args:
+        catalogue (dict): The catalogue the products are taken from.
+        n_orders (int, optional): The number of orders. Defaults to 20.
+        n_lines (int, optional): The number of lines per order. Defaults to 25.
+        seed (int, optional): The seed of the random products and units. Defaults to 0.
+
+    Returns:
+        list: The orders, with the same structure as load_orders().
+    """
+
+    rng = random.Random(seed)
+    products = [product for category in catalogue["categories"] for subcategory in category["categories"] for section in subcategory["categories"] for product in section["products"]]
+
+    # Order numbers grow with time, the newest order is delivered on 2023-03-18 and the previous ones a week apart
+    orders = []
+    order_number = 13996475
+    delivery = datetime.date(2023, 3, 18)
+    for n in range(n_orders):
+        lines = []
+        for product in rng.sample(products, min(n_lines, len(products))):
+            units = rng.choice([1, 1, 1, 2, 3])
+            lines.append({"product": product["display_name"], "units": units, "price": round(units * float(product["price_instructions"]["unit_price"]), 2)})
+        orders.append({"order_number": str(order_number), "date": f"{WEEKDAYS[delivery.weekday()]} {delivery.day} de {MONTHS[delivery.month - 1]}", "lines": lines})
+        order_number -= rng.randint(50000, 150000)
+        delivery -= datetime.timedelta(days=7)
+    return orders
+
+def start_fake_storefront(catalogue=None, port=0, throttle_every=None, latency=0, orders=None):
+
+    """
+    Serve a catalogue on localhost with the same JSON endpoints that HttpEngine uses and the same pages (and selectors) that the Selenium scrapers read, so that they can be run and benchmarked offline.
+
+    JSON endpoints:
+        PUT /api/postal-codes/actions/change-pc/    sets the postal code, answers the warehouse in the "x-customer-wh" header.
+        GET /api/categories/                        the category tree (without products).
+        GET /api/categories/<id>/                   a subcategory with its products.
+        GET /api/products/<id>/                     a single product.
+
+    Pages (see storefront_pages.py), served from the root of the same server:
+        GET /                                       the landing page, with the postal code form, the cookie banner and the user menu ("/?authenticate-user=" shows the login form).
+        GET /categories, /categories/<id>           the category menu and the product grid of a subcategory (the first one by default). Clicking a product opens its detail and changes the URL to /product/<id>/<slug>, driver.back() closes it.
+        GET /user-area/orders                       the list of orders ("Mis pedidos"), once logged in.
+        GET /user-area/orders/<number>              the products of an order.
+
+    Args:
+        catalogue (dict, optional): The catalogue to serve. Defaults to the recorded one (load_catalogue()).
+        port (int, optional): The port to listen on, 0 picks a free one. Defaults to 0.
+        throttle_every (int, optional): If set, every n-th request to the JSON endpoints or for a product detail is throttled: the JSON endpoints answer HTTP 429 and the product detail shows the "Entendido" dialog, like a throttled crawl. Defaults to None.
+        latency (float, optional): Seconds every GET request waits before being answered, to simulate the network. Defaults to 0.
+        orders (list, optional): The orders of the logged in user. Defaults to the recorded ones (load_orders()).
+
+    Returns:
+        server (ThreadingHTTPServer): The running server, stop it with server.shutdown().
+        base_url (str): The API root to pass to HttpEngine (e.g. "http://127.0.0.1:54321/api"). The pages are served from the same URL without "/api".
+    """
+
+    catalogue = catalogue or load_catalogue()
+    orders = orders if orders is not None else load_orders()
+    orders_by_number = {order["order_number"]: order for order in orders}
+
+    # Index subcategories and products by id, with the category of every subcategory and the first subcategory that lists every product
+    subcategories = {}
+    parents = {}
+    products = {}
+    listed_in = {}
+    for category in catalogue["categories"]:
+        for subcategory in category["categories"]:
+            subcategories[str(subcategory["id"])] = subcategory
+            parents[str(subcategory["id"])] = category
+            for section in subcategory["categories"]:
+                for product in section["products"]:
+                    products[str(product["id"])] = product
+                    listed_in.setdefault(str(product["id"]), (category, subcategory))
+
+    # Category tree without products, as /categories/ returns it
+    tree = {"count": len(catalogue["categories"]), "results": [
+        {"id": c["id"], "name": c["name"], "categories": [{"id": s["id"], "name": s["name"]} for s in c["categories"]]}
+        for c in catalogue["categories"]
+    ]}
+
+    # Subcategory displayed by the categories page when none is given
+    first_subcategory = str(catalogue["categories"][0]["categories"][0]["id"])
+
+    counter = {"requests": 0}
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+
+        protocol_version = 'HTTP/1.1'
+        disable_nagle_algorithm = True
+
+        def log_message(self, *args):
+            pass
+
+        def send_body(self, body, content_type, status=200, headers=None):
+            body = body.encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def send_json(self, data, status=200, headers=None):
+            self.send_body(json.dumps(data, ensure_ascii=False), 'application/json', status=status, headers=headers)
+
+        def send_html(self, html, status=200):
+            self.send_body(html, 'text/html; charset=utf-8', status=status)
+
+        def cookies(self):
+            cookies = SimpleCookie(self.headers.get('Cookie', ''))
+            return {key: morsel.value for key, morsel in cookies.items()}
+
+        def throttled(self):
+            with lock:
+                counter["requests"] += 1
+                return throttle_every is not None and counter["requests"] % throttle_every == 0
+
+        def do_PUT(self):
+            self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            if self.path.startswith('/api/postal-codes/actions/change-pc/'):
+                self.send_json({}, headers={'x-customer-wh': catalogue["warehouse"]})
+            else:
+                self.send_json({"detail": "Not found"}, status=404)
+
+        def do_GET(self):
+            url = urlsplit(self.path)
+            path = url.path
+            time.sleep(latency)
+            if path.startswith('/api/'):
+                self.get_api(path)
+            else:
+                self.get_page(path, url.query)
+
+        def get_api(self, path):
+            if self.throttled():
+                self.send_json({"detail": "Too many requests"}, status=429)
+            elif path == '/api/categories/':
+                self.send_json(tree)
+            elif re.fullmatch(r'/api/categories/\d+/', path) and path.split('/')[3] in subcategories:
+                self.send_json(subcategories[path.split('/')[3]])
+            elif re.fullmatch(r'/api/products/\d+/', path) and path.split('/')[3] in products:
+                self.send_json(products[path.split('/')[3]])
+            else:
+                self.send_json({"detail": "Not found"}, status=404)
+
+        def get_page(self, path, query):
+            cookies = self.cookies()
+            accepted = "cookies_accepted" in cookies
+            categories_path = re.fullmatch(r'/(?:fragments/)?categories(?:/(\d+))?', path)
+            key = (categories_path.group(1) or first_subcategory) if categories_path else None
+            if path == '/':
+                self.send_html(storefront_pages.landing_page(cookies.get("postal_code"), authenticate="authenticate-user" in parse_qs(query, keep_blank_values=True), cookies_accepted=accepted))
+
+            # Categories page (the first subcategory by default) and the grid of a subcategory, loaded when it is clicked
+            elif key in subcategories:
+                if path.startswith('/fragments/'):
+                    self.send_html(storefront_pages.product_grid(parents[key], subcategories[key]))
+                else:
+                    self.send_html(storefront_pages.categories_page(catalogue, parents[key], subcategories[key], cookies_accepted=accepted))
+
+            # Product detail, displayed in the subcategory it was clicked from
+            elif re.fullmatch(r'/fragments/products/\d+', path) and path.split('/')[3] in products:
+                product_id = path.split('/')[3]
+                category, subcategory = listed_in[product_id]
+                key = parse_qs(query).get("subcategory", [None])[0]
+                if key in subcategories:
+                    category, subcategory = parents[key], subcategories[key]
+                self.send_html(storefront_pages.product_detail(products[product_id], category, subcategory, throttled=self.throttled()))
+
+            # Order pages, only once logged in
+            elif path.startswith('/user-area/') and "session" not in cookies:
+                self.send_response(302)
+                self.send_header('Location', '/?authenticate-user=')
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+            elif path == '/user-area/orders':
+                self.send_html(storefront_pages.orders_page(orders, cookies_accepted=accepted))
+            elif re.fullmatch(r'/user-area/orders/\d+', path) and path.split('/')[3] in orders_by_number:
+                self.send_html(storefront_pages.order_page(orders_by_number[path.split('/')[3]], cookies_accepted=accepted))
+            else:
+                self.send_html(storefront_pages.page("Página no encontrada", "<h1>Página no encontrada</h1>", cookies_accepted=True), status=404)
+
+    server = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/api"
+
+
+
+if __name__ == '__main__':
+    server, base_url = start_fake_storefront()
+    print(f"Serving the recorded catalogue at {base_url} and its pages at {base_url[:-len('/api')]}/ (Ctrl+C to stop)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,78 @@
+# Import libraries
+import json
+import os
+import subprocess
+import sys
+
+# Folders of the modules measured
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'mercadona')
+MODULES = {
+    "order_history_retrieving": os.path.join(ROOT, 'order_history'),
+    "scraper": os.path.join(ROOT, 'scraping'),
+}
+
+# Modules that must not be imported as a side effect of importing each module
+FORBIDDEN = {
+    "order_history_retrieving": ["selenium", "chromedriver_autoinstaller", "dotenv"],
+    "scraper": ["chromedriver_autoinstaller", "dotenv"],
+}
+
+# Maximum import time of each module, in seconds
+THRESHOLDS = {"order_history_retrieving": 2.0, "scraper": 4.0}
+
+# Script run in a fresh interpreter, so that nothing is already imported
+PROBE = """
+import json, sys, time
+sys.path.insert(0, {path!r})
+start = time.perf_counter()
+import {module}
+seconds = time.perf_counter() - start
+print(json.dumps({{"seconds": seconds, "loaded": [m for m in {forbidden!r} if m in sys.modules]}}))
+"""
+
+
+
+# Functions
+
+def measure_import(module, repeat=3):
+
+    """
+    Import a module in a fresh interpreter and record the time it takes and the forbidden modules it loads.
+
+    Args:
+        module (str): The module to import, one of MODULES.
+        repeat (int, optional): The number of imports measured, the fastest one is kept. Defaults to 3.
+
+    Returns:
+        dict: The import time in "seconds" and the forbidden modules "loaded".
+    """
+
+    results = []
+    for _ in range(repeat):
+        probe = PROBE.format(path=os.path.abspath(MODULES[module]), module=module, forbidden=FORBIDDEN[module])
+        output = subprocess.run([sys.executable, '-c', probe], capture_output=True, text=True, check=True).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+    return min(results, key=lambda result: result["seconds"])
+
+def run_benchmark():
+
+    """
+    Measure the import time of every module and check that importing it has no browser side effects.
+
+    Returns:
+        dict: The result of measure_import() of every module.
+    """
+
+    results = {}
+    for module in MODULES:
+        result = measure_import(module)
+        assert not result["loaded"], f"Importing {module} loads {', '.join(result['loaded'])}"
+        assert result["seconds"] < THRESHOLDS[module], f"Importing {module} took {result['seconds']:.2f}s (limit {THRESHOLDS[module]}s)"
+        results[module] = result
+    return results
+
+
+
+if __name__ == '__main__':
+    for module, result in run_benchmark().items():
+        print(f"{module}: {result['seconds'] * 1000:.0f} ms, no browser side effects")
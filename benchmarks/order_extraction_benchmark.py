@@ -0,0 +1,161 @@
+# Import libraries
+import os
+import sys
+import time
+
+# Make the order history functions importable
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'mercadona', 'order_history'))
+
+from selenium import webdriver
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.chrome.options import Options
+
+import order_history_retrieving
+from order_history_retrieving import fetch_order
+from fake_storefront import start_fake_storefront, synthetic_catalogue, synthetic_orders
+
+
+
+# Functions
+
+def fetch_order_legacy(driver, order_number):
+
+    """
+    Scrape an order with one wait per column and one .text call per element, the way fetch_order() used to do it. Kept only as the baseline of this benchmark.
+
+    Args:
+        driver (selenium.webdriver.Chrome): A logged in driver.
+        order_number (str): The number of the order.
+
+    Returns:
+        list: A dictionary per product of the order.
+    """
+
+    driver.get(f"{order_history_retrieving.STORE_URL}user-area/orders/{order_number}?products")
+    columns = {}
+    for name, selector in [
+        ("product", 'p[class="order-product-cell__name subhead1-r"]'),
+        ("units", 'span[class="order-product-cell__prepared-units subhead1-r"]'),
+        ("price", 'p[class="order-product-cell__price subhead1-r"]'),
+        ("fecha", 'span[class="body1-b"]'),
+    ]:
+        elements = WebDriverWait(driver, 10).until(EC.visibility_of_all_elements_located((By.CSS_SELECTOR, selector)))
+        columns[name] = [element.text for element in elements]
+    return [
+        {"product": product, "units": int(units.split(' ')[0]), "price": float(price.split(' ')[0].replace(',','.')), "order_number": order_number, "fecha": columns["fecha"][0]}
+        for product, units, price in zip(columns["product"], columns["units"], columns["price"])
+    ]
+
+def logged_in_driver(site_url, headless=True):
+
+    """
+    Start Chrome with the session cookie of the fake storefront, as if logged in (the order pages are only served with it).
+
+    Args:
+        site_url (str): The address of the fake storefront, without the trailing "/".
+        headless (bool, optional): Whether to run Chrome in headless mode. Defaults to True.
+
+    Returns:
+        selenium.webdriver.Chrome: The driver.
+    """
+
+    options = Options()
+    if headless:
+        options.add_argument('--headless')
+    driver = webdriver.Chrome(options=options)
+    driver.get(site_url + '/')
+    driver.add_cookie({"name": "session", "value": "benchmark"})
+    return driver
+
+def check_order_dates(headless=True):
+
+    """
+    Check that fetch_order() reads every line and the delivery date of every order, like fetch_order_legacy().
+
+    Args:
+        headless (bool, optional): Whether to run Chrome in headless mode. Defaults to True.
+
+    Raises:
+        AssertionError: If a check fails.
+    """
+
+    catalogue = synthetic_catalogue(n_categories=2, n_subcategories=2, n_products=5)
+    orders = synthetic_orders(catalogue, n_orders=3, n_lines=5)
+    server, base_url = start_fake_storefront(catalogue, orders=orders)
+    site_url = base_url[:-len('/api')]
+    order_history_retrieving.STORE_URL = site_url + '/'
+    driver = logged_in_driver(site_url, headless=headless)
+
+    try:
+        for order in orders:
+            rows = fetch_order(driver, order["order_number"])
+            assert len(rows) == len(order["lines"]) and all(row["fecha"] == order["date"] for row in rows), f'Wrong lines or date in order {order["order_number"]}'
+            assert rows == fetch_order_legacy(driver, order["order_number"]), f'Different rows than the legacy extractor in order {order["order_number"]}'
+    finally:
+        driver.quit()
+        server.shutdown()
+
+def time_fetcher(driver, fetcher, order_numbers):
+
+    """
+    Measure the average time a fetcher takes to scrape an order.
+
+    Args:
+        driver (selenium.webdriver.Chrome): A logged in driver.
+        fetcher (callable): The fetch function to measure.
+        order_numbers (list): The orders to fetch.
+
+    Returns:
+        float: The average latency per order, in milliseconds.
+    """
+
+    # Warm up once so that the first order does not count
+    fetcher(driver, order_numbers[0])
+
+    start = time.perf_counter()
+    for order_number in order_numbers:
+        fetcher(driver, order_number)
+    return (time.perf_counter() - start) / len(order_numbers) * 1000
+
+def run_benchmark(n_orders=10, n_lines=60, headless=True):
+
+    """
+    Compare the per-order latency of the old (one wait and one call per element) and the bulk (single execute_script) order extractors on orders served by the fake storefront.
+
+    Args:
+        n_orders (int, optional): The number of orders to fetch. Defaults to 10.
+        n_lines (int, optional): The number of lines per order. Defaults to 60.
+        headless (bool, optional): Whether to run Chrome in headless mode. Defaults to True.
+
+    Returns:
+        dict: The average latency in milliseconds of each extractor and the speedup.
+    """
+
+    catalogue = synthetic_catalogue(n_categories=5, n_subcategories=4, n_products=25)
+    orders = synthetic_orders(catalogue, n_orders=n_orders, n_lines=n_lines)
+    server, base_url = start_fake_storefront(catalogue, orders=orders)
+    site_url = base_url[:-len('/api')]
+    order_history_retrieving.STORE_URL = site_url + '/'
+
+    driver = logged_in_driver(site_url, headless=headless)
+
+    try:
+        order_numbers = [order["order_number"] for order in orders]
+        legacy = time_fetcher(driver, fetch_order_legacy, order_numbers)
+        bulk = time_fetcher(driver, fetch_order, order_numbers)
+    finally:
+        driver.quit()
+        server.shutdown()
+
+    return {"legacy_ms": legacy, "bulk_ms": bulk, "speedup": legacy / bulk}
+
+
+
+if __name__ == '__main__':
+    check_order_dates()
+    results = run_benchmark()
+    print(f"wait and .text per element: {results['legacy_ms']:.1f} ms/order")
+    print(f"single execute_script:      {results['bulk_ms']:.1f} ms/order")
+    print(f"speedup:                    {results['speedup']:.1f}x")
@@ -0,0 +1,63 @@
+# Import libraries
+import os
+import sys
+import time
+
+import pandas as pd
+
+# Make the scraping modules importable
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'mercadona', 'scraping'))
+
+from price_alerts import PriceChangeDetector
+from snapshot_store_benchmark import daily_snapshots
+
+
+
+# Functions
+
+def check_zero_price():
+
+    """
+    Check that a product whose previous price is 0 (e.g. a placeholder row) emits its price change without a percentage instead of stopping the crawl.
+
+    Raises:
+        AssertionError: If a check fails.
+    """
+
+    previous = pd.DataFrame({"product_code": ["1", "2"], "product_price": [0.0, 2.0], "product_price_per_unit": ["", ""]})
+    detector = PriceChangeDetector.from_snapshot(previous, min_change_pct=5)
+    events = detector.check(pd.DataFrame({"product_code": ["1", "2"], "product_price": [1.5, 2.05], "product_price_per_unit": ["", ""]}))
+    assert len(events) == 1 and events[0]["product_code"] == "1" and events[0]["event"] == "increase"
+    assert events[0]["delta"] == 1.5 and events[0]["delta_pct"] is None
+
+def run_benchmark(days=30, products_per_subcategory=50):
+
+    """
+    Check a month of daily crawls of a 5,000 product catalogue (2% of the prices change every day) with a PriceChangeDetector, a subcategory at a time as the scrapers do.
+
+    Returns:
+        dict: The rows checked, the events emitted, the rows checked per second and the size of the index in bytes.
+    """
+
+    snapshots = daily_snapshots(days + 1)
+    events = []
+    detector = PriceChangeDetector.from_snapshot(next(snapshots), sinks=events.append)
+
+    rows, seconds = 0, 0
+    for products in snapshots:
+        start = time.perf_counter()
+        for first in range(0, len(products), products_per_subcategory):
+            detector.check(products.iloc[first:first + products_per_subcategory])
+        seconds += time.perf_counter() - start
+        rows += len(products)
+
+    index_bytes = sys.getsizeof(detector.positions) + sum(sys.getsizeof(code) for code in detector.positions) + detector.prices.itemsize * len(detector.prices) * 2
+    return {"rows": rows, "events": len(events), "rows_per_second": rows / seconds, "index_bytes": index_bytes}
+
+
+
+if __name__ == '__main__':
+    check_zero_price()
+    results = run_benchmark()
+    print(f"{results['rows']} rows checked, {results['events']} price changes, {results['rows_per_second']:,.0f} rows/s")
+    print(f"index of the catalogue: {results['index_bytes'] / 2**10:.0f} KB")
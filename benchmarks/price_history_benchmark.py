@@ -0,0 +1,113 @@
+# Import libraries
+import os
+import random
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+# Make the scraping modules importable
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'mercadona', 'scraping'))
+
+from price_history import PriceHistory
+from snapshot_store_benchmark import daily_snapshots
+
+
+
+# Functions
+
+def lookup_long_frame(products, code, when):
+
+    """
+    Look up the price of a product at a point in time in a DataFrame with every row of every snapshot. Baseline of this benchmark.
+    """
+
+    rows = products[(products["product_code"] == code) & (products["collected_timestamp"] <= when)]
+    return rows["product_price"].iloc[-1] if len(rows) else None
+
+def check_out_of_order():
+
+    """
+    Check that observations added out of time order give the same history as in order, and that an older observation inside a run of another price is rejected instead of splitting the run.
+
+    Raises:
+        AssertionError: If a check fails.
+    """
+
+    days = pd.date_range("2023-01-01", periods=10)
+    prices = [1.0] * 5 + [1.2] * 5
+
+    # The second half first, then the first half, as if an older scraping output was added later
+    in_order = PriceHistory()
+    in_order.add_observations(["1"] * 10, days, prices)
+    out_of_order = PriceHistory()
+    out_of_order.add_observations(["1"] * 5, days[5:], prices[5:])
+    out_of_order.add_observations(["1"] * 5, days[:5], prices[:5])
+    assert (in_order.timestamps == out_of_order.timestamps).all() and (in_order.prices == out_of_order.prices).all() and (in_order.run_ends == out_of_order.run_ends).all()
+
+    # 2.0 observed inside the run of 1.0 (observed every day from 2023-01-01 to 2023-01-05) can not be placed
+    try:
+        in_order.add_observations(["1"], ["2023-01-03 12:00"], [2.0])
+        raise AssertionError("An observation inside a run of another price was not rejected")
+    except ValueError:
+        pass
+    assert in_order.price_at("1", "2023-01-04")["price"] == 1.0
+    assert in_order.price_at("1", "2023-01-07")["price"] == 1.2
+
+def run_benchmark(days=365, lookups=1000, seed=0):
+
+    """
+    Build the price history of a year of daily snapshots of a 5,000 product catalogue (2% of the prices change every day) and compare it with keeping every snapshot row.
+
+    Returns:
+        dict: The rows and change points stored, the size on disk of both, the time to build, save and load the history, and the time of point lookups in both.
+    """
+
+    rng = random.Random(seed)
+    snapshots = list(daily_snapshots(days))
+    products = pd.concat(snapshots, ignore_index=True)
+    queries = [(str(rng.randrange(5000)), pd.Timestamp("2023-03-16") + pd.Timedelta(days=rng.randrange(days))) for lookup in range(lookups)]
+
+    results = {"snapshot_rows": len(products)}
+    start = time.perf_counter()
+    history = PriceHistory()
+    history.add_snapshots(snapshots)
+    results["build_seconds"] = time.perf_counter() - start
+    results["change_points"] = len(history)
+
+    with tempfile.TemporaryDirectory() as folder:
+        products.to_csv(os.path.join(folder, "snapshots.csv"), sep='~', index=False)
+        history.save(os.path.join(folder, "price_history.npz"))
+        results["csv_mb"] = os.path.getsize(os.path.join(folder, "snapshots.csv")) / 2**20
+        results["history_mb"] = os.path.getsize(os.path.join(folder, "price_history.npz")) / 2**20
+
+        start = time.perf_counter()
+        history = PriceHistory.load(os.path.join(folder, "price_history.npz"))
+        results["load_seconds"] = time.perf_counter() - start
+
+    # Point lookups, one by one and all at once
+    start = time.perf_counter()
+    for code, when in queries:
+        lookup_long_frame(products, code, when)
+    results["frame_lookup_ms"] = (time.perf_counter() - start) / lookups * 1000
+
+    start = time.perf_counter()
+    for code, when in queries:
+        history.price_at(code, when)
+    results["history_lookup_ms"] = (time.perf_counter() - start) / lookups * 1000
+
+    start = time.perf_counter()
+    history.prices_at(queries[0][1])
+    results["catalogue_lookup_ms"] = (time.perf_counter() - start) * 1000
+    return results
+
+
+
+if __name__ == '__main__':
+    check_out_of_order()
+    results = run_benchmark()
+    print(f"{results['snapshot_rows']} snapshot rows -> {results['change_points']} change points ({results['csv_mb']:.1f} MB of CSV -> {results['history_mb']:.2f} MB)")
+    print(f"build: {results['build_seconds']:.2f} s, load: {results['load_seconds'] * 1000:.1f} ms")
+    print(f"price of a product on a date: {results['frame_lookup_ms']:.2f} ms in the snapshot rows, {results['history_lookup_ms']:.3f} ms in the history")
+    print(f"price of the whole catalogue on a date: {results['catalogue_lookup_ms']:.1f} ms")
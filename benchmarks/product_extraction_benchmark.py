@@ -0,0 +1,109 @@
+# Import libraries
+import os
+import sys
+import time
+
+# Make the scraping functions importable
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'mercadona', 'scraping'))
+
+from selenium import webdriver
+from selenium.webdriver.common.by import By
+from selenium.webdriver.chrome.options import Options
+
+from scraper import extract_product_detail
+
+# Recorded product detail with the same selectors as the website
+FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'product_detail.html')
+
+
+
+# Functions
+
+def extract_product_detail_legacy(driver):
+
+    """
+    Scrape the product detail with one find_element call per field, the way get_product_info() used to do it. Kept only as the baseline of this benchmark.
+
+    Args:
+        driver (selenium.webdriver.Chrome): A driver with a product detail open.
+
+    Returns:
+        dict: The scraped product information.
+    """
+
+    info_prod = {}
+    fields = [
+        ("product", 'h1.title2-r.private-product-detail__description'),
+        ("product_type", 'span.headline1-r:nth-child(1)'),
+        ("product_volume", 'span.headline1-r:nth-child(2)'),
+        ("product_price_per_unit", 'span.headline1-r:nth-child(3)'),
+        ("product_price", 'p.product-price__unit-price.large-b'),
+        ("product_unit", 'p.product-price__extra-price.title1-r'),
+        ("product_category", 'span.subhead1-r'),
+        ("product_subcategory", 'span.subhead1-sb'),
+    ]
+    for name, selector in fields:
+        try:
+            info_prod[name] = driver.find_element(By.CSS_SELECTOR, selector).text
+        except:
+            info_prod[name] = "Not available"
+    info_prod["product_url"] = driver.current_url
+    info_prod["product_code"] = driver.current_url.split("/")[4]
+    return info_prod
+
+def time_extractor(driver, extractor, repetitions):
+
+    """
+    Measure the average time an extractor takes to scrape the open product detail.
+
+    Args:
+        driver (selenium.webdriver.Chrome): A driver with a product detail open.
+        extractor (callable): The extraction function to measure.
+        repetitions (int): The number of times to run the extractor.
+
+    Returns:
+        float: The average latency per product, in milliseconds.
+    """
+
+    # Warm up once so that the first call does not count
+    extractor(driver)
+
+    start = time.perf_counter()
+    for _ in range(repetitions):
+        extractor(driver)
+    return (time.perf_counter() - start) / repetitions * 1000
+
+def run_benchmark(repetitions=200, headless=True):
+
+    """
+    Compare the per-product extraction latency of the old (one call per field) and the batched (single execute_script) extractors on a recorded product detail.
+
+    Args:
+        repetitions (int, optional): The number of extractions to average. Defaults to 200.
+        headless (bool, optional): Whether to run Chrome in headless mode. Defaults to True.
+
+    Returns:
+        dict: The average latency in milliseconds of each extractor and the speedup.
+    """
+
+    options = Options()
+    if headless:
+        options.add_argument('--headless')
+    driver = webdriver.Chrome(options=options)
+
+    try:
+        driver.get(f"file://{FIXTURE}")
+        legacy = time_extractor(driver, extract_product_detail_legacy, repetitions)
+        batched = time_extractor(driver, extract_product_detail, repetitions)
+    finally:
+        driver.quit()
+
+    return {"legacy_ms": legacy, "batched_ms": batched, "speedup": legacy / batched}
+
+
+
+if __name__ == '__main__':
+    results = run_benchmark()
+    print(f"find_element per field: {results['legacy_ms']:.2f} ms/product")
+    print(f"single execute_script:  {results['batched_ms']:.2f} ms/product")
+    print(f"speedup:                {results['speedup']:.1f}x")
@@ -0,0 +1,167 @@
+# Import libraries
+import os
+import random
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+# Make the scraping modules importable
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'mercadona', 'scraping'))
+
+from snapshot_store import open_snapshots, parse_unit_price, read_snapshots, snapshot_filter, write_snapshot
+from dataframe_build_benchmark import synthetic_subcategories
+
+
+
+# Functions
+
+def daily_snapshots(days=365, n_subcategories=100, products_per_subcategory=50, seed=0):
+
+    """
+    Generate a daily crawl of the same catalogue for a number of days, with a few prices changing every day.
+
+    Returns:
+        generator: A DataFrame per day, as a crawl writes it to its CSV file (prices per unit as text, e.g. "| 1,20 €/L").
+    """
+
+    rng = random.Random(seed)
+    catalogue = pd.DataFrame([row for rows in synthetic_subcategories(n_subcategories, products_per_subcategory, seed) for row in rows])
+    catalogue["product_price_per_unit"] = "| " + catalogue["product_price_per_unit"]
+    start = pd.Timestamp("2023-03-16 06:00:00")
+    for day in range(days):
+        changed = rng.sample(range(len(catalogue)), len(catalogue) // 50)
+        catalogue.loc[changed, "product_price"] = (catalogue.loc[changed, "product_price"] * 1.05).round(2)
+        yield catalogue.assign(collected_timestamp=start + pd.Timedelta(days=day))
+
+def read_csv_outputs(folder):
+
+    """
+    Read every CSV output of a folder the way they are read now: parse every file, clean the text columns (like get_categories_from_scraping()) and parse the prices per unit. Baseline of this benchmark.
+    """
+
+    frames = []
+    for f in sorted(os.listdir(folder)):
+        products = pd.read_csv(os.path.join(folder, f), sep='~', parse_dates=["collected_timestamp"])
+        products["product_category"] = products["product_category"].str.replace(" >", "", regex=False)
+        products["product_unit"] = products["product_unit"].str.replace("/", "", regex=False).str.replace(".", "", regex=False)
+        products["unit_price"], products["unit_price_unit"] = parse_unit_price(products["product_price_per_unit"])
+        frames.append(products)
+    return pd.concat(frames, ignore_index=True)
+
+def measure(read, *args, **kwargs):
+
+    """
+    Returns:
+        dict: The number of "rows", the "seconds" it took and the "frame_mb" of the DataFrame returned by read().
+    """
+
+    start = time.perf_counter()
+    df = read(*args, **kwargs)
+    seconds = time.perf_counter() - start
+    return {"rows": len(df), "seconds": seconds, "frame_mb": df.memory_usage(deep=True).sum() / 2**20}
+
+def folder_mb(folder):
+
+    """
+    Returns:
+        float: The size of every file in a folder (and its subfolders), in MB.
+    """
+
+    return sum(os.path.getsize(os.path.join(path, f)) for path, dirs, files in os.walk(folder) for f in files) / 2**20
+
+def row_groups_read(store, product_codes=None):
+
+    """
+    Count the row groups of the snapshot store that read_snapshots() reads for some product codes (the ones whose product code statistics may contain them).
+
+    Returns:
+        read (int): The row groups read.
+        total (int): The row groups in the store.
+    """
+
+    condition = snapshot_filter(product_codes)
+    read = total = 0
+    for fragment in open_snapshots(store).get_fragments(filter=condition):
+        total += fragment.num_row_groups
+        read += len(fragment.split_by_row_group(filter=condition))
+    return read, total
+
+def check_row_group_skipping(days=3):
+
+    """
+    Check that read_snapshots() with a few product codes skips the row groups that do not contain them, and still returns every row of those codes.
+
+    Raises:
+        AssertionError: If a check fails.
+    """
+
+    with tempfile.TemporaryDirectory() as store:
+        for products in daily_snapshots(days):
+            write_snapshot(products, root=store)
+
+        # Two products, which are in the same row group of every day (codes are sorted as text, "10" and "1000" before "2")
+        codes = ["10", "1000"]
+        read, total = row_groups_read(store, codes)
+        assert total > days, f"Every snapshot has a single row group ({total} in {days} days)"
+        assert read < total, f"No row group was skipped ({read} of {total} read)"
+        assert len(read_snapshots(store, product_codes=codes)) == len(codes) * days
+
+def check_delta_crawl_snapshot():
+
+    """
+    Check that a delta crawl, whose carried forward rows keep the collected_timestamp of an older crawl, is written to its own scrape date instead of replacing the snapshot of that crawl.
+
+    Raises:
+        AssertionError: If a check fails.
+    """
+
+    first, later = list(daily_snapshots(8))[::7]
+    verified = later["collected_timestamp"]
+    later = later.assign(collected_timestamp=first["collected_timestamp"], last_verified=verified)
+    later.loc[later.index[:10], "collected_timestamp"] = verified[:10]
+
+    with tempfile.TemporaryDirectory() as store:
+        paths = [write_snapshot(first, root=store), write_snapshot(later, root=store)]
+        assert paths[0] != paths[1], "The delta crawl replaced the snapshot of the earlier crawl"
+        dates = read_snapshots(store, columns=["scrape_date"])["scrape_date"].value_counts()
+        assert dates.to_dict() == {pd.Timestamp("2023-03-16"): len(first), pd.Timestamp("2023-03-23"): len(later)}, dates
+
+def run_benchmark(days=365):
+
+    """
+    Write a year of daily snapshots of a 5,000 product catalogue as CSV files and to the snapshot store, and compare reading them back.
+
+    Returns:
+        dict: The disk size of both formats and the measure() of every read, by name.
+    """
+
+    with tempfile.TemporaryDirectory() as folder:
+        csv_folder = os.path.join(folder, "csv")
+        store = os.path.join(folder, "snapshots")
+        os.makedirs(csv_folder)
+        for products in daily_snapshots(days):
+            products.to_csv(os.path.join(csv_folder, f"Mercadona Scraping {products['collected_timestamp'].iloc[0].strftime('%Y-%m-%d_%H-%M-%S')}.csv"), sep='~', index=False)
+            write_snapshot(products, root=store)
+
+        codes = [str(code) for code in range(0, 5000, 100)]
+        return {
+            "disk_mb": {"csv": folder_mb(csv_folder), "snapshots": folder_mb(store)},
+            "CSV files, cleaned": measure(read_csv_outputs, csv_folder),
+            "snapshot store, every column": measure(read_snapshots, store),
+            "snapshot store, 3 columns": measure(read_snapshots, store, columns=["product_code", "product_price", "scrape_date"]),
+            "snapshot store, 50 products": measure(read_snapshots, store, columns=["product_code", "product_price", "scrape_date"], product_codes=codes),
+            "snapshot store, last 30 days": measure(read_snapshots, store, start=(pd.Timestamp("2023-03-16") + pd.Timedelta(days=days - 30)).date()),
+        }
+
+
+
+if __name__ == '__main__':
+    check_row_group_skipping()
+    check_delta_crawl_snapshot()
+    results = run_benchmark()
+    disk = results.pop("disk_mb")
+    print(f"On disk: {disk['csv']:.1f} MB of CSV files, {disk['snapshots']:.1f} MB of snapshots")
+    for name, result in results.items():
+        print(f"{name:30} {result['rows']:8} rows  {result['seconds']:6.2f} s  {result['frame_mb']:7.1f} MB")
@@ -0,0 +1,367 @@
+# Import libraries
+import json
+import os
+import sys
+from html import escape
+
+# Make the scraping modules importable
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'mercadona', 'scraping'))
+
+from http_engine import product_to_row
+
+# Script of the categories page. Like the website, it is a single page: the category menu, the product grid and the
+# product detail are replaced in place (with synchronous requests, so a click has finished when Selenium's click()
+# returns) and the URL is changed with the History API, so driver.back() closes the product detail
+CATEGORIES_SCRIPT = """
+const menu = JSON.parse(document.getElementById('menu-data').textContent);
+let current = Number(document.getElementById('grid').dataset.subcategory);
+
+const load = (url) => {
+    const request = new XMLHttpRequest();
+    request.open('GET', url, false);
+    request.send();
+    return request.responseText;
+};
+
+const expandCategory = (index) => {
+    document.querySelectorAll('.category-menu__subcategories').forEach((list) => { list.innerHTML = ''; });
+    const list = document.getElementById('subcategories-' + index);
+    for (const [id, name] of menu[index].subcategories) {
+        const item = document.createElement('li');
+        const button = document.createElement('button');
+        button.className = 'category-item__link';
+        button.textContent = name;
+        button.addEventListener('click', () => openSubcategory(id));
+        item.appendChild(button);
+        list.appendChild(item);
+    }
+};
+
+const showSubcategory = (id) => {
+    document.getElementById('grid').innerHTML = load('/fragments/categories/' + id);
+    current = id;
+};
+
+const openSubcategory = (id) => {
+    closeProduct();
+    showSubcategory(id);
+    history.pushState({}, '', '/categories/' + id);
+};
+
+const openProduct = (cell) => {
+    document.getElementById('modal').innerHTML = load('/fragments/products/' + cell.dataset.id + '?subcategory=' + current);
+    history.pushState({}, '', cell.dataset.path);
+};
+
+const closeProduct = () => {
+    document.getElementById('modal').innerHTML = '';
+};
+
+document.querySelectorAll('.category-menu__header label').forEach((label, index) => {
+    label.addEventListener('click', () => expandCategory(index));
+});
+document.getElementById('grid').addEventListener('click', (event) => {
+    const cell = event.target.closest("div[data-test='product-cell']");
+    if (cell !== null) {
+        openProduct(cell);
+    }
+});
+document.getElementById('modal').addEventListener('click', (event) => {
+    if (event.target.tagName === 'BUTTON' && event.target.textContent.includes('Entendido')) {
+        event.target.closest('.modal-error').remove();
+    }
+});
+document.addEventListener('keydown', (event) => {
+    if (event.key === 'Escape' && location.pathname.startsWith('/product/')) {
+        history.back();
+    }
+});
+window.addEventListener('popstate', () => {
+    closeProduct();
+    const match = location.pathname.match(/^\\/categories\\/(\\d+)/);
+    if (match !== null && Number(match[1]) !== current) {
+        showSubcategory(Number(match[1]));
+    }
+});
+expandCategory(Number(document.getElementById('grid').dataset.category));
+"""
+
+# Script of the landing page: postal code, user menu and the two steps of the login form
+LANDING_SCRIPT = """
+const setPostalCode = () => {
+    const postalCode = document.querySelector('input[aria-label="Código postal"]').value;
+    document.cookie = 'postal_code=' + encodeURIComponent(postalCode) + '; path=/';
+    document.getElementById('header').hidden = false;
+};
+
+const toggleUserMenu = () => {
+    const menu = document.getElementById('user-menu');
+    menu.hidden = !menu.hidden;
+};
+
+const askPassword = () => {
+    const step = document.getElementById('password-step');
+    if (step.children.length > 0) {
+        return;
+    }
+    const password = document.createElement('input');
+    password.name = 'password';
+    password.type = 'password';
+    const button = document.createElement('button');
+    button.type = 'button';
+    button.dataset.test = 'do-login';
+    button.textContent = 'Entrar';
+    button.addEventListener('click', logIn);
+    step.appendChild(password);
+    step.appendChild(button);
+};
+
+const logIn = () => {
+    const email = document.querySelector('input[name="email"]').value;
+    document.cookie = 'session=' + Math.random().toString(36).slice(2) + '; path=/';
+    document.querySelector('.auth-form').remove();
+    const account = document.getElementById('account');
+    const name = document.createElement('span');
+    name.className = 'account__user-name';
+    name.textContent = email.split('@')[0];
+    name.addEventListener('click', () => {
+        const link = document.createElement('a');
+        link.href = '/user-area/orders';
+        link.textContent = 'Mis pedidos';
+        account.appendChild(link);
+    });
+    account.appendChild(name);
+};
+"""
+
+# Script shared by every page: the cookie banner
+COOKIES_SCRIPT = """
+const acceptCookies = () => {
+    document.cookie = 'cookies_accepted=1; path=/';
+    document.querySelector('.cookie-banner').remove();
+};
+"""
+
+
+
+# Functions
+
+def page(title, body, cookies_accepted=False, script=""):
+
+    """
+    Wrap the body of a page in the HTML document shared by every page of the fake storefront, with the cookie banner until the cookies are accepted.
+
+    Args:
+        title (str): The title of the page.
+        body (str): The HTML of the body.
+        cookies_accepted (bool, optional): Whether the browser already accepted the cookies. Defaults to False.
+        script (str, optional): The JavaScript of the page. Defaults to "".
+
+    Returns:
+        str: The HTML document.
+    """
+
+    banner = "" if cookies_accepted else '<div class="cookie-banner"><p>Usamos cookies propias y de terceros.</p><button type="button" onclick="acceptCookies()">Aceptar todas</button></div>'
+    return f"""<!DOCTYPE html>
+<html lang="es">
+<head>
+    <meta charset="utf-8">
+    <title>{escape(title)} | Mercadona</title>
+</head>
+<body>
+{body}
+{banner}
+<script>{COOKIES_SCRIPT}{script}</script>
+</body>
+</html>"""
+
+def product_cell(product, row):
+
+    """
+    Render a cell of the product grid, with the name, format, price and unit (without a link to the product, like the website).
+
+    Args:
+        product (dict): The product, as in the catalogue.
+        row (dict): The product converted with product_to_row(), which gives the texts shown.
+
+    Returns:
+        str: The HTML of the cell.
+    """
+
+    path = "/" + row["product_url"].split("/", 3)[3] if row["product_url"].startswith("http") else f"/product/{product['id']}/"
+    unit = "/ud." if row["product_unit"] == "ud" else f"/{row['product_unit']}"
+    price = f"{row['product_price']:.2f}".replace(".", ",")
+    return f"""<div class="product-cell" data-test="product-cell" data-id="{escape(str(product['id']))}" data-path="{escape(path)}">
+    <h4 class="subhead1-r product-cell__description-name">{escape(row['product'])}</h4>
+    <div class="product-format"><span class="footnote1-r">{escape(row['product_type'])}</span><span class="footnote1-r">{escape(row['product_volume'])}</span></div>
+    <div class="product-price"><p class="product-price__unit-price subhead1-b">{price} €</p><p class="product-price__extra-price footnote1-r">{unit}</p></div>
+</div>"""
+
+def product_grid(category, subcategory):
+
+    """
+    Render the product grid of a subcategory, grouped in its sections.
+
+    Args:
+        category (dict): The category, as in the catalogue.
+        subcategory (dict): The subcategory, as in the catalogue.
+
+    Returns:
+        str: The HTML of the grid.
+    """
+
+    sections = []
+    for section in subcategory["categories"]:
+        cells = "\n".join(product_cell(product, product_to_row(product, category["name"], subcategory["name"])) for product in section["products"])
+        sections.append(f'<section class="section"><h2 class="section__header headline1-r">{escape(section["name"])}</h2>\n{cells}\n</section>')
+    return f'<h1 class="category-detail__title title1-b">{escape(subcategory["name"])}</h1>\n' + "\n".join(sections)
+
+def product_detail(product, category, subcategory, throttled=False):
+
+    """
+    Render the product detail opened when a cell of the grid is clicked, with the selectors read by PRODUCT_DETAIL_SCRIPT in scraper.py.
+
+    Args:
+        product (dict): The product, as in the catalogue.
+        category (dict): The category it is displayed in.
+        subcategory (dict): The subcategory it is displayed in.
+        throttled (bool, optional): Show the "too many requests" dialog (with its "Entendido" button) over the detail. Defaults to False.
+
+    Returns:
+        str: The HTML of the product detail.
+    """
+
+    row = product_to_row(product, category["name"], subcategory["name"])
+    unit = "/ud." if row["product_unit"] == "ud" else f"/{row['product_unit']}"
+    price_per_unit = f'<span class="headline1-r">| {escape(row["product_price_per_unit"])}</span>' if row["product_price_per_unit"] != "Not available" else ""
+    price = f"{row['product_price']:.2f}".replace(".", ",")
+    dialog = '<div class="modal-error"><p class="title2-b">Ha ocurrido un error, vuelve a intentarlo más tarde.</p><button type="button" class="button button-primary">Entendido</button></div>' if throttled else ""
+    return f"""<div class="modal">
+    <div class="private-product-detail">
+        <h1 class="title2-r private-product-detail__description">{escape(row['product'])}</h1>
+        <div class="product-format"><span class="headline1-r">{escape(row['product_type'])}</span><span class="headline1-r">{escape(row['product_volume'])}</span>{price_per_unit}</div>
+        <div class="product-price">
+            <p class="product-price__unit-price large-b">{price} €</p>
+            <p class="product-price__extra-price title1-r">{unit}</p>
+        </div>
+        <div class="private-product-detail__breadcrumb">
+            <span class="subhead1-r">{escape(category['name'])} &gt;</span>
+            <span class="subhead1-sb">{escape(subcategory['name'])}</span>
+        </div>
+    </div>
+    {dialog}
+</div>"""
+
+def categories_page(catalogue, category, subcategory, cookies_accepted=False):
+
+    """
+    Render the categories page displaying a subcategory: the category menu (with the category of the subcategory expanded), the product grid and an empty product detail.
+
+    Args:
+        catalogue (dict): The catalogue.
+        category (dict): The category displayed.
+        subcategory (dict): The subcategory displayed.
+        cookies_accepted (bool, optional): See page(). Defaults to False.
+
+    Returns:
+        str: The HTML document.
+    """
+
+    # Category menu, with the subcategories rendered by the script when a category is clicked
+    menu = [{"name": c["name"], "subcategories": [[s["id"], s["name"]] for s in c["categories"]]} for c in catalogue["categories"]]
+    items = "\n".join(
+        f'<li class="category-menu__item"><span class="category-menu__header"><label>{escape(c["name"])}</label></span><ul class="category-menu__subcategories" id="subcategories-{index}"></ul></li>'
+        for index, c in enumerate(catalogue["categories"])
+    )
+    expanded = catalogue["categories"].index(category)
+    menu_data = json.dumps(menu, ensure_ascii=False).replace("</", "<\\/")
+
+    body = f"""<header id="header"><a href="/categories">Categorías</a></header>
+<div class="category-menu"><ul>
+{items}
+</ul></div>
+<script type="application/json" id="menu-data">{menu_data}</script>
+<div class="category-detail" id="grid" data-category="{expanded}" data-subcategory="{subcategory['id']}">
+{product_grid(category, subcategory)}
+</div>
+<div id="modal"></div>"""
+    return page(subcategory["name"], body, cookies_accepted=cookies_accepted, script=CATEGORIES_SCRIPT)
+
+def landing_page(postal_code=None, authenticate=False, cookies_accepted=False):
+
+    """
+    Render the landing page: the postal code form, the header (shown once the postal code is set) with the "Categorías" link and the user menu, and the login form when the URL asks for it ("/?authenticate-user=").
+
+    Args:
+        postal_code (str, optional): The postal code already set by the browser. Defaults to None.
+        authenticate (bool, optional): Show the login form. Defaults to False.
+        cookies_accepted (bool, optional): See page(). Defaults to False.
+
+    Returns:
+        str: The HTML document.
+    """
+
+    hidden = "" if postal_code else " hidden"
+    login = """<form class="auth-form" onsubmit="return false">
+    <input name="email" type="email" aria-label="Email">
+    <button type="submit" onclick="askPassword()">Siguiente</button>
+    <div id="password-step"></div>
+</form>""" if authenticate else ""
+    body = f"""<header id="header"{hidden}>
+    <a href="/categories">Categorías</a>
+    <button type="button" class="drop-down__trigger" onclick="toggleUserMenu()">Usuario</button>
+    <div id="user-menu" hidden><a href="/?authenticate-user=">Identifícate</a></div>
+    <div class="account" id="account"></div>
+</header>
+<div class="postal-code-form">
+    <input type="text" aria-label="Código postal" value="{escape(postal_code or '')}">
+    <input type="button" class="postal-code-form__button" value="Entrar" onclick="setPostalCode()">
+</div>
+{login}"""
+    return page("Supermercado online", body, cookies_accepted=cookies_accepted, script=LANDING_SCRIPT)
+
+def orders_page(orders, cookies_accepted=False):
+
+    """
+    Render the "Mis pedidos" page, with the number of every order (newest first).
+
+    Args:
+        orders (list): The orders, as returned by load_orders() in fake_storefront.py.
+        cookies_accepted (bool, optional): See page(). Defaults to False.
+
+    Returns:
+        str: The HTML document.
+    """
+
+    cells = "\n".join(f'<a class="order-cell" href="/user-area/orders/{escape(order["order_number"])}"><span class="order-cell__id footnote1-r">Pedido {escape(order["order_number"])}</span></a>' for order in orders)
+    return page("Mis pedidos", f'<div class="user-area"><h1 class="title1-b">Mis pedidos</h1>\n{cells}\n</div>', cookies_accepted=cookies_accepted)
+
+def order_page(order, cookies_accepted=False):
+
+    """
+    Render the products of an order, with the delivery date and the name, units and price of every line.
+
+    Args:
+        order (dict): The order, as returned by load_orders() in fake_storefront.py.
+        cookies_accepted (bool, optional): See page(). Defaults to False.
+
+    Returns:
+        str: The HTML document.
+    """
+
+    lines = []
+    for line in order["lines"]:
+        units = f"{line['units']} ud." if line["units"] == 1 else f"{line['units']} uds."
+        price = f"{line['price']:.2f}".replace(".", ",")
+        lines.append(f"""<div class="order-product-cell">
+    <p class="order-product-cell__name subhead1-r">{escape(line['product'])}</p>
+    <span class="order-product-cell__prepared-units subhead1-r">{units}</span>
+    <p class="order-product-cell__price subhead1-r">{price} €</p>
+</div>""")
+    lines = "\n".join(lines)
+    body = f"""<div class="order-detail">
+<h1 class="title1-b">Pedido {escape(order['order_number'])}</h1>
+<p class="order-detail__delivery">Entrega: <span class="body1-b">{escape(order['date'])}</span></p>
+{lines}
+</div>"""
+    return page(f"Pedido {order['order_number']}", body, cookies_accepted=cookies_accepted)
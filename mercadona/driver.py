@@ -0,0 +1,62 @@
+# Import libraries
+import os
+import json
+import threading
+
+# Record of the chromedriver resolved for the installed Chrome, shared by every script of the project
+DRIVER_RECORD = os.path.join(os.path.expanduser('~'), '.cache', 'mercadona', 'chromedriver.json')
+
+# Path of the chromedriver provisioned in this process, and the lock that makes the threads starting their first browser at the same time (e.g. the workers of a crawl) provision it only once
+_chromedriver_path = None
+_provision_lock = threading.Lock()
+
+
+
+# Functions
+
+def provision_chromedriver():
+
+    """
+    Make sure a chromedriver matching the installed Chrome is available and on the PATH. It only runs when the first browser is started, not when this module is imported.
+    The resolved driver path and Chrome version are saved in DRIVER_RECORD, so later processes (of the scraper or of the order history) reuse the driver without the download check of chromedriver_autoinstaller.install() as long as Chrome is not updated.
+    The result is cached for the rest of the process, and threads calling it at the same time wait for the first one instead of installing the driver and writing the record concurrently.
+
+    Returns:
+        str: The path of the chromedriver executable.
+    """
+
+    global _chromedriver_path
+    with _provision_lock:
+        if _chromedriver_path is not None:
+            return _chromedriver_path
+
+        # Imported here so that importing this module does not need it
+        import chromedriver_autoinstaller
+
+        # Reuse the recorded driver if it still exists and was resolved for the same Chrome version (a record that can not be read is ignored)
+        chrome_version = chromedriver_autoinstaller.get_chrome_version()
+        record = {}
+        if os.path.exists(DRIVER_RECORD):
+            try:
+                with open(DRIVER_RECORD, encoding='utf-8') as f:
+                    record = json.load(f)
+            except:
+                record = {}
+
+        if record.get("chrome_version") == chrome_version and os.path.exists(record.get("path", "")):
+            path = record["path"]
+        else:
+            # Otherwise install (or find) the right driver and record it, replacing the record at once so that other processes never read it half written
+            path = chromedriver_autoinstaller.install()
+            os.makedirs(os.path.dirname(DRIVER_RECORD), exist_ok=True)
+            temporary = f"{DRIVER_RECORD}.{os.getpid()}.tmp"
+            with open(temporary, 'w', encoding='utf-8') as f:
+                json.dump({"path": path, "chrome_version": chrome_version}, f)
+            os.replace(temporary, DRIVER_RECORD)
+
+        # Add the driver folder to the PATH, like chromedriver_autoinstaller.install() does
+        if os.path.dirname(path) not in os.environ["PATH"].split(os.pathsep):
+            os.environ["PATH"] = os.path.dirname(path) + os.pathsep + os.environ["PATH"]
+
+        _chromedriver_path = path
+        return path
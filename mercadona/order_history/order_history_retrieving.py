@@ -1,18 +1,24 @@
 # Import libraries
-import chromedriver_autoinstaller
-chromedriver_autoinstaller.install()
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.chrome.options import Options
+# Selenium is only imported by the functions that drive a browser, so that the pandas helpers can be imported without it
 
 # Other imports
 import re as re
+import os
+import sys
+import json
+import queue
+import threading
 import pandas as pd
 
-from dotenv import load_dotenv
-load_dotenv()
+from product_resolver import ProductResolver
+
+# Make the modules shared with the scraper (in the mercadona folder) importable
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from driver import provision_chromedriver
+
+# Landing page where the user logs in and online store where the orders are listed
+MERCADONA_URL = 'https://www.mercadona.es/'
+STORE_URL = 'https://tienda.mercadona.es/'
 
 
 months = {
@@ -30,36 +36,111 @@ months = {
     "diciembre": 12
 }
 
-def convert_date_string(date_string):
+# Columns of the order history, as saved in the history file of get_purchase_history(), and compact dtypes of them, see orders_frame()
+ORDER_COLUMNS = ["product", "units", "price", "order_number", "fecha"]
+ORDER_DTYPES = {"product": "category", "units": "int32", "price": "float32", "order_number": "category"}
+
+# Script that reads the delivery date and every line of an open order page in one pass, each line from its own product cell (null when an element is not found). The date is the first element with exactly the "body1-b" class, the selector the order pages have always been read with
+ORDER_SCRIPT = """
+const text = (root, selector) => {
+    const element = root.querySelector(selector);
+    return element === null ? null : element.innerText.trim();
+};
+return {
+    fecha: text(document, 'span[class="body1-b"]'),
+    lines: Array.from(document.querySelectorAll('.order-product-cell')).map((cell) => ({
+        product: text(cell, '.order-product-cell__name'),
+        units: text(cell, '.order-product-cell__prepared-units'),
+        price: text(cell, '.order-product-cell__price')
+    }))
+};
+"""
+
+# Spanish date as shown in the orders, with optional weekday and year (e.g. "Jueves 16 de marzo" or "25 de enero de 2022")
+DATE_PATTERN = re.compile(r'^\s*(?:[^\d\s]+\s+)?(?P<day>\d{1,2})\s+de\s+(?P<month>[^\d\s]+)(?:\s+(?:de\s+)?(?P<year>\d{4}))?', re.IGNORECASE)
+
+def convert_date_string(date_string, reference=None):
 
     """
     Convert a date string from the format "Día de mes de Año" (e.g., "25 de enero de 2022") 
-    to a pandas datetime object.
+    to a pandas datetime object. See parse_spanish_dates() for the year of dates without it.
     
     Args:
         date_string: str, A date string in the format "Día de mes de Año"
+        reference: datetime, optional, The date the string was read, used to infer a missing year. Defaults to today.
     
     Returns:
         A pandas datetime object representing the input date.
     """
 
-    # Extract the day and month name from the string using string manipulation functions
-    day = int(date_string.split()[1])
-    month_name = date_string.split()[3]
-    
-    # Map the month name to month number using the months dictionary
-    month = months[month_name]
-    
-    # Determine the year based on the month
-    year = 2022 if (month <= 12 and month >=10) else 2023
-    
-    # Combine the year, month, and day into a datetime object
-    return pd.to_datetime(f"{year}-{month}-{day}")
+    return parse_spanish_dates(pd.Series([date_string]), reference=reference)[0]
 
-def get_purchase_history(zip, mercadona_user, mercadona_password, headless=True):
+def parse_spanish_dates(dates, order_numbers=None, reference=None):
 
     """
-    Retrieves the purchase history of a user from Mercadona's online store.
+    Convert a Series of Spanish date strings ("Jueves 16 de marzo", "25 de enero de 2022"...) to datetimes at once.
+    Every distinct string is parsed only once, with a single regex pass (DATE_PATTERN) and a lookup of the month names.
+
+    The orders only show the day and the month, so the year of the dates without it is inferred:
+        - With order_numbers, orders are sorted by number (they grow with time). The newest order gets the year of the
+          reference date (or the previous one if the date would be in the future), and going back in time the year
+          decreases every time the day of the year jumps forward. It assumes no two consecutive orders are a year apart.
+        - Without them, every date gets the most recent year that does not put it after the reference date.
+
+    Args:
+        dates (pandas.Series): The date strings.
+        order_numbers (pandas.Series, optional): The order number of every date, aligned with dates. Defaults to None.
+        reference (datetime, optional): The date the strings were read. Defaults to today.
+
+    Returns:
+        pandas.Series: The dates as datetime64, NaT for the strings that could not be parsed.
+    """
+
+    reference = pd.Timestamp(reference if reference is not None else pd.Timestamp.now()).normalize()
+    dates = pd.Series(dates)
+    index = dates.index
+
+    # Parse every distinct string once
+    codes, uniques = pd.factorize(dates.astype(str).str.strip().str.lower(), sort=False)
+    parts = pd.Series(uniques).str.extract(DATE_PATTERN)
+    day = pd.to_numeric(parts["day"]).to_numpy()[codes]
+    month = parts["month"].map(months).to_numpy(dtype=float)[codes]
+    year = pd.to_numeric(parts["year"]).to_numpy(dtype=float)[codes]
+
+    # Day of the year (month * 100 + day) compared across years to detect year changes
+    ordinal = pd.Series(month * 100 + day, index=index)
+    reference_ordinal = reference.month * 100 + reference.day
+    missing = pd.Series(pd.isna(year), index=index) & ordinal.notna()
+
+    if missing.any():
+
+        # Most recent year that does not put the date after the reference date
+        inferred = reference.year - (ordinal > reference_ordinal).astype(int)
+
+        if order_numbers is not None:
+
+            # One row per order, newest first
+            order_key = pd.to_numeric(pd.Series(order_numbers, index=index).astype(str), errors="coerce")
+            orders = pd.DataFrame({"order": order_key, "ordinal": ordinal})[missing & order_key.notna()]
+            orders = orders.drop_duplicates("order").sort_values("order", ascending=False)
+
+            # Going back in time, a later day of the year than the next order means the previous year
+            if len(orders) > 0:
+                rollovers = (orders["ordinal"].diff() > 0).cumsum()
+                start = reference.year - int(orders["ordinal"].iloc[0] > reference_ordinal)
+                order_years = pd.Series((start - rollovers).to_numpy(), index=orders["order"].to_numpy())
+                inferred = order_key.map(order_years).fillna(inferred)
+
+        year = pd.Series(year, index=index).fillna(inferred.where(missing))
+    else:
+        year = pd.Series(year, index=index)
+
+    return pd.to_datetime(pd.DataFrame({"year": year, "month": month, "day": day}, index=index), errors="coerce")
+
+def start_logged_in_session(zip, mercadona_user, mercadona_password, headless=True):
+
+    """
+    Start a browser, log in to Mercadona's online store and open the "Mis pedidos" page.
 
     Args:
         zip (str): Postal code of the user's address.
@@ -68,9 +149,16 @@ def get_purchase_history(zip, mercadona_user, mercadona_password, headless=True)
         headless (bool): Whether to run the web driver in headless mode (default True).
 
     Returns:
-        pandas.DataFrame: Dataframe containing the purchase history of the user.
+        selenium.webdriver.Chrome: The logged in driver, displaying the list of orders.
     """
 
+    # Browser imports, only needed here
+    from selenium import webdriver
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support.ui import WebDriverWait
+    from selenium.webdriver.support import expected_conditions as EC
+    from selenium.webdriver.chrome.options import Options
+
     # Create a ChromeOptions object
     options = Options()
 
@@ -78,11 +166,12 @@ def get_purchase_history(zip, mercadona_user, mercadona_password, headless=True)
     if headless:
         options.add_argument('--headless')
 
-    # Specify the path to your web driver
+    # Make sure the chromedriver is available (only checked the first time) and start the driver
+    provision_chromedriver()
     driver = webdriver.Chrome(options=options)
 
     # Navigate to the login page
-    driver.get('https://www.mercadona.es/')
+    driver.get(MERCADONA_URL)
 
     # Enter the postal code and submit it
     postal_code = driver.find_element(By.CSS_SELECTOR, 'input[aria-label="Código postal"]').send_keys(zip)
@@ -131,6 +220,66 @@ def get_purchase_history(zip, mercadona_user, mercadona_password, headless=True)
     )
     pedidos.click()
 
+    return driver
+
+def clone_session(driver, headless=True):
+
+    """
+    Start another browser authenticated as the same user, by copying the cookies and the local storage of a logged in driver, so that order pages can be fetched concurrently without logging in again.
+
+    Args:
+        driver (selenium.webdriver.Chrome): A driver returned by start_logged_in_session().
+        headless (bool): Whether to run the web driver in headless mode (default True).
+
+    Returns:
+        selenium.webdriver.Chrome: The new driver.
+    """
+
+    # Browser imports, only needed here
+    from selenium import webdriver
+    from selenium.webdriver.chrome.options import Options
+
+    # Create a ChromeOptions object, adding the headless argument if passed
+    options = Options()
+    if headless:
+        options.add_argument('--headless')
+    provision_chromedriver()
+    clone = webdriver.Chrome(options=options)
+
+    # Open the store domain, so that its cookies and storage can be set, and copy them (closing the new browser if that fails)
+    try:
+        clone.get(STORE_URL)
+        for cookie in driver.get_cookies():
+            cookie.pop('sameSite', None)
+            try:
+                clone.add_cookie(cookie)
+            except:
+                continue
+        storage = driver.execute_script("return Object.assign({}, window.localStorage);")
+        clone.execute_script("for (const [key, value] of Object.entries(arguments[0])) { window.localStorage.setItem(key, value); }", storage)
+    except:
+        clone.quit()
+        raise
+
+    return clone
+
+def list_order_numbers(driver):
+
+    """
+    Read the number of every order listed in the "Mis pedidos" page.
+
+    Args:
+        driver (selenium.webdriver.Chrome): A driver returned by start_logged_in_session().
+
+    Returns:
+        list: The order numbers (str), as listed (newest first).
+    """
+
+    # Browser imports, only needed here
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support.ui import WebDriverWait
+    from selenium.webdriver.support import expected_conditions as EC
+
     # Get all order numbers:
     order_nums = WebDriverWait(driver, 10).until(
         EC.visibility_of_all_elements_located(
@@ -145,83 +294,175 @@ def get_purchase_history(zip, mercadona_user, mercadona_password, headless=True)
     for pedido in order_nums:
         list_of_orders.append(pedido.text.split(' ')[1])
 
-    # Create an empty dataframe to store the details of every product in every order
-    pedidos_to_return = pd.DataFrame({})
+    return list_of_orders
 
-    # Loop over the order numbers and extract the order details
-    for order_text in list_of_orders:
+def fetch_order(driver, order_number):
 
-        # Visit the order details page
-        driver.get(f"https://tienda.mercadona.es/user-area/orders/{order_text}?products")
+    """
+    Scrape every product of an order.
+    The page is read with a single execute_script call (see ORDER_SCRIPT), which returns every line from its own product cell, instead of one wait and one call per element of every column.
+    That call is repeated until the lines and the delivery date are displayed, so the wait and the extraction are a single round-trip once the page has loaded.
 
-        # Initialize an empty dictionary that will later be turned into a DataFrame. This dictionary will contain the information every product for an order
-        order_details = {}
-        
-        # Get all products in the order
-        products = WebDriverWait(driver, 10).until(
-            EC.visibility_of_all_elements_located(
-                (By.CSS_SELECTOR, 'p[class="order-product-cell__name subhead1-r"]')
-            )
-        )
+    Args:
+        driver (selenium.webdriver.Chrome): A logged in driver.
+        order_number (str): The number of the order.
 
-        # Extract the text from each product element and store them in a list
-        products_list = []
-        for product in products:
-            products_list.append(product.text)
-        
-        # Add the products list to the order details dictionary
-        order_details["product"] = products_list
-
-        # Get all units in the order
-        units = WebDriverWait(driver, 10).until(
-            EC.visibility_of_all_elements_located(
-                (By.CSS_SELECTOR, 'span[class="order-product-cell__prepared-units subhead1-r"]')
-            )
-        )
+    Returns:
+        list: A dictionary per product of the order, with its name, units, price, order number and delivery date. Build the DataFrame of every order at once with orders_frame().
 
-        # Extract the number of units from each unit element and store them in a list
-        units_list = []
-        for unit in units:
-            units_list.append(int(unit.text.split(' ')[0]))
-        
-        # Add the units list to the order details dictionary
-        order_details["units"] = units_list
-        
-        # Get all prices in the order
-        prices = WebDriverWait(driver, 10).until(
-            EC.visibility_of_all_elements_located(
-                (By.CSS_SELECTOR, 'p[class="order-product-cell__price subhead1-r"]')
-            )
-        )
+    Raises:
+        TimeoutException: If the lines of the order are not displayed within 10 seconds.
+        ValueError: If the units or the price of a line can not be read. The order is not saved, so it is fetched again in the next sync.
+    """
 
-        # Extract the price from each price element and store them in a list
-        prices_list = []
-        for price in prices:
-            prices_list.append(float(price.text.split(' ')[0].replace(',','.')))
-        
-        # Add the prices list to the order details dictionary
-        order_details["price"] = prices_list
-
-        # Convert the order details dictionary to a dataframe and add the order number to each row
-        order_details_df = pd.DataFrame(order_details)
-        order_details_df = order_details_df.assign(order_number=order_text)
-
-        # Get the delivery date and add it to the dataframe
-        delivery = WebDriverWait(driver, 10).until(
-            EC.visibility_of_all_elements_located(
-                (By.CSS_SELECTOR, 'span[class="body1-b"]')
-            )
-        )
-        order_details_df = order_details_df.assign(fecha=delivery[0].text)
+    # Browser imports, only needed here
+    from selenium.webdriver.support.ui import WebDriverWait
+
+    # Visit the order details page
+    driver.get(f"{STORE_URL}user-area/orders/{order_number}?products")
+
+    # Read the whole page until the lines and the delivery date are displayed
+    def read_order(driver):
+        order = driver.execute_script(ORDER_SCRIPT)
+        return order if order["fecha"] and any(line["product"] for line in order["lines"]) else False
+    order = WebDriverWait(driver, 10).until(read_order)
 
-        # Convert the text date to a Pandas DateTime element using our previous function.
-        order_details_df["fecha"] = order_details_df["fecha"].apply(convert_date_string)
+    # A row per product cell, with the delivery date as shown (e.g. "Jueves 16 de marzo"). The dates of every order are converted at once by orders_frame(), which needs the order numbers to infer their year
+    rows = []
+    skipped = 0
+    for line in order["lines"]:
 
-        # Add the order details dataframe to the overall dataframe
-        pedidos_to_return = pd.concat([pedidos_to_return,order_details_df],ignore_index=True)
+        # Cells without a product name are not order lines, report how many there were
+        if not line["product"]:
+            skipped += 1
+            continue
+        try:
+            units = int(line["units"].split(' ')[0])
+            price = float(line["price"].split(' ')[0].replace(',','.'))
+        except (AttributeError, ValueError):
+            raise ValueError(f'The units ({line["units"]}) or the price ({line["price"]}) of "{line["product"]}" in order {order_number} could not be read')
+        rows.append({"product": line["product"], "units": units, "price": price, "order_number": order_number, "fecha": order["fecha"]})
+    if skipped:
+        print(f"!!! {skipped} product cells without a name were skipped in order {order_number}.")
+
+    return rows
+
+def orders_frame(rows):
+
+    """
+    Build the order history DataFrame from a list of rows, at once and with compact dtypes (see ORDER_DTYPES).
+    Delivery dates still in text are converted with parse_spanish_dates(), using the order numbers to infer their year.
+
+    Args:
+        rows (list or pandas.DataFrame): The rows returned by fetch_order(), or a DataFrame with the same columns.
+
+    Returns:
+        pandas.DataFrame: The order history, with categorical products and order numbers, int32 units, float32 prices and datetime dates.
+    """
+
+    orders = pd.DataFrame(rows, columns=ORDER_COLUMNS)
+    orders = orders.astype(ORDER_DTYPES)
+    if pd.api.types.is_datetime64_any_dtype(orders["fecha"]) or len(orders) == 0:
+        orders["fecha"] = pd.to_datetime(orders["fecha"])
+    else:
+        orders["fecha"] = parse_spanish_dates(orders["fecha"], order_numbers=orders["order_number"])
+    return orders
+
+def _fetch_orders_worker(driver, pending, fetched):
+
+    """
+    Take order numbers from a shared queue and fetch them with a driver owned by this worker, until the queue is empty.
+
+    Args:
+        driver (selenium.webdriver.Chrome): A logged in driver.
+        pending (queue.Queue): Queue of order numbers to fetch.
+        fetched (dict): The rows of every order fetched, by order number (shared by all the workers).
+    """
+
+    while True:
+        try:
+            order_number = pending.get_nowait()
+        except queue.Empty:
+            break
+
+        # An order that fails is not saved, so it is fetched again in the next sync
+        try:
+            fetched[order_number] = fetch_order(driver, order_number)
+        except:
+            print(f"!!! Order {order_number} could not be fetched, it will be retried in the next sync.")
+
+def get_purchase_history(zip, mercadona_user, mercadona_password, headless=True, history=None, workers=1):
+
+    """
+    Retrieves the purchase history of a user from Mercadona's online store.
+
+    With `history`, the sync is incremental: the orders already saved in that file are not fetched again, only the new
+    ones, which are appended to it. With `workers` greater than 1, order pages are fetched concurrently by several browsers
+    sharing the session of the one that logged in (see clone_session()).
+
+    Args:
+        zip (str): Postal code of the user's address.
+        mercadona_user (str): Email address of the user's Mercadona account.
+        mercadona_password (str): Password of the user's Mercadona account.
+        headless (bool): Whether to run the web driver in headless mode (default True).
+        history (str, optional): Path of a CSV file (separated by "~") where every order fetched is saved, with the columns of ORDER_COLUMNS. It is created if it does not exist. Defaults to None.
+        workers (int, optional): The number of browsers fetching orders at the same time. Defaults to 1.
+
+    Returns:
+        pandas.DataFrame: Dataframe containing the purchase history of the user.
+
+    Raises:
+        ValueError: If the history file does not have the columns of ORDER_COLUMNS (e.g. an export with an index or extra columns), since the new orders would be appended under the wrong columns.
+    """
+
+    # Orders already fetched in previous syncs, in a file with the columns the new orders are appended with
+    previous = pd.DataFrame({})
+    if history is not None and os.path.exists(history) and os.path.getsize(history) > 0:
+        columns = list(pd.read_csv(history, sep='~', nrows=0).columns)
+        if columns != ORDER_COLUMNS:
+            raise ValueError(f'The history file "{history}" has the columns {columns}, not {ORDER_COLUMNS}. Pass a new file or one written by get_purchase_history().')
+        previous = pd.read_csv(history, sep='~', dtype={"order_number": str}, parse_dates=["fecha"])
+    fetched_orders = set(previous["order_number"]) if len(previous) > 0 else set()
+
+    # Log in, list the orders (keeping only the new ones) and fetch them, with extra browsers sharing the session if asked for. Every browser started is closed, even if another one fails to start
+    driver = start_logged_in_session(zip, mercadona_user, mercadona_password, headless=headless)
+    drivers = [driver]
+    fetched = {}
+    try:
+        list_of_orders = [order for order in list_order_numbers(driver) if order not in fetched_orders]
+        print(f"{len(list_of_orders)} new orders to fetch ({len(fetched_orders)} already fetched).")
+
+        # Queue the new orders
+        pending = queue.Queue()
+        for order_number in list_of_orders:
+            pending.put(order_number)
+
+        # Start the extra browsers, each one added as soon as it is started so that it is closed if the next one fails
+        for n in range(min(workers, len(list_of_orders)) - 1):
+            drivers.append(clone_session(driver, headless=headless))
+
+        # Fetch the orders, a thread per browser
+        threads = [threading.Thread(target=_fetch_orders_worker, args=(worker_driver, pending, fetched)) for worker_driver in drivers]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        for worker_driver in drivers:
+            try:
+                worker_driver.quit()
+            except:
+                pass
+
+    # Build the DataFrame of the new orders once, in the listed order
+    new_orders = orders_frame([row for order_number in list_of_orders for row in fetched.get(order_number, [])])
+
+    # Save the new orders so that the next sync skips them
+    if history is not None and len(new_orders) > 0:
+        new_orders.to_csv(history, sep='~', index=False, mode='a', header=not os.path.exists(history) or os.path.getsize(history) == 0)
 
     print("Success!")
-    return pedidos_to_return
+    return orders_frame(pd.concat([new_orders, previous], ignore_index=True)) if len(previous) > 0 else new_orders
 
 def get_categories_from_scraping(csv):
 
@@ -256,7 +497,7 @@ def get_categories_from_scraping(csv):
 
 
 
-# The following dictionaries are used to replace product codes based on my behaviour. If this were to be scaled up these replacement would need to be done in another way.
+# The following dictionaries are used to replace product codes based on my behaviour. They are the hand-made part of the alias table of the ProductResolver (see product_resolver.py): new names are resolved by normalized or fuzzy matching, or added with ProductResolver.add_alias().
 product_dict = {"Ensalada mezcla brotes tiernos maxi" : 69810,
 "Bebida de almendras zero Hacendado" : 23926,
 "Papel higiénico húmedo WC Bosque Verde" : 47291,
@@ -309,40 +550,38 @@ code_replacement = {
         39033 : 39010        # "Zumo pura naranja Hacendado" : 39010
 }
 
-def assign_product_codes(cat_codes, orders):
+def assign_product_codes(cat_codes, orders, resolver=None):
 
     """
     This function assigns product codes to a dataframe of orders based on a separate dataframe containing category codes.
+    Names are resolved with a ProductResolver (see product_resolver.py): exact name, product_dict, normalized name and fuzzy matching, and codes are replaced by their canonical code (code_replacement).
     
     Parameters:
         cat_codes (pandas.DataFrame): A dataframe containing category codes for products.
         orders (pandas.DataFrame): A dataframe containing orders for products.
+        resolver (ProductResolver, optional): A resolver with a richer alias table (e.g. built from every historical scrape, or loaded from disk). If None, one is built from cat_codes, product_dict and code_replacement.
     
     Returns:
-        pandas.DataFrame: A dataframe of orders with product codes assigned.
+        pandas.DataFrame: A dataframe of orders with product codes assigned, and the confidence and method of every match. Unresolved rows have no product code.
     """
 
-    # Merge orders and category codes dataframes
-    order_history = pd.merge(orders, cat_codes[["product", "product_code"]],left_on="product", right_on="product", how="left")
-    
-    # Fill missing product codes with product_dict
-    order_history["product_code"] = order_history["product_code"].fillna(order_history["product"].map(product_dict))
-    
-    # Convert product codes to integers
-    order_history['product_code'] = order_history['product_code'].astype(int)
+    # Build the resolver from the scraped products and the hand-made dictionaries, unless one is passed
+    if resolver is None:
+        resolver = ProductResolver.from_scrapes([cat_codes], name_aliases=product_dict, code_aliases=code_replacement)
 
-    # The following lines are an alternate way to deal with transforming the product code to int.
-    #order_history['product_code'] = pd.to_numeric(order_history['product_code'], errors='coerce')
-    #order_history['product_code'] = order_history['product_code'].fillna(order_history['product_code'].astype(str))
-    
-    # Calculate price per unit for each product
-    order_history['price_per_unit'] = order_history['price'] / order_history['units']
+    # Resolve every product name to its canonical product code
+    order_history = resolver.resolve_frame(orders)
+
+    # Report the names that could not be resolved, so that they can be added as aliases
+    unresolved = resolver.unresolved(order_history)
+    if len(unresolved) > 0:
+        print(f"{len(unresolved)} products could not be resolved ({unresolved['rows'].sum()} rows): {', '.join(unresolved['product'].head(10))}")
 
-    # Replace product codes with code_replacement
-    order_history["product_code"] = order_history["product_code"].replace(code_replacement)
+    # Calculate price per unit for each product, keeping the dtype of the prices (float32 with orders_frame())
+    order_history['price_per_unit'] = (order_history['price'] / order_history['units']).astype(order_history['price'].dtype)
 
     # Drop duplicate rows
     order_history = order_history.drop_duplicates()
 
     # Return dataframe with product codes assigned
-    return order_history
\ No newline at end of file
+    return order_history
@@ -0,0 +1,331 @@
+# Import libraries
+import json
+import os
+import re
+import unicodedata
+from collections import Counter
+
+import pandas as pd
+
+# Brands removed from the names to match products whose brand is written differently (or not at all) in the orders
+BRANDS = ["hacendado", "deliplus", "bosque verde", "compy", "solcare", "belladieta"]
+BRAND_PATTERN = re.compile(r'\b(?:' + '|'.join(BRANDS) + r')\b')
+
+# Confidence of every kind of match
+CONFIDENCE = {"exact": 1.0, "alias": 1.0, "normalized": 0.95, "brandless": 0.9}
+
+
+
+# Functions
+
+def normalize_name(name):
+
+    """
+    Normalize a product name for matching: no accents, lower case, only letters and digits separated by single spaces (e.g. "Champú Anticaída Deliplus" -> "champu anticaida deliplus").
+
+    Args:
+        name (str): The product name.
+
+    Returns:
+        str: The normalized name.
+    """
+
+    name = unicodedata.normalize('NFKD', str(name)).encode('ascii', 'ignore').decode('ascii').lower()
+    return ' '.join(re.sub(r'[^a-z0-9]+', ' ', name).split())
+
+def strip_brands(normalized_name):
+
+    """
+    Returns:
+        str: A normalized name without the brands in BRANDS.
+    """
+
+    return ' '.join(BRAND_PATTERN.sub(' ', normalized_name).split())
+
+def trigrams(text):
+
+    """
+    Returns:
+        set: The character trigrams of a text, padded so that the start and end of every word count.
+    """
+
+    text = f"  {text} "
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+
+# Classes
+
+class ProductResolver:
+
+    """
+    Resolve the product names of the order history to product codes.
+
+    It keeps an alias table, saved as JSON with save() and load():
+        - names: every product name seen in the scrapes, with the product codes it had and their price.
+        - name_aliases: names that are not in the scrapes, set by hand (e.g. product_dict).
+        - code_aliases: codes replaced by a canonical code (e.g. an old code of a product, or code_replacement).
+
+    Names are looked up, in order, by exact name, by hand-made alias, by normalized name (see normalize_name()), by
+    normalized name without brands and finally by fuzzy matching with a trigram index, which only needs to compare the
+    few names that share the rarest trigrams. Every match has a confidence, from 1 (exact) down to min_confidence.
+
+    Args:
+        min_confidence (float, optional): The lowest similarity accepted for a fuzzy match (Dice coefficient of the trigrams). Defaults to 0.6.
+    """
+
+    def __init__(self, min_confidence=0.6):
+        self.min_confidence = min_confidence
+        self.names = {}
+        self.name_aliases = {}
+        self.code_aliases = {}
+        self._index = None
+
+    @classmethod
+    def from_scrapes(cls, scrapes, name_aliases=None, code_aliases=None, min_confidence=0.6):
+
+        """
+        Build the alias table from scraped products.
+
+        Products are read in order, so later scrapes take precedence. When a product (same name, type and volume) shows
+        up with a different code in a later scrape, its old code becomes an alias of the new one.
+
+        Args:
+            scrapes (list): Paths of scraping outputs (CSV files separated by "~") or DataFrames with at least the "product" and "product_code" columns, oldest first.
+            name_aliases (dict, optional): Names set by hand and their codes (e.g. product_dict). Defaults to None.
+            code_aliases (dict, optional): Codes set by hand and their canonical codes (e.g. code_replacement). They take precedence over the ones found. Defaults to None.
+            min_confidence (float, optional): See ProductResolver. Defaults to 0.6.
+
+        Returns:
+            ProductResolver: The resolver.
+        """
+
+        resolver = cls(min_confidence=min_confidence)
+        previous_codes = {}
+        for scrape in scrapes:
+            products = pd.read_csv(scrape, sep='~') if isinstance(scrape, str) else scrape
+            products = products[pd.to_numeric(products["product_code"], errors="coerce").notna()]
+            for row in products.to_dict('records'):
+                price = pd.to_numeric(row.get("product_price"), errors="coerce")
+                resolver.add_product(row["product"], int(float(row["product_code"])), None if pd.isna(price) else float(price))
+
+            # A product (name, type and volume, only if it identifies a single code in the scrape) with a different code than in the previous scrapes
+            if "product_type" in products.columns and "product_volume" in products.columns:
+                keys = pd.DataFrame({"name": products["product"].map(normalize_name), "type": products["product_type"].astype(str), "volume": products["product_volume"].astype(str), "code": pd.to_numeric(products["product_code"]).astype(int)}).drop_duplicates()
+                keys = keys.drop_duplicates(["name", "type", "volume"], keep=False)
+                codes = {(name, type, volume): code for name, type, volume, code in keys.itertuples(index=False)}
+                for key, code in codes.items():
+                    if key in previous_codes and previous_codes[key] != code:
+                        resolver.code_aliases[previous_codes[key]] = code
+                previous_codes.update(codes)
+
+        for name, code in (name_aliases or {}).items():
+            resolver.name_aliases[name] = int(code)
+        for code, canonical in (code_aliases or {}).items():
+            resolver.code_aliases[int(code)] = int(canonical)
+        return resolver
+
+    @classmethod
+    def load(cls, path, min_confidence=0.6):
+
+        """
+        Load an alias table saved with save().
+
+        Args:
+            path (str): The path of the JSON file.
+            min_confidence (float, optional): See ProductResolver. Defaults to 0.6.
+
+        Returns:
+            ProductResolver: The resolver.
+        """
+
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+
+        resolver = cls(min_confidence=min_confidence)
+        resolver.names = {name: [tuple(candidate) for candidate in candidates] for name, candidates in data["names"].items()}
+        resolver.name_aliases = data["name_aliases"]
+        resolver.code_aliases = {int(code): canonical for code, canonical in data["code_aliases"].items()}
+        return resolver
+
+    def save(self, path):
+
+        """
+        Write the alias table to disk atomically (write a temporary file, then replace the old one).
+
+        Args:
+            path (str): The path of the JSON file.
+        """
+
+        data = {
+            "names": {name: [list(candidate) for candidate in candidates] for name, candidates in self.names.items()},
+            "name_aliases": self.name_aliases,
+            "code_aliases": {str(code): canonical for code, canonical in self.code_aliases.items()},
+        }
+        with open(path + ".tmp", 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=1)
+        os.replace(path + ".tmp", path)
+
+    def add_product(self, name, code, price=None):
+
+        """
+        Record that a product name had a code (and a price). The latest price of every code is kept.
+
+        Args:
+            name (str): The product name.
+            code (int): The product code.
+            price (float, optional): The product price. Defaults to None.
+        """
+
+        candidates = [candidate for candidate in self.names.get(name, []) if candidate[0] != code]
+        self.names[name] = candidates + [(code, price)]
+        self._index = None
+
+    def add_alias(self, name, code):
+
+        """
+        Resolve a name that is not in the scrapes to a code from now on (e.g. after reviewing an unresolved row).
+
+        Args:
+            name (str): The product name, as written in the orders.
+            code (int): The product code.
+        """
+
+        self.name_aliases[name] = int(code)
+
+    def canonical(self, code):
+
+        """
+        Returns:
+            int: The canonical code of a code, following the code aliases.
+        """
+
+        seen = set()
+        while code in self.code_aliases and code not in seen:
+            seen.add(code)
+            code = self.code_aliases[code]
+        return code
+
+    def _build_index(self):
+
+        # Normalized and brandless names, and the trigram index for fuzzy matching
+        normalized, brandless, postings = {}, {}, {}
+        entries = []
+        for name in list(self.names) + list(self.name_aliases):
+            key = normalize_name(name)
+            normalized.setdefault(key, name)
+            brandless.setdefault(strip_brands(key), name)
+        for key, name in brandless.items():
+            entry = len(entries)
+            entries.append((name, trigrams(key)))
+            for trigram in entries[entry][1]:
+                postings.setdefault(trigram, []).append(entry)
+        self._index = {"normalized": normalized, "brandless": brandless, "entries": entries, "postings": postings}
+
+    def _pick(self, name, unit_price=None):
+
+        # Hand-made aliases have a single code
+        if name not in self.names:
+            return self.name_aliases[name], True
+
+        # A name can have several codes (e.g. the same oil in a bottle and in a jug): the one with the closest price wins, otherwise the latest one
+        candidates = self.names[name]
+        if unit_price is None or len(candidates) == 1:
+            return candidates[-1][0], len(candidates) == 1
+        priced = [candidate for candidate in candidates if candidate[1] is not None]
+        if not priced:
+            return candidates[-1][0], False
+        return min(priced, key=lambda candidate: abs(candidate[1] - unit_price))[0], False
+
+    def _fuzzy(self, key, shortlist=10):
+
+        # Count the shared trigrams, starting with the rarest ones, and compare the shortlisted names exactly
+        index = self._index
+        query = trigrams(key)
+        counts = Counter()
+        for trigram in sorted(query, key=lambda t: len(index["postings"].get(t, [])))[:max(len(query) // 2, 3)]:
+            counts.update(index["postings"].get(trigram, []))
+        best, best_score = None, 0
+        for entry, count in counts.most_common(shortlist):
+            name, entry_trigrams = index["entries"][entry]
+            score = 2 * len(query & entry_trigrams) / (len(query) + len(entry_trigrams))
+            if score > best_score:
+                best, best_score = name, score
+        return best, best_score
+
+    def resolve(self, name, unit_price=None):
+
+        """
+        Resolve a product name of the orders to a product code.
+
+        Args:
+            name (str): The product name, as written in the orders.
+            unit_price (float, optional): The price paid per unit, used to choose between products with the same name. Defaults to None.
+
+        Returns:
+            code (int): The canonical product code, or None if it could not be resolved.
+            confidence (float): How sure the match is, from 0 to 1.
+            method (str): How it was matched: "exact", "alias", "normalized", "brandless", "fuzzy" or None.
+        """
+
+        if self._index is None:
+            self._build_index()
+
+        # Exact name and hand-made alias
+        if name in self.names:
+            code, unique = self._pick(name, unit_price)
+            return self.canonical(code), CONFIDENCE["exact"] if unique else CONFIDENCE["normalized"], "exact"
+        if name in self.name_aliases:
+            return self.canonical(self.name_aliases[name]), CONFIDENCE["alias"], "alias"
+
+        # Normalized name, with and without brands
+        key = normalize_name(name)
+        if key in self._index["normalized"]:
+            return self.canonical(self._pick(self._index["normalized"][key], unit_price)[0]), CONFIDENCE["normalized"], "normalized"
+        key = strip_brands(key)
+        if key in self._index["brandless"]:
+            return self.canonical(self._pick(self._index["brandless"][key], unit_price)[0]), CONFIDENCE["brandless"], "brandless"
+
+        # Fuzzy match
+        match, score = self._fuzzy(key)
+        if match is not None and score >= self.min_confidence:
+            return self.canonical(self._pick(match, unit_price)[0]), round(score, 3), "fuzzy"
+        return None, round(score, 3), None
+
+    def resolve_frame(self, orders):
+
+        """
+        Resolve every row of an order history. Every distinct (name, unit price) is resolved only once.
+
+        Args:
+            orders (pandas.DataFrame): Orders with the "product", "units" and "price" columns.
+
+        Returns:
+            pandas.DataFrame: The orders with the "product_code" (nullable integer, missing if unresolved), "match_confidence" and "match_method" columns.
+        """
+
+        unit_prices = (orders["price"] / orders["units"]).round(2)
+        keys = pd.DataFrame({"product": orders["product"].astype(str), "unit_price": unit_prices})
+        distinct = keys.drop_duplicates()
+        resolved = pd.DataFrame(
+            [self.resolve(name, price) for name, price in zip(distinct["product"], distinct["unit_price"])],
+            columns=["product_code", "match_confidence", "match_method"], index=distinct.index,
+        )
+        resolved = pd.concat([distinct, resolved], axis=1)
+
+        orders = orders.copy()
+        matched = keys.merge(resolved, on=["product", "unit_price"], how="left")
+        orders["product_code"] = pd.array(matched["product_code"].to_numpy(), dtype="Int64")
+        orders["match_confidence"] = matched["match_confidence"].to_numpy()
+        orders["match_method"] = matched["match_method"].to_numpy()
+        return orders
+
+    def unresolved(self, orders):
+
+        """
+        Returns:
+            pandas.DataFrame: The distinct product names of an order history (as returned by resolve_frame()) that could not be resolved, with their best fuzzy score and the number of rows, to review them and add aliases.
+        """
+
+        missing = orders[orders["product_code"].isna()]
+        return missing.groupby("product", observed=True).agg(best_score=("match_confidence", "max"), rows=("product", "size")).reset_index()
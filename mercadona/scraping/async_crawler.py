@@ -0,0 +1,203 @@
+# Import libraries
+import asyncio
+import time
+
+import pandas as pd
+
+from http_engine import API_URL, HttpEngine, product_to_row
+from output import typed_products
+
+# Default number of concurrent tasks per stage of the pipeline
+DEFAULT_CONCURRENCY = {"listing": 8, "products": 16}
+
+
+
+# Functions
+
+async def _fetch(engine, path, semaphore, retries=3, limiter=None):
+
+    """
+    Request a path of the API without blocking the event loop, limited by the semaphore of its stage and retried with exponential backoff when throttled.
+    If a rate limiter is passed, every request waits for it and reports its outcome to it (HTTP 429 as a throttle, any other failure as an error), and the limiter decides the backoff.
+
+    Args:
+        engine (HttpEngine): The engine whose pooled session is used.
+        path (str): The path to request.
+        semaphore (asyncio.Semaphore): The concurrency limit of the stage.
+        retries (int, optional): The number of retries when the request fails or the API answers HTTP 429. Defaults to 3.
+        limiter (AdaptiveRateLimiter, optional): Request rate controller shared by every stage. Defaults to None.
+
+    Returns:
+        dict: The decoded JSON response, or None if it kept failing or being throttled.
+    """
+
+    for attempt in range(retries + 1):
+        failed = False
+        async with semaphore:
+            if limiter is not None:
+                await limiter.acquire_async()
+            try:
+                data = await asyncio.to_thread(engine.get_json, path)
+            except Exception:
+                data, failed = None, True
+        if data is not None:
+            if limiter is not None:
+                limiter.on_success()
+            return data
+
+        # Only an HTTP 429 (get_json() returns None) means we are being throttled, other failures (timeouts, connection or parse errors) do not slow the rate down
+        if limiter is not None:
+            if failed:
+                limiter.on_error()
+            else:
+                limiter.on_throttle()
+        else:
+            await asyncio.sleep(0.5 * 2 ** attempt)
+    return None
+
+async def _join(queue, tasks):
+
+    """
+    Wait until every item of a queue has been processed, failing if any of the tasks of the pipeline stops (which would leave the queue waiting forever).
+
+    Args:
+        queue (asyncio.Queue): The queue to drain.
+        tasks (list): The tasks of every stage.
+    """
+
+    join = asyncio.create_task(queue.join())
+    done, pending = await asyncio.wait([join] + tasks, return_when=asyncio.FIRST_COMPLETED)
+    if join not in done:
+        join.cancel()
+        for task in done:
+            task.result()
+        raise RuntimeError("A stage of the crawl pipeline stopped unexpectedly")
+
+async def crawl_catalogue(zip, base_url=API_URL, concurrency=None, queue_size=200, batch_size=500, sink=None, fetch_details=True, rate_limiter=None, price_alerts=None):
+
+    """
+    Crawl the whole catalogue with an asyncio pipeline of three stages linked by bounded queues:
+
+        1. Category discovery: reads the category tree (replaces get_categories() and get_subcategories()) and queues every subcategory.
+        2. Subcategory listing: `concurrency["listing"]` tasks request the subcategories and queue every product listed.
+        3. Product fetch: `concurrency["products"]` tasks request the detail of every product and queue the resulting rows.
+
+    A writer task takes the rows in batches of `batch_size` and appends them to `sink`. Since every queue is bounded, a slow
+    writer makes the product tasks wait, which makes the listing tasks wait, so memory stays bounded (backpressure).
+    Requests are made with the pooled session of an HttpEngine, in worker threads so they do not block the event loop.
+
+    Args:
+        zip (str): The postal code used to find the nearest Mercadona store.
+        base_url (str, optional): The API root, e.g. the one of benchmarks/fake_storefront.py to run offline. Defaults to API_URL.
+        concurrency (dict, optional): The number of concurrent requests of the "listing" and "products" stages. Defaults to DEFAULT_CONCURRENCY.
+        queue_size (int, optional): The maximum number of items waiting between two stages. Defaults to 200.
+        batch_size (int, optional): The number of rows appended to the sink at once. Defaults to 500.
+        sink (CsvSink, optional): Where the rows are written (see output.py). If None, rows are kept in memory. Defaults to None.
+        fetch_details (bool, optional): If False, the product stage builds the rows from the subcategory listing without requesting every product. Defaults to True.
+        rate_limiter (AdaptiveRateLimiter, optional): If passed, every request of every stage goes through it (see throttling.py), otherwise only the concurrency limits apply. Defaults to None.
+        price_alerts (PriceChangeDetector, optional): Checks every batch of rows as it is written and emits an event for every price change (see price_alerts.py). Defaults to None.
+
+    Returns:
+        product_info (pandas.DataFrame): A DataFrame with the same columns as get_product_info() in scraper.py, with compact dtypes (see typed_products() in output.py).
+        stats (dict): The number of "subcategories", "products" and "failed" requests, and the "seconds" the crawl took.
+    """
+
+    concurrency = {**DEFAULT_CONCURRENCY, **(concurrency or {})}
+    start_time = time.perf_counter()
+
+    # One pooled session, big enough for every concurrent request
+    engine = HttpEngine(zip, base_url=base_url, pool_size=sum(concurrency.values()))
+    await asyncio.to_thread(engine.start)
+
+    # Bounded queues between the stages and per-stage concurrency limits
+    subcategory_queue = asyncio.Queue(maxsize=queue_size)
+    product_queue = asyncio.Queue(maxsize=queue_size)
+    row_queue = asyncio.Queue(maxsize=queue_size)
+    listing_limit = asyncio.Semaphore(concurrency["listing"])
+    product_limit = asyncio.Semaphore(concurrency["products"])
+
+    stats = {"subcategories": 0, "products": 0, "failed": 0}
+    rows_in_memory = []
+
+    async def discover():
+        tree = await asyncio.to_thread(engine.category_tree)
+        for category in tree:
+            for subcategory in category["categories"]:
+                await subcategory_queue.put((category["name"], subcategory["name"], subcategory["id"]))
+
+    async def list_subcategories():
+        while True:
+            category, subcategory, subcategory_id = await subcategory_queue.get()
+            data = await _fetch(engine, f"/categories/{subcategory_id}/", listing_limit, limiter=rate_limiter)
+            if data is None:
+                stats["failed"] += 1
+            else:
+                stats["subcategories"] += 1
+                for section in data.get("categories", []):
+                    for product in section.get("products", []):
+                        await product_queue.put((category, subcategory, product))
+            subcategory_queue.task_done()
+
+    async def fetch_products():
+        while True:
+            category, subcategory, product = await product_queue.get()
+            if fetch_details:
+                product = await _fetch(engine, f"/products/{product['id']}/", product_limit, limiter=rate_limiter)
+            if product is None:
+                stats["failed"] += 1
+            else:
+                await row_queue.put(product_to_row(product, category, subcategory))
+            product_queue.task_done()
+
+    async def write_rows():
+        batch = []
+        while True:
+            batch.append(await row_queue.get())
+            if len(batch) >= batch_size or row_queue.empty():
+                await write_batch(batch)
+                batch = []
+            row_queue.task_done()
+
+    async def write_batch(batch):
+        stats["products"] += len(batch)
+        if sink is None:
+            rows_in_memory.extend(batch)
+        else:
+            await asyncio.to_thread(sink.append, pd.DataFrame(batch))
+        if price_alerts is not None:
+            await asyncio.to_thread(price_alerts.check, pd.DataFrame(batch))
+
+    # Start every stage, then wait for the queues to drain in order
+    tasks = [asyncio.create_task(list_subcategories()) for _ in range(concurrency["listing"])]
+    tasks += [asyncio.create_task(fetch_products()) for _ in range(concurrency["products"])]
+    tasks.append(asyncio.create_task(write_rows()))
+    try:
+        await discover()
+        await _join(subcategory_queue, tasks)
+        await _join(product_queue, tasks)
+        await _join(row_queue, tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        engine.close()
+
+    stats["seconds"] = time.perf_counter() - start_time
+    product_info = typed_products(pd.DataFrame(rows_in_memory)) if sink is None else sink.read(typed=True)
+    return product_info, stats
+
+def async_full_scraper(zip, **kwargs):
+
+    """
+    Run crawl_catalogue() from synchronous code (e.g. a script). In a Jupyter notebook, where an event loop is already running, use `await crawl_catalogue(...)` instead.
+
+    Args:
+        zip (str): The postal code used to find the nearest Mercadona store.
+        **kwargs: See crawl_catalogue().
+
+    Returns:
+        product_info (pandas.DataFrame): A DataFrame with the same columns as get_product_info() in scraper.py.
+        stats (dict): See crawl_catalogue().
+    """
+
+    return asyncio.run(crawl_catalogue(zip, **kwargs))
@@ -0,0 +1,89 @@
+# Import libraries
+import datetime
+import json
+import os
+
+# Folder where the category trees are cached
+CACHE_DIR = os.path.join('scraping_output', 'category_cache')
+
+
+
+# Functions
+
+def cache_path(postal_code, cache_dir=CACHE_DIR):
+
+    """
+    Returns:
+        str: The path of the cached category tree of a postal code.
+    """
+
+    return os.path.join(cache_dir, f"categories_{postal_code}.json")
+
+def save_category_tree(postal_code, jobs, cache_dir=CACHE_DIR):
+
+    """
+    Save the category tree discovered for a postal code, atomically (write a temporary file, then replace the old one).
+
+    Args:
+        postal_code (str): The postal code the tree was discovered for.
+        jobs (list): The (category, subcategory) tuples discovered, in order.
+        cache_dir (str, optional): The folder of the cache. Defaults to CACHE_DIR.
+    """
+
+    os.makedirs(cache_dir, exist_ok=True)
+    path = cache_path(postal_code, cache_dir)
+    data = {
+        "postal_code": postal_code,
+        "discovered": datetime.datetime.now().isoformat(),
+        "jobs": [list(job) for job in jobs],
+    }
+    with open(path + ".tmp", 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(path + ".tmp", path)
+
+def load_category_tree(postal_code, ttl_days=30, cache_dir=CACHE_DIR):
+
+    """
+    Load the cached category tree of a postal code if it is fresh.
+
+    Args:
+        postal_code (str): The postal code being scraped.
+        ttl_days (float, optional): The maximum age of the cached tree, in days. Defaults to 30.
+        cache_dir (str, optional): The folder of the cache. Defaults to CACHE_DIR.
+
+    Returns:
+        list: The cached (category, subcategory) tuples, or None if there is no cache or it is older than ttl_days.
+    """
+
+    path = cache_path(postal_code, cache_dir)
+    if not os.path.exists(path):
+        return None
+
+    try:
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        age = datetime.datetime.now() - datetime.datetime.fromisoformat(data["discovered"])
+    except:
+        return None
+
+    if age > datetime.timedelta(days=ttl_days):
+        return None
+    return [tuple(job) for job in data["jobs"]]
+
+def tree_matches(jobs, categories):
+
+    """
+    Cheap validation of a cached tree: the categories listed by the website (a single page) must be the same, in the same order, as the cached ones.
+
+    Args:
+        jobs (list): The cached (category, subcategory) tuples.
+        categories (list): The category names currently listed by the website.
+
+    Returns:
+        bool: True if the cached tree can be used.
+    """
+
+    cached_categories = list(dict.fromkeys(category for category, subcategory in jobs))
+    return cached_categories == list(categories)
@@ -0,0 +1,204 @@
+# Import libraries
+import datetime
+import glob
+import json
+import os
+import threading
+
+
+
+# Classes
+
+class CrawlCheckpoint:
+
+    """
+    Persistent manifest of a full scrape, used to resume an interrupted crawl where it stopped.
+
+    The manifest is a JSON file saved next to the CSV output ("<session_name>.checkpoint.json") that records the session name,
+    the postal code, the list of (category, subcategory) jobs discovered, the jobs already completed, the number of failed
+    attempts per job and the jobs that ended up missing. It is rewritten atomically after every change, so a crash can
+    never leave it half written.
+
+    Args:
+        path (str): The path of the JSON manifest.
+        session_name (str): The name of the crawl session, also used for the CSV output.
+        postal_code (str): The postal code being scraped.
+    """
+
+    def __init__(self, path, session_name, postal_code):
+        self.path = path
+        self.session_name = session_name
+        self.postal_code = postal_code
+        self.created = datetime.datetime.now().isoformat()
+        self.finished = False
+        self.jobs = []
+        self.completed = set()
+        self.failures = {}
+        self.missing = []
+        self._lock = threading.RLock()
+
+    @classmethod
+    def create(cls, output_dir, session_name, postal_code):
+
+        """
+        Create and save a new manifest for a crawl session.
+
+        Args:
+            output_dir (str): The directory where the crawl output is written.
+            session_name (str): The name of the crawl session.
+            postal_code (str): The postal code being scraped.
+
+        Returns:
+            CrawlCheckpoint: The new manifest.
+        """
+
+        checkpoint = cls(os.path.join(output_dir, f"{session_name}.checkpoint.json"), session_name, postal_code)
+        checkpoint.save()
+        return checkpoint
+
+    @classmethod
+    def load(cls, path):
+
+        """
+        Load a manifest from disk.
+
+        Args:
+            path (str): The path of the JSON manifest.
+
+        Returns:
+            CrawlCheckpoint: The loaded manifest.
+        """
+
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+
+        checkpoint = cls(path, data["session_name"], data["postal_code"])
+        checkpoint.created = data["created"]
+        checkpoint.finished = data["finished"]
+        checkpoint.jobs = [tuple(job) for job in data["jobs"]]
+        checkpoint.completed = set(tuple(job) for job in data["completed"])
+        checkpoint.failures = {(f["category"], f["subcategory"]): f["failures"] for f in data["failures"]}
+        checkpoint.missing = [tuple(job) for job in data["missing"]]
+        return checkpoint
+
+    @classmethod
+    def find(cls, output_dir, postal_code, session_name=None):
+
+        """
+        Find the manifest of a crawl to resume.
+
+        Args:
+            output_dir (str): The directory where the crawl output is written.
+            postal_code (str): The postal code being scraped. Only manifests for this postal code are considered.
+            session_name (str, optional): The session to resume. If None, the most recent unfinished session is used. Defaults to None.
+
+        Returns:
+            CrawlCheckpoint: The manifest found, or None if there is nothing to resume.
+        """
+
+        # A specific session was asked for
+        if session_name is not None:
+            path = os.path.join(output_dir, f"{session_name}.checkpoint.json")
+            return cls.load(path) if os.path.exists(path) else None
+
+        # Otherwise look for the latest unfinished session for this postal code
+        candidates = [cls.load(path) for path in glob.glob(os.path.join(output_dir, "*.checkpoint.json"))]
+        candidates = [c for c in candidates if c.postal_code == postal_code and not c.finished]
+        if not candidates:
+            return None
+        return max(candidates, key=lambda c: c.created)
+
+    def save(self):
+
+        """
+        Write the manifest to disk atomically (write a temporary file, then replace the old one).
+        """
+
+        with self._lock:
+            data = {
+                "session_name": self.session_name,
+                "postal_code": self.postal_code,
+                "created": self.created,
+                "finished": self.finished,
+                "jobs": [list(job) for job in self.jobs],
+                "completed": [list(job) for job in self.jobs if job in self.completed],
+                "failures": [{"category": c, "subcategory": s, "failures": n} for (c, s), n in self.failures.items()],
+                "missing": [list(job) for job in self.missing],
+            }
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, indent=1)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+
+    def set_jobs(self, jobs):
+
+        """
+        Record the (category, subcategory) jobs of the crawl, so that a resumed crawl does not need to discover them again.
+
+        Args:
+            jobs (list): A list of (category, subcategory) tuples.
+        """
+
+        with self._lock:
+            self.jobs = [tuple(job) for job in jobs]
+            self.save()
+
+    def pending_jobs(self):
+
+        """
+        Returns:
+            list: The (category, subcategory) jobs that have not been completed yet, in their original order.
+        """
+
+        with self._lock:
+            return [job for job in self.jobs if job not in self.completed]
+
+    def mark_completed(self, category, subcategory):
+
+        """
+        Record that a subcategory was scraped and written to the output.
+        """
+
+        with self._lock:
+            self.completed.add((category, subcategory))
+            if (category, subcategory) in self.missing:
+                self.missing.remove((category, subcategory))
+            self.save()
+
+    def record_failure(self, category, subcategory):
+
+        """
+        Record a failed attempt to scrape a subcategory.
+
+        Returns:
+            int: The total number of failed attempts for this subcategory, across all runs.
+        """
+
+        job = (category, subcategory)
+        with self._lock:
+            self.failures[job] = self.failures.get(job, 0) + 1
+            self.save()
+            return self.failures[job]
+
+    def mark_missing(self, category, subcategory):
+
+        """
+        Record that a subcategory ran out of retries. It will be tried again if the crawl is resumed.
+        """
+
+        with self._lock:
+            if (category, subcategory) not in self.missing:
+                self.missing.append((category, subcategory))
+            self.save()
+
+    def finish(self):
+
+        """
+        Mark the crawl as finished, so that it is not picked up again by find().
+        """
+
+        with self._lock:
+            self.finished = True
+            self.save()
@@ -0,0 +1,313 @@
+# Import libraries
+import datetime
+import time
+
+import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from metrics import count, timed
+
+# JSON API behind tienda.mercadona.es
+API_URL = 'https://tienda.mercadona.es/api'
+
+
+
+# Functions
+
+def format_number(value):
+
+    """
+    Format a number the way the website displays it: decimal comma and no trailing zeros (e.g. 4.726 -> "4,726", 5.0 -> "5").
+
+    Args:
+        value (float or str): The number to format.
+
+    Returns:
+        str: The formatted number.
+    """
+
+    return f"{float(value):g}".replace(".", ",")
+
+def format_price(value):
+
+    """
+    Format a price the way the website displays it: decimal comma and two or three decimals (e.g. 10 -> "10,00", 4.726 -> "4,726").
+
+    Args:
+        value (float or str): The price to format.
+
+    Returns:
+        str: The formatted price.
+    """
+
+    price = f"{float(value):.3f}"
+    if price.endswith("0"):
+        price = price[:-1]
+    return price.replace(".", ",")
+
+def product_to_row(product, category, subcategory):
+
+    """
+    Convert a product of the JSON API to a row with the same columns (and the same text formats) as get_product_info() in scraper.py.
+
+    Args:
+        product (dict): A product as returned by the API.
+        category (str): The name of the category the product was listed in.
+        subcategory (str): The name of the subcategory the product was listed in.
+
+    Returns:
+        dict: The product name, type, volume, price per unit, price, unit, category, subcategory, URL, product code and the collected timestamp.
+    """
+
+    price = product.get("price_instructions", {})
+    info_prod = {}
+
+    # Name, type (packaging) and volume (e.g. "5 L", "500 g")
+    info_prod["product"] = product.get("display_name") or "Not available"
+    info_prod["product_type"] = product.get("packaging") or "Not available"
+    if price.get("unit_size") and price.get("size_format"):
+        size_format = "L" if price["size_format"] == "l" else price["size_format"]
+        info_prod["product_volume"] = f"{format_number(price['unit_size'])} {size_format}"
+    else:
+        info_prod["product_volume"] = "Not available"
+
+    # Price per unit (e.g. "4,726 €/L")
+    if price.get("reference_price") and price.get("reference_format"):
+        info_prod["product_price_per_unit"] = f"{format_price(price['reference_price'])} €/{price['reference_format']}"
+    else:
+        info_prod["product_price_per_unit"] = "Not available"
+
+    # Product price
+    try:
+        info_prod["product_price"] = float(price["unit_price"])
+    except:
+        info_prod["product_price"] = "Not Available"
+
+    # Product unit, as shown next to the price in the website ("ud", "pack" or "kg")
+    if price.get("is_pack"):
+        info_prod["product_unit"] = "pack"
+    elif price.get("selling_method") == 2:
+        info_prod["product_unit"] = "kg"
+    else:
+        info_prod["product_unit"] = "ud"
+
+    # Category, subcategory, url, product code and scraped time
+    info_prod["product_category"] = category
+    info_prod["product_subcategory"] = subcategory
+    info_prod["product_url"] = product.get("share_url") or "Not available"
+    info_prod["product_code"] = str(product["id"])
+    info_prod["collected_timestamp"] = datetime.datetime.now()
+
+    return info_prod
+
+
+
+# Classes
+
+class HttpEngine:
+
+    """
+    Scraping engine that reads the catalogue from the JSON API used by the website, instead of driving a browser.
+
+    All the requests go through a single requests.Session with a pool of keep-alive connections, and the products of a
+    subcategory come in a single response, so a subcategory costs one request instead of one page transition per product.
+    It returns the same DataFrame columns as get_product_info() in scraper.py.
+
+    Args:
+        zip (str): The postal code used to find the nearest Mercadona store (warehouse).
+        base_url (str, optional): The API root. Pointing it to a local stub server (see benchmarks/fake_storefront.py) allows running offline. Defaults to API_URL.
+        lang (str, optional): The language of the catalogue. Defaults to 'es'.
+        timeout (float, optional): The timeout of every request, in seconds. Defaults to 10.
+        pool_size (int, optional): The maximum number of keep-alive connections kept open. Defaults to 10.
+    """
+
+    name = "http"
+
+    def __init__(self, zip, base_url=API_URL, lang='es', timeout=10, pool_size=10):
+        self.zip = zip
+        self.base_url = base_url.rstrip('/')
+        self.lang = lang
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.warehouse = None
+        self.session = None
+        self._categories = None
+
+    def start(self):
+
+        """
+        Open the pooled HTTP session and set the postal code, which tells the API the warehouse that serves it.
+        """
+
+        # Pooled keep-alive session, retrying connection errors and server errors (but not 429, which means we are being throttled)
+        self.session = requests.Session()
+        retries = Retry(total=3, backoff_factor=0.5, status_forcelist=[500, 502, 503, 504])
+        adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size, max_retries=retries)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        # Set the postal code and keep the warehouse it resolves to
+        with timed("postal_code"):
+            response = self.session.put(f"{self.base_url}/postal-codes/actions/change-pc/", json={"new_postal_code": self.zip}, timeout=self.timeout)
+        response.raise_for_status()
+        self.warehouse = response.headers.get('x-customer-wh')
+
+    def get_json(self, path):
+
+        """
+        Request a path of the API for the configured warehouse.
+
+        Args:
+            path (str): The path to request, relative to base_url (e.g. "/categories/").
+
+        Returns:
+            dict: The decoded JSON response, or None if the API is throttling requests (HTTP 429).
+        """
+
+        if self.session is None:
+            self.start()
+
+        params = {"lang": self.lang}
+        if self.warehouse:
+            params["wh"] = self.warehouse
+
+        with timed("api_request"):
+            response = self.session.get(f"{self.base_url}{path}", params=params, timeout=self.timeout)
+        if response.status_code == 429:
+            return None
+        response.raise_for_status()
+        return response.json()
+
+    def category_tree(self, retries=4, backoff=2):
+
+        """
+        Request the category tree of the store, once (it is cached). If the API is throttling requests, the request is repeated after a pause that doubles every time.
+
+        Args:
+            retries (int, optional): The number of times the request is made while the API is throttling. Defaults to 4.
+            backoff (float, optional): The pause after the first throttled request, in seconds. Defaults to 2.
+
+        Returns:
+            list: The categories of the store, each one with its subcategories under "categories", as returned by the API.
+
+        Raises:
+            requests.HTTPError: If the API is still throttling after every attempt, or answers with an error.
+        """
+
+        for attempt in range(retries):
+            if self._categories is not None:
+                break
+
+            # Pause and try again while the API is throttling (HTTP 429)
+            data = self.get_json("/categories/")
+            if data is None:
+                count("throttle_events")
+                if attempt < retries - 1:
+                    with timed("sleep"):
+                        time.sleep(backoff * 2**attempt)
+                continue
+            self._categories = data["results"]
+
+        if self._categories is None:
+            raise requests.HTTPError(f"The API is throttling requests (HTTP 429), the category tree could not be read after {retries} attempts")
+        return self._categories
+
+    def get_categories(self):
+
+        """
+        Returns:
+            list: A list of strings containing the name of each category.
+        """
+
+        return [category["name"] for category in self.category_tree()]
+
+    def get_subcategories(self, category):
+
+        """
+        Args:
+            category (str): The name of the category.
+
+        Returns:
+            list: A list of strings containing the name of every subcategory of the given category.
+        """
+
+        for item in self.category_tree():
+            if item["name"] == category:
+                return [subcategory["name"] for subcategory in item["categories"]]
+        raise KeyError(f'Category "{category}" not found')
+
+    def subcategory_id(self, category, subcategory):
+
+        """
+        Returns:
+            int: The API id of a subcategory, given its name and the name of its category.
+        """
+
+        for item in self.category_tree():
+            if item["name"] == category:
+                for sub in item["categories"]:
+                    if sub["name"] == subcategory:
+                        return sub["id"]
+        raise KeyError(f'Subcategory "{subcategory}" not found in category "{category}"')
+
+    def get_product_info(self, category, subcategory, throttle=None, on_success=None, **kwargs):
+
+        """
+        Scrape every product of a subcategory with a single request.
+
+        Args:
+            category (str): The category of products to search for.
+            subcategory (str): The subcategory of products to search for.
+            throttle (callable, optional): Called before every product page request by the browser engine. The whole subcategory comes in one request here, so it is not called (rate limiting that request is up to the caller). Defaults to None.
+            on_success (callable, optional): Called after every product page loaded by the browser engine. Not called here either (reporting the request is up to the caller). Defaults to None.
+            **kwargs: Options only used by the browser engine (e.g. wait or mode), ignored.
+
+        Returns:
+            ret_df (pandas.DataFrame): A DataFrame with the same columns as get_product_info() in scraper.py.
+            product_count (int): The number of products scraped.
+            If the API is throttling requests, the string "error" is returned instead.
+        """
+
+        data = self.get_json(f"/categories/{self.subcategory_id(category, subcategory)}/")
+        if data is None:
+            return "error"
+
+        # Products are grouped in sections inside the subcategory
+        list_of_dicts = []
+        for section in data.get("categories", []):
+            for product in section.get("products", []):
+                list_of_dicts.append(product_to_row(product, category, subcategory))
+
+        return pd.DataFrame(list_of_dicts), len(list_of_dicts)
+
+    def is_alive(self):
+
+        """
+        Returns:
+            bool: True if the HTTP session is open.
+        """
+
+        return self.session is not None
+
+    def restart(self):
+
+        """
+        Close the HTTP session (if any) and open a new one. Only replacing a session counts as a session restart, not opening the first one.
+        """
+
+        if self.session is not None:
+            count("session_restarts")
+        self.close()
+        self.start()
+
+    def close(self):
+
+        """
+        Close the HTTP session and its pooled connections.
+        """
+
+        if self.session is not None:
+            self.session.close()
+        self.session = None
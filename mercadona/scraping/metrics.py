@@ -0,0 +1,302 @@
+# Import libraries
+import contextlib
+import datetime
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Prefix of the metric names in the Prometheus text format
+PROMETHEUS_PREFIX = 'mercadona_crawl'
+
+# Collector the scraping functions report to, set with activate() for the duration of a crawl
+_active = None
+
+
+
+# Classes
+
+class CrawlMetrics:
+
+    """
+    Timers and counters of a crawl, shared by all of its workers.
+
+    Stages are the steps a crawl spends its time in (e.g. "driver_start", "postal_code", "category_click", "field_lookup",
+    "back_navigation", "sleep", "rate_limit_wait"): every timed call adds to the number of calls, the total seconds and the
+    longest call of its stage. Stages do not overlap, so their totals add up to the time the workers spent (see summary()).
+    Counters are the events of a crawl (e.g. "products", "retries", "throttle_events", "missing_subcategories").
+
+    The scraping functions report to the collector made active with activate(), through the timed() and count() functions
+    of this module, so they do not need it as an argument. Without an active collector they record nothing.
+
+    Args:
+        session_name (str, optional): The name of the crawl session. Defaults to None.
+        workers (int, optional): The number of workers of the crawl, used to compute the share of every stage. Defaults to 1.
+    """
+
+    def __init__(self, session_name=None, workers=1):
+        self.session_name = session_name
+        self.workers = workers
+        self.started = datetime.datetime.now().isoformat()
+        self.stages = {}
+        self.counters = {}
+        self._start = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def record(self, stage, seconds):
+
+        """
+        Add a call of a stage.
+
+        Args:
+            stage (str): The name of the stage.
+            seconds (float): The time the call took.
+        """
+
+        with self._lock:
+            calls, total, longest = self.stages.get(stage, (0, 0.0, 0.0))
+            self.stages[stage] = (calls + 1, total + seconds, max(longest, seconds))
+
+    @contextlib.contextmanager
+    def timer(self, stage):
+
+        """
+        Time the block of a with statement as a call of a stage (also when it raises an exception).
+
+        Args:
+            stage (str): The name of the stage.
+        """
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - start)
+
+    def count(self, counter, n=1):
+
+        """
+        Add to a counter.
+
+        Args:
+            counter (str): The name of the counter.
+            n (int, optional): The amount to add. Defaults to 1.
+        """
+
+        with self._lock:
+            self.counters[counter] = self.counters.get(counter, 0) + n
+
+    @property
+    def elapsed(self):
+
+        """
+        float: The seconds since the collector was created.
+        """
+
+        return time.perf_counter() - self._start
+
+    def to_dict(self):
+
+        """
+        Returns:
+            dict: The "session_name", "started", "elapsed_seconds", "workers", the "stages" (with their "calls", "seconds" and "max_seconds") and the "counters".
+        """
+
+        with self._lock:
+            return {
+                "session_name": self.session_name,
+                "started": self.started,
+                "elapsed_seconds": round(self.elapsed, 3),
+                "workers": self.workers,
+                "stages": {stage: {"calls": calls, "seconds": round(total, 3), "max_seconds": round(longest, 3)} for stage, (calls, total, longest) in sorted(self.stages.items())},
+                "counters": dict(sorted(self.counters.items())),
+            }
+
+    def save(self, path):
+
+        """
+        Write the metrics to a JSON file atomically (write a temporary file, then replace the old one), so it can be read while the crawl runs.
+
+        Args:
+            path (str): The path of the JSON file.
+        """
+
+        data = self.to_dict()
+        with open(path + ".tmp", 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=1)
+        os.replace(path + ".tmp", path)
+
+    def prometheus(self):
+
+        """
+        Format the metrics in the Prometheus text format.
+
+        Returns:
+            str: The seconds and calls of every stage, the counters and the elapsed time.
+        """
+
+        data = self.to_dict()
+        lines = [
+            f"# HELP {PROMETHEUS_PREFIX}_stage_seconds_total Time spent in every stage of the crawl.",
+            f"# TYPE {PROMETHEUS_PREFIX}_stage_seconds_total counter",
+        ]
+        lines += [f'{PROMETHEUS_PREFIX}_stage_seconds_total{{stage="{stage}"}} {values["seconds"]}' for stage, values in data["stages"].items()]
+        lines += [
+            f"# HELP {PROMETHEUS_PREFIX}_stage_calls_total Number of calls of every stage of the crawl.",
+            f"# TYPE {PROMETHEUS_PREFIX}_stage_calls_total counter",
+        ]
+        lines += [f'{PROMETHEUS_PREFIX}_stage_calls_total{{stage="{stage}"}} {values["calls"]}' for stage, values in data["stages"].items()]
+        lines += [
+            f"# HELP {PROMETHEUS_PREFIX}_events_total Events of the crawl.",
+            f"# TYPE {PROMETHEUS_PREFIX}_events_total counter",
+        ]
+        lines += [f'{PROMETHEUS_PREFIX}_events_total{{event="{counter}"}} {value}' for counter, value in data["counters"].items()]
+        lines += [
+            f"# HELP {PROMETHEUS_PREFIX}_elapsed_seconds Time since the crawl started.",
+            f"# TYPE {PROMETHEUS_PREFIX}_elapsed_seconds gauge",
+            f"{PROMETHEUS_PREFIX}_elapsed_seconds {data['elapsed_seconds']}",
+        ]
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port=9108):
+
+        """
+        Serve the metrics in the Prometheus text format at http://127.0.0.1:<port>/metrics, from a background thread.
+
+        Args:
+            port (int, optional): The port to listen on, 0 picks a free one. Defaults to 9108.
+
+        Returns:
+            ThreadingHTTPServer: The running server, stop it with server.shutdown().
+        """
+
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = metrics.prometheus().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        server = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+    def summary(self):
+
+        """
+        Break down where the time of the crawl went, stage by stage, slowest first.
+        The share of every stage is relative to the time of all the workers (elapsed time times workers), and the time not spent in any stage is shown as "(other)".
+
+        Returns:
+            str: The breakdown, followed by the counters.
+        """
+
+        data = self.to_dict()
+        worker_seconds = max(data["elapsed_seconds"] * max(self.workers, 1), 1e-9)
+        lines = [f"Crawl breakdown ({self.workers} worker{'s' if self.workers != 1 else ''}, {data['elapsed_seconds'] / 60:.2f} minutes):", f"{'stage':<20}{'calls':>9}{'total':>12}{'mean':>11}{'max':>11}{'share':>8}"]
+        for stage, values in sorted(data["stages"].items(), key=lambda item: -item[1]["seconds"]):
+            mean = values["seconds"] / max(values["calls"], 1)
+            lines.append(f"{stage:<20}{values['calls']:>9,}{format_seconds(values['seconds']):>12}{format_seconds(mean):>11}{format_seconds(values['max_seconds']):>11}{values['seconds'] / worker_seconds:>8.1%}")
+        other = max(worker_seconds - sum(values["seconds"] for values in data["stages"].values()), 0)
+        lines.append(f"{'(other)':<20}{'':>9}{format_seconds(other):>12}{'':>11}{'':>11}{other / worker_seconds:>8.1%}")
+        if data["counters"]:
+            lines.append("Events: " + ", ".join(f"{counter}={value:,}" for counter, value in data["counters"].items()))
+        return "\n".join(lines)
+
+
+
+# Functions
+
+def format_seconds(seconds):
+
+    """
+    Format a duration for the summary, in the most readable unit (e.g. "850 ms", "12.3 s", "4.5 min", "1.2 h").
+
+    Args:
+        seconds (float): The duration in seconds.
+
+    Returns:
+        str: The formatted duration.
+    """
+
+    if seconds < 1:
+        return f"{seconds * 1000:.0f} ms"
+    if seconds < 60:
+        return f"{seconds:.1f} s"
+    if seconds < 3600:
+        return f"{seconds / 60:.1f} min"
+    return f"{seconds / 3600:.1f} h"
+
+def activate(metrics):
+
+    """
+    Make a collector the one the scraping functions report to (see timed() and count()).
+
+    Args:
+        metrics (CrawlMetrics or None): The collector, or None to stop recording.
+
+    Returns:
+        CrawlMetrics: The collector that was active before, to restore it when the crawl ends.
+    """
+
+    global _active
+    previous, _active = _active, metrics
+    return previous
+
+def timed(stage):
+
+    """
+    Time the block of a with statement as a call of a stage of the active collector (nothing is recorded if there is none).
+
+    Args:
+        stage (str): The name of the stage.
+
+    Returns:
+        A context manager.
+    """
+
+    return _active.timer(stage) if _active is not None else contextlib.nullcontext()
+
+def timed_function(stage, function):
+
+    """
+    Wrap a function so that every call is timed as a call of a stage of the active collector (e.g. the rate limiter passed as `throttle` to get_product_info()).
+
+    Args:
+        stage (str): The name of the stage.
+        function (callable): The function to wrap.
+
+    Returns:
+        callable: The wrapped function.
+    """
+
+    def wrapper(*args, **kwargs):
+        with timed(stage):
+            return function(*args, **kwargs)
+    return wrapper
+
+def count(counter, n=1):
+
+    """
+    Add to a counter of the active collector (nothing is recorded if there is none).
+
+    Args:
+        counter (str): The name of the counter.
+        n (int, optional): The amount to add. Defaults to 1.
+    """
+
+    if _active is not None:
+        _active.count(counter, n)
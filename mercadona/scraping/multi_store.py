@@ -0,0 +1,194 @@
+# Import libraries
+import datetime
+import multiprocessing.util
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+import requests
+from selenium.common.exceptions import TimeoutException
+
+from http_engine import API_URL, HttpEngine
+from output import CsvSink
+from scraper import create_engine, discover_jobs
+from throttling import AdaptiveRateLimiter
+
+# Engines and rate limiter of the current worker process, created by _init_process()
+_process_engines = {}
+_process_settings = {}
+
+
+
+# Functions
+
+def resolve_warehouses(postal_codes, base_url=API_URL):
+
+    """
+    Find the warehouse that serves every postal code. Postal codes served by the same warehouse see the same catalogue and prices, so it only needs to be scraped once for all of them.
+    It costs a single request per postal code to the JSON API (see HttpEngine.start()).
+
+    Args:
+        postal_codes (list): The postal codes to scrape.
+        base_url (str, optional): The API root. Defaults to API_URL.
+
+    Returns:
+        dict: A dictionary with every warehouse as keys and the list of postal codes it serves as values. A postal code whose warehouse can not be resolved is kept as its own store.
+    """
+
+    stores = {}
+    for zip in dict.fromkeys(postal_codes):
+        engine = HttpEngine(zip, base_url=base_url)
+        try:
+            engine.start()
+            warehouse = engine.warehouse or zip
+        except:
+            warehouse = zip
+        finally:
+            engine.close()
+        stores.setdefault(warehouse, []).append(zip)
+    return stores
+
+def _init_process(engine, headless, engine_kwargs, max_rate):
+
+    """
+    Set up a worker process of the pool: engines are created lazily, one per postal code, and every process gets its own share of the request rate.
+    """
+
+    _process_settings.update({"engine": engine, "headless": headless, "engine_kwargs": engine_kwargs})
+    _process_settings["limiter"] = AdaptiveRateLimiter(max_rate / 2, max_rate / 10, max_rate, backoff_min=60, backoff_max=300, jitter=30)
+
+    # Close the engines (and their browsers) when the process exits
+    multiprocessing.util.Finalize(None, _close_process_engines, exitpriority=10)
+
+def _close_process_engines():
+    for engine in _process_engines.values():
+        try:
+            engine.close()
+        except:
+            pass
+    _process_engines.clear()
+
+def _scrape_store_job(zip, category, subcategory, retry, product_kwargs):
+
+    """
+    Scrape a subcategory of a store in a worker process, with the engine of that postal code owned by the process.
+
+    Args:
+        zip (str): The postal code of the store.
+        category (str): The category to scrape.
+        subcategory (str): The subcategory to scrape.
+        retry (int): The number of times to try scraping the subcategory.
+        product_kwargs (dict): Extra arguments passed to get_product_info() (e.g. wait or mode).
+
+    Returns:
+        pandas.DataFrame: The products of the subcategory, or None if every attempt failed.
+    """
+
+    limiter = _process_settings["limiter"]
+    if zip not in _process_engines:
+        _process_engines[zip] = create_engine(_process_settings["engine"], zip, headless=_process_settings["headless"], **_process_settings["engine_kwargs"])
+    engine = _process_engines[zip]
+
+    for attempt in range(retry):
+        result = None
+        try:
+            limiter.acquire()
+            result = engine.get_product_info(category, subcategory, throttle=limiter.acquire, on_success=limiter.on_success, **product_kwargs)
+        except (TimeoutException, requests.Timeout):
+            limiter.on_throttle()
+            continue
+        except:
+            limiter.on_error()
+            continue
+
+        # The website is throttling us, slow down and retry
+        if isinstance(result, str):
+            limiter.on_throttle()
+            continue
+
+        products, product_count = result
+        limiter.on_success()
+        return products
+
+    return None
+
+def multi_store_scraper(postal_codes, processes=None, retry=4, prod_wait=0, headless=True, max_requests_per_minute=60, mode="detail", engine="selenium", engine_kwargs=None, category_ttl_days=30, snapshot_dir='scraping_output/snapshots'):
+
+    """
+    Scrape the products of several postal codes in a single crawl, sharding the (store, subcategory) jobs across a pool of processes.
+
+    Postal codes are first grouped by the warehouse that serves them (see resolve_warehouses()): every warehouse is crawled
+    once, with one of its postal codes, and its rows are written once for every postal code it serves. Categories are
+    discovered once per warehouse (see discover_jobs()), and then every (postal code, category, subcategory) job is scraped
+    by the pool, where every process keeps one session per postal code and its share of max_requests_per_minute.
+    The rows are appended to "scraping_output/Mercadona Multi-store Scraping <timestamp>.csv" as soon as every job finishes.
+
+    Args:
+        postal_codes (list): The postal codes to scrape.
+        processes (int, optional): The number of worker processes. Defaults to the number of CPUs.
+        retry (int, optional): The number of times to try scraping a subcategory. Defaults to 4.
+        prod_wait (float, optional): The amount of time to wait for the page to load before scraping product information, in seconds. Defaults to 0.
+        headless (bool, optional): Whether to run the browsers in headless mode. Defaults to True.
+        max_requests_per_minute (float, optional): Ceiling for the number of page requests per minute across all processes. Defaults to 60.
+        mode (str, optional): "detail" or "grid", see get_product_info(). There is no previous snapshot here, so on the website "grid" still opens every product. Defaults to "detail".
+        engine (str, optional): "selenium" or "http", see create_engine(). Defaults to "selenium".
+        engine_kwargs (dict, optional): Extra arguments for the engines (e.g. {"base_url": ...} for the "http" engine). Defaults to None.
+        category_ttl_days (float, optional): How long a cached category tree is reused, in days. Defaults to 30.
+        snapshot_dir (str, optional): The snapshot store where the products are also written (see snapshot_store.py). None only writes the CSV file. Defaults to 'scraping_output/snapshots'.
+
+    Returns:
+        product_info (pandas.DataFrame): A long format DataFrame with the columns of get_product_info() plus "postal_code" and "warehouse", with compact dtypes (see typed_products() in output.py).
+        missing_subcategories (pandas.DataFrame): The warehouse, postal codes, category and subcategory of every job that failed.
+    """
+
+    engine_kwargs = engine_kwargs or {}
+    processes = processes or os.cpu_count()
+    start_time = time.time()
+    timestamp = datetime.datetime.now().strftime('%Y-%m-%d_%H-%M-%S')
+
+    # Group the postal codes by warehouse, so that identical catalogues are only scraped once
+    stores = resolve_warehouses(postal_codes, base_url=engine_kwargs.get("base_url", API_URL))
+    print(f"{len(postal_codes)} postal codes served by {len(stores)} warehouses.")
+
+    # Discover the subcategories of every warehouse with one of its postal codes
+    jobs = []
+    for warehouse, zips in stores.items():
+        discovery_engine = create_engine(engine, zips[0], headless=headless, **engine_kwargs)
+        try:
+            jobs += [(warehouse, zips[0], category, subcategory) for category, subcategory in discover_jobs(discovery_engine, zips[0], category_ttl_days=category_ttl_days)]
+        finally:
+            discovery_engine.close()
+
+    # Shard the jobs across the pool and write every result as it arrives, once per postal code of its warehouse
+    sink = CsvSink(f'scraping_output/Mercadona Multi-store Scraping {timestamp}.csv')
+    missing_subcats = []
+    product_kwargs = {"wait": prod_wait, "mode": mode}
+    with ProcessPoolExecutor(max_workers=processes, initializer=_init_process, initargs=(engine, headless, engine_kwargs, max_requests_per_minute / 60 / processes)) as executor:
+        futures = {executor.submit(_scrape_store_job, zip, category, subcategory, retry, product_kwargs): (warehouse, category, subcategory) for warehouse, zip, category, subcategory in jobs}
+        for n, future in enumerate(as_completed(futures)):
+            warehouse, category, subcategory = futures[future]
+            try:
+                products = future.result()
+            except:
+                products = None
+
+            if products is None:
+                missing_subcats.append({"warehouse": warehouse, "postal_codes": ", ".join(stores[warehouse]), "category": category, "subcategory": subcategory})
+            else:
+                sink.append(pd.concat([products.assign(postal_code=zip, warehouse=warehouse) for zip in stores[warehouse]], ignore_index=True))
+
+            # Give feedback to the user
+            print(f'\rTime: {round((time.time()-start_time)/60,2)} - {n+1} of {len(jobs)} subcategories done, {len(missing_subcats)} missing, {sink.rows_written} rows written...          ', end='')
+            sys.stdout.flush()
+
+    print()
+    product_info = sink.read(typed=True)
+
+    # Add the crawl to the snapshot store (pyarrow is only needed here)
+    if snapshot_dir is not None:
+        from snapshot_store import write_snapshot
+        write_snapshot(product_info, root=snapshot_dir, started=datetime.datetime.fromtimestamp(start_time))
+
+    return product_info, pd.DataFrame(missing_subcats)
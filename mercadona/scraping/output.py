@@ -0,0 +1,129 @@
+# Import libraries
+import os
+import threading
+
+import pandas as pd
+
+# Columns with few distinct values, stored as categoricals by typed_products()
+CATEGORY_COLUMNS = ["product_type", "product_unit", "product_category", "product_subcategory", "postal_code", "warehouse"]
+
+
+
+# Functions
+
+def typed_products(df):
+
+    """
+    Convert scraped products to compact dtypes: categoricals for the columns with few distinct values (see CATEGORY_COLUMNS) and for the product code, and float32 prices.
+    Product codes stay strings, since some products have variants (e.g. "3505.2"). Codes and prices that are not numbers (e.g. "Not available") become missing values. The CSV files written by the scrapers are not affected.
+
+    Args:
+        df (pandas.DataFrame): Products with the columns returned by get_product_info() in scraper.py.
+
+    Returns:
+        pandas.DataFrame: The same products with compact dtypes.
+    """
+
+    df = df.copy()
+    for column in CATEGORY_COLUMNS:
+        if column in df.columns and not isinstance(df[column].dtype, pd.CategoricalDtype):
+            df[column] = df[column].astype("category")
+    if "product_code" in df.columns:
+        codes = df["product_code"].astype(str).str.replace(r'\.0$', '', regex=True)
+        df["product_code"] = codes.where(pd.to_numeric(codes, errors="coerce").notna()).astype("category")
+    if "product_price" in df.columns:
+        df["product_price"] = pd.to_numeric(df["product_price"], errors="coerce").astype("float32")
+    return df
+
+
+
+# Classes
+
+class CsvSink:
+
+    """
+    Append-only CSV output for a crawl.
+
+    Every call to append() writes only the new rows to the end of the file and flushes them to disk, so an interrupted crawl
+    keeps everything scraped so far while the memory used stays bounded by the rows of a single subcategory.
+    The full DataFrame is only built when read() is called, normally once at the end of the crawl.
+
+    Args:
+        path (str): The path of the CSV file. If it already exists, new rows are appended to it.
+        sep (str, optional): The column separator. Defaults to '~', the separator used by every file in "scraping_output".
+    """
+
+    def __init__(self, path, sep='~'):
+        self.path = path
+        self.sep = sep
+        self.rows_written = 0
+        self._lock = threading.Lock()
+
+        # If the file already has a header, new rows must follow its column order and are counted after the existing ones
+        self.columns = None
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            self.columns = list(pd.read_csv(path, sep=sep, nrows=0).columns)
+            self.rows_written = len(pd.read_csv(path, sep=sep, usecols=[0]))
+
+    def append(self, df):
+
+        """
+        Append the rows of a DataFrame to the end of the file and flush them to disk.
+        The header is only written when the file is empty. Columns are written in the order of the existing header.
+
+        Args:
+            df (pandas.DataFrame): The rows to append.
+
+        Returns:
+            int: The total number of rows written by this sink.
+        """
+
+        # Nothing to write
+        if df is None or len(df) == 0:
+            return self.rows_written
+
+        with self._lock:
+
+            # The first DataFrame defines the column order of the file
+            write_header = self.columns is None
+            if write_header:
+                self.columns = list(df.columns)
+
+            # Write the new rows and make sure they reach the disk before continuing
+            with open(self.path, 'a', encoding='utf-8', newline='') as f:
+                df.reindex(columns=self.columns).to_csv(f, index=False, header=write_header, sep=self.sep)
+                f.flush()
+                os.fsync(f.fileno())
+
+            self.rows_written += len(df)
+            return self.rows_written
+
+    def read(self, typed=False, **kwargs):
+
+        """
+        Build a DataFrame with every row in the file.
+
+        Args:
+            typed (bool, optional): Parse the columns of CATEGORY_COLUMNS directly as categoricals and convert the result with typed_products(). Defaults to False.
+            **kwargs: Extra arguments passed to pandas.read_csv (e.g. usecols or chunksize).
+
+        Returns:
+            pandas.DataFrame: The rows in the file, or an empty DataFrame if nothing was written yet.
+        """
+
+        if self.columns is None:
+            return pd.DataFrame({})
+
+        # Restore the scraping timestamps as datetimes, as they were before being written
+        if "collected_timestamp" in self.columns and "usecols" not in kwargs:
+            kwargs.setdefault("parse_dates", ["collected_timestamp"])
+
+        # Categoricals are built while parsing, without an intermediate column of strings
+        if typed:
+            dtype = {column: "category" for column in CATEGORY_COLUMNS if column in self.columns}
+            if "product_code" in self.columns:
+                dtype["product_code"] = str
+            kwargs.setdefault("dtype", dtype)
+            return typed_products(pd.read_csv(self.path, sep=self.sep, **kwargs))
+
+        return pd.read_csv(self.path, sep=self.sep, **kwargs)
@@ -0,0 +1,263 @@
+# Import libraries
+import json
+import queue
+import re
+import threading
+from array import array
+
+import numpy as np
+import pandas as pd
+
+from snapshot_store import UNIT_PRICE_PATTERN
+
+# Prices are compared in cents, so that float rounding is never a change
+PRICE_DECIMALS = 2
+
+# Price per unit as the website shows it (e.g. "| 1,20 €/L")
+UNIT_PRICE_REGEX = re.compile(UNIT_PRICE_PATTERN)
+
+# Product codes, with or without a variant (e.g. "3505" or "3505.2")
+PRODUCT_CODE_REGEX = re.compile(r'^\d+(?:\.\d+)?$')
+
+
+
+# Classes
+
+class JsonLinesSink:
+
+    """
+    Write every price change event as a line of JSON at the end of a file, flushed right away so that it can be followed while the crawl runs (e.g. with "tail -f").
+
+    Args:
+        path (str): The path of the file. Events are appended if it already exists.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def emit(self, event):
+        with self._lock:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(event, ensure_ascii=False) + "\n")
+                f.flush()
+
+class CallbackSink:
+
+    """
+    Call a function with every price change event (a dictionary, see PriceChangeDetector.check()).
+
+    Args:
+        callback (callable): The function to call.
+    """
+
+    def __init__(self, callback):
+        self.callback = callback
+
+    def emit(self, event):
+        self.callback(event)
+
+class QueueSink:
+
+    """
+    Put every price change event in a local queue, to be consumed by another thread.
+
+    Args:
+        events (queue.Queue): The queue.
+    """
+
+    def __init__(self, events):
+        self.events = events
+
+    def emit(self, event):
+        self.events.put(event)
+
+class PriceChangeDetector:
+
+    """
+    Compare the products scraped during a crawl with the last known price of every product code, and emit an event for every price change as soon as it is scraped.
+
+    The index keeps a position per product code and the last known price and price per unit of every position in compact
+    arrays of floats, so memory grows with the size of the catalogue. It starts with the prices of a previous snapshot
+    or of a PriceHistory (see from_snapshot() and from_history()) and is updated with every product checked, so a product
+    that changes twice in a crawl emits two events. It can be shared by the workers of a crawl.
+
+    Args:
+        sinks (list or object): Where events are sent: objects with an emit(event) method, a path (JsonLinesSink), a queue.Queue (QueueSink) or a function (CallbackSink).
+        min_change_pct (float, optional): Smallest price change, in percent, that emits an event. Defaults to 0 (every change).
+        report_new (bool, optional): Also emit an event for products without a known price. Defaults to False.
+    """
+
+    def __init__(self, sinks=None, min_change_pct=0, report_new=False):
+        sinks = sinks if isinstance(sinks, list) else ([] if sinks is None else [sinks])
+        self.sinks = [self._as_sink(sink) for sink in sinks]
+        self.min_change_pct = min_change_pct
+        self.report_new = report_new
+        self.positions = {}
+        self.prices = array('f')
+        self.unit_prices = array('f')
+        self.stats = {"checked": 0, "new": 0, "changed": 0}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _as_sink(sink):
+        if isinstance(sink, str):
+            return JsonLinesSink(sink)
+        if isinstance(sink, queue.Queue):
+            return QueueSink(sink)
+        if not hasattr(sink, "emit") and callable(sink):
+            return CallbackSink(sink)
+        return sink
+
+    @classmethod
+    def from_snapshot(cls, snapshot, sinks=None, **kwargs):
+
+        """
+        Create a detector with the prices of a previous crawl.
+
+        Args:
+            snapshot (pandas.DataFrame or str): The products of a previous crawl (e.g. load_previous_snapshot() in scraper.py or read_snapshots() in snapshot_store.py) or the path of a scraping output. When a product code appears more than once, the last row wins.
+            sinks (list or object, optional): See PriceChangeDetector. Defaults to None.
+            **kwargs: Other arguments of PriceChangeDetector.
+
+        Returns:
+            PriceChangeDetector: The detector.
+        """
+
+        detector = cls(sinks, **kwargs)
+        if isinstance(snapshot, str):
+            snapshot = pd.read_csv(snapshot, sep='~', dtype={"product_code": str})
+        for row in snapshot.to_dict('records'):
+            observation = detector._observation(row)
+            if observation is not None:
+                detector._update(*observation)
+        return detector
+
+    @classmethod
+    def from_history(cls, history, when=None, sinks=None, **kwargs):
+
+        """
+        Create a detector with the prices of a PriceHistory (see price_history.py) at a point in time.
+
+        Args:
+            history (PriceHistory): The price history.
+            when (str or datetime, optional): The point in time. Defaults to None (now).
+            sinks (list or object, optional): See PriceChangeDetector. Defaults to None.
+            **kwargs: Other arguments of PriceChangeDetector.
+
+        Returns:
+            PriceChangeDetector: The detector.
+        """
+
+        detector = cls(sinks, **kwargs)
+        prices = history.prices_at(pd.Timestamp.now() if when is None else when).dropna(subset=["price"])
+        for code, price, unit_price in zip(prices.index, prices["price"], prices["unit_price"]):
+            detector._update(code, price, unit_price)
+        return detector
+
+    def __len__(self):
+        return len(self.positions)
+
+    @staticmethod
+    def _observation(row):
+
+        # Product code (as a string, like typed_products()), price and price per unit of a scraped row, or None if it has no product code or price
+        code = str(row.get("product_code"))
+        code = code[:-2] if code.endswith(".0") else code
+        if not PRODUCT_CODE_REGEX.match(code):
+            return None
+        try:
+            price = float(row.get("product_price"))
+        except (TypeError, ValueError):
+            return None
+        if np.isnan(price):
+            return None
+
+        # Price per unit already parsed, or parsed from the text shown by the website
+        if "unit_price" in row:
+            unit_price = float(row["unit_price"]) if row["unit_price"] is not None else np.nan
+        else:
+            match = UNIT_PRICE_REGEX.search(str(row.get("product_price_per_unit")))
+            unit_price = float(match.group("price").replace(".", "").replace(",", ".")) if match else np.nan
+        return code, price, unit_price
+
+    def _update(self, code, price, unit_price):
+
+        # Store the latest price of a code, adding new codes at the end of the arrays. Returns the previous price and price per unit, or None for a new code
+        position = self.positions.get(code)
+        if position is None:
+            self.positions[code] = len(self.prices)
+            self.prices.append(price)
+            self.unit_prices.append(unit_price)
+            return None
+        previous = self.prices[position], self.unit_prices[position]
+        self.prices[position] = price
+        self.unit_prices[position] = unit_price
+        return previous
+
+    def check(self, products):
+
+        """
+        Compare scraped products with the index, emit an event for every price change and update the index.
+
+        Every event is a dictionary with the "event" ("increase", "decrease" or "new"), "product_code", "product",
+        "product_category", "product_subcategory", "old_price", "new_price", "delta" (new minus old price, in euros),
+        "delta_pct" (in percent, None when the old price is 0), "old_unit_price", "new_unit_price" and "collected_timestamp".
+
+        Args:
+            products (pandas.DataFrame): Scraped products, with the columns returned by get_product_info() in scraper.py.
+
+        Returns:
+            list: The events emitted.
+        """
+
+        if products is None or len(products) == 0:
+            return []
+
+        events = []
+        with self._lock:
+            for row in products.to_dict('records'):
+                observation = self._observation(row)
+                if observation is None:
+                    continue
+                code, price, unit_price = observation
+                previous = self._update(code, price, unit_price)
+                self.stats["checked"] += 1
+
+                # A product without a known price
+                if previous is None:
+                    self.stats["new"] += 1
+                    if self.report_new:
+                        events.append(self._event("new", row, code, None, price, None, unit_price))
+                    continue
+
+                # A price change big enough to report (a previous price of 0, e.g. a placeholder row, has no percentage, so every change from it is reported)
+                old_price, old_unit_price = round(previous[0], PRICE_DECIMALS), previous[1]
+                delta = round(price - old_price, PRICE_DECIMALS)
+                if delta != 0 and (old_price == 0 or abs(delta / old_price * 100) >= self.min_change_pct):
+                    self.stats["changed"] += 1
+                    events.append(self._event("increase" if delta > 0 else "decrease", row, code, old_price, price, old_unit_price, unit_price))
+
+        for event in events:
+            for sink in self.sinks:
+                sink.emit(event)
+        return events
+
+    @staticmethod
+    def _event(kind, row, code, old_price, new_price, old_unit_price, new_unit_price):
+
+        # The event of a scraped row (see check())
+        return {
+            "event": kind,
+            "product_code": code,
+            "product": str(row.get("product")),
+            "product_category": str(row.get("product_category")),
+            "product_subcategory": str(row.get("product_subcategory")),
+            "old_price": old_price,
+            "new_price": round(new_price, PRICE_DECIMALS),
+            "delta": None if old_price is None else round(new_price - old_price, PRICE_DECIMALS),
+            "delta_pct": None if old_price in (None, 0) else round((new_price - old_price) / old_price * 100, 2),
+            "old_unit_price": None if old_unit_price is None or np.isnan(old_unit_price) else round(old_unit_price, 3),
+            "new_unit_price": None if np.isnan(new_unit_price) else round(new_unit_price, 3),
+            "collected_timestamp": str(row.get("collected_timestamp")),
+        }
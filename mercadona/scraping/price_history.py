@@ -0,0 +1,314 @@
+# Import libraries
+import os
+
+import numpy as np
+import pandas as pd
+
+from output import typed_products
+from snapshot_store import parse_unit_price
+
+# Default file of the price history
+PRICE_HISTORY_PATH = 'scraping_output/price_history.npz'
+
+# Prices are compared in cents (and unit prices in tenths of a cent), so that float rounding is never a change
+PRICE_DECIMALS = 2
+UNIT_PRICE_DECIMALS = 3
+
+
+
+# Classes
+
+class PriceHistory:
+
+    """
+    Compact price history with a series per product code that only records the points where the price changed.
+
+    The series are stored one after the other in flat NumPy arrays, sorted by product code and time: the change points
+    of codes[i] are the rows offsets[i] to offsets[i + 1] of timestamps, prices and unit_prices. Every change point is
+    the price (and price per unit) from its timestamp until the next change point, and run_ends keeps the last time that
+    price was observed before it changed. last_seen keeps the last time every product was observed, so a product that
+    disappeared from the catalogue can be told apart from one whose price did not change. The size of the history grows
+    with the number of price changes, not with the number of snapshots.
+
+    Observations can come from scraping outputs (add_snapshots()) or from the order history (add_orders()). Batches
+    can be added in any order as long as they do not overlap a run of another price: every change point is merged as
+    the first and the last observation of its run (timestamps and run_ends), so older observations can fill the time
+    before, between or after the known runs. The observations inside a run are not kept, so an observation of another
+    price from a time between the start and the end of a run can not be placed and is rejected (see add_observations()).
+    Observations of the same product at the same time are kept once (the last one added wins).
+    """
+
+    def __init__(self):
+        self.codes = np.array([], dtype=str)
+        self.offsets = np.zeros(1, dtype=np.int64)
+        self.timestamps = np.array([], dtype="datetime64[s]")
+        self.prices = np.array([], dtype=np.float32)
+        self.unit_prices = np.array([], dtype=np.float32)
+        self.run_ends = np.array([], dtype="datetime64[s]")
+        self.last_seen = np.array([], dtype="datetime64[s]")
+        self._keys = None
+
+    @classmethod
+    def load(cls, path=PRICE_HISTORY_PATH):
+
+        """
+        Load a price history saved with save().
+
+        Args:
+            path (str, optional): The path of the .npz file. Defaults to PRICE_HISTORY_PATH.
+
+        Returns:
+            PriceHistory: The price history, or an empty one if the file does not exist.
+        """
+
+        history = cls()
+        if not os.path.exists(path):
+            return history
+
+        with np.load(path) as data:
+            history.codes = data["codes"]
+            history.offsets = data["offsets"]
+            history.timestamps = data["timestamps"]
+            history.prices = data["prices"]
+            history.unit_prices = data["unit_prices"]
+            history.last_seen = data["last_seen"]
+
+            # Histories saved without the end of every run only know where the runs start
+            history.run_ends = data["run_ends"] if "run_ends" in data.files else data["timestamps"]
+        return history
+
+    def save(self, path=PRICE_HISTORY_PATH):
+
+        """
+        Write the price history to disk atomically (write a temporary file, then replace the old one).
+
+        Args:
+            path (str, optional): The path of the .npz file. Defaults to PRICE_HISTORY_PATH.
+        """
+
+        with open(path + ".tmp", 'wb') as f:
+            np.savez_compressed(f, codes=self.codes, offsets=self.offsets, timestamps=self.timestamps, prices=self.prices, unit_prices=self.unit_prices, run_ends=self.run_ends, last_seen=self.last_seen)
+        os.replace(path + ".tmp", path)
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def add_observations(self, codes, timestamps, prices, unit_prices=None):
+
+        """
+        Merge observed prices into the history, keeping only the observations where the price of a product changed.
+        A missing price per unit (e.g. in the order history) keeps the previous one of the product.
+
+        Args:
+            codes (array-like): The product code of every observation (strings, e.g. "3505.2").
+            timestamps (array-like): When every observation was made.
+            prices (array-like): The price of every observation. Observations without a price are ignored.
+            unit_prices (array-like, optional): The price per unit of every observation. Defaults to None (unknown).
+
+        Returns:
+            int: The number of change points in the history after the merge.
+
+        Raises:
+            ValueError: If an observation falls inside a run of the history (from its first to its last observation) with another price or price per unit. The history is left unchanged.
+        """
+
+        codes = np.asarray(codes, dtype=object).astype(str)
+        new = pd.DataFrame({
+            "code": codes,
+            "timestamp": pd.to_datetime(np.asarray(timestamps)).to_numpy().astype("datetime64[s]"),
+            "price": pd.to_numeric(pd.Series(np.asarray(prices)), errors="coerce").round(PRICE_DECIMALS).to_numpy(np.float64),
+            "unit_price": pd.to_numeric(pd.Series(np.asarray(unit_prices) if unit_prices is not None else np.full(len(codes), np.nan)), errors="coerce").round(UNIT_PRICE_DECIMALS).to_numpy(np.float64),
+        })
+        new = new[new["price"].notna()]
+
+        # Current change points as the first and the last observation of their run, followed by the new observations, in time order (new observations win on equal timestamps)
+        current = pd.DataFrame({
+            "code": np.repeat(self.codes, np.diff(self.offsets)),
+            "timestamp": self.timestamps,
+            "price": self.prices.astype(np.float64).round(PRICE_DECIMALS),
+            "unit_price": self.unit_prices.astype(np.float64).round(UNIT_PRICE_DECIMALS),
+        })
+
+        # The run every new observation falls in (the last change point at or before it), which must have the same prices unless the run is that single observation
+        runs = current.assign(run_end=self.run_ends).sort_values("timestamp", kind="stable")
+        placed = pd.merge_asof(new.reset_index(drop=True).sort_values("timestamp", kind="stable"), runs.rename(columns={"timestamp": "run_start", "price": "run_price", "unit_price": "run_unit_price"}), left_on="timestamp", right_on="run_start", by="code")
+        inside = (placed["timestamp"] <= placed["run_end"]) & (placed["run_start"] < placed["run_end"])
+        differs = (placed["price"] != placed["run_price"]) | (placed["unit_price"].notna() & placed["run_unit_price"].notna() & (placed["unit_price"] != placed["run_unit_price"]))
+        conflicts = placed[inside & differs]
+        if len(conflicts):
+            raise ValueError(f"{len(conflicts)} observations fall inside a run of another price in the history (e.g. product {conflicts['code'].iloc[0]} at {conflicts['timestamp'].iloc[0]}), add the observations in time order")
+        current = pd.concat([current, current.assign(timestamp=self.run_ends)], ignore_index=True)
+        merged = pd.concat([current, new], ignore_index=True).sort_values(["code", "timestamp"], kind="stable")
+        merged = merged.drop_duplicates(["code", "timestamp"], keep="last")
+        merged["unit_price"] = merged.groupby("code", sort=False)["unit_price"].ffill()
+
+        # Last observation of every product, from the current history and the new observations
+        last_seen = pd.concat([pd.Series(self.last_seen, index=self.codes), new.groupby("code")["timestamp"].max()])
+        last_seen = last_seen.groupby(level=0).max()
+
+        # A change point is the first observation of a product or one whose price or price per unit differs from the previous one
+        code = merged["code"].to_numpy()
+        price = merged["price"].to_numpy()
+        unit_price = merged["unit_price"].to_numpy()
+        first = np.ones(len(merged), dtype=bool)
+        first[1:] = code[1:] != code[:-1]
+        changed = first.copy()
+        changed[1:] |= price[1:] != price[:-1]
+        changed[1:] |= ~np.isnan(unit_price[1:]) & ~np.isnan(unit_price[:-1]) & (unit_price[1:] != unit_price[:-1])
+        changed[1:] |= np.isnan(unit_price[:-1]) & ~np.isnan(unit_price[1:])
+
+        # Every run ends at the last observation before the next change point
+        run_ends = merged["timestamp"].groupby(np.cumsum(changed)).max().to_numpy()
+        merged = merged[changed]
+
+        # Back to flat arrays
+        self.codes, starts = np.unique(merged["code"].to_numpy().astype(str), return_index=True)
+        self.offsets = np.append(starts, len(merged)).astype(np.int64)
+        self.timestamps = merged["timestamp"].to_numpy().astype("datetime64[s]")
+        self.prices = merged["price"].to_numpy(np.float32)
+        self.unit_prices = merged["unit_price"].to_numpy(np.float32)
+        self.run_ends = run_ends.astype("datetime64[s]")
+        self.last_seen = last_seen.reindex(self.codes).to_numpy().astype("datetime64[s]")
+        self._keys = None
+        return len(self)
+
+    def add_snapshots(self, snapshots):
+
+        """
+        Add the prices of scraping outputs.
+
+        Args:
+            snapshots (list): Paths of scraping outputs (CSV files separated by "~") or DataFrames with the "product_code", "product_price" and "collected_timestamp" columns, and the price per unit as text ("product_price_per_unit") or already parsed ("unit_price", e.g. from read_snapshots() in snapshot_store.py).
+
+        Returns:
+            int: The number of change points in the history.
+        """
+
+        # Only the needed columns of every snapshot, converted all at once
+        frames = []
+        for snapshot in snapshots:
+            products = pd.read_csv(snapshot, sep='~', dtype={"product_code": str}) if isinstance(snapshot, str) else snapshot
+            frames.append(products[[column for column in ["product_code", "collected_timestamp", "product_price", "product_price_per_unit", "unit_price"] if column in products.columns]])
+        if not frames:
+            return len(self)
+        observations = pd.concat(frames, ignore_index=True)
+
+        # Prices per unit already parsed, or parsed from the text
+        unit_prices = pd.to_numeric(observations["unit_price"], errors="coerce") if "unit_price" in observations.columns else pd.Series(np.nan, index=observations.index)
+        if "product_price_per_unit" in observations.columns:
+            unit_prices = unit_prices.fillna(parse_unit_price(observations["product_price_per_unit"])[0])
+
+        # Products without a product code can not be tracked
+        codes = typed_products(observations[["product_code"]])["product_code"]
+        known = codes.notna().to_numpy()
+        return self.add_observations(codes[known].astype(object), observations["collected_timestamp"][known], observations["product_price"][known], unit_prices[known])
+
+    def add_orders(self, orders):
+
+        """
+        Add the prices paid in the order history, as returned by assign_product_codes() in order_history_retrieving.py. The price of an order line is its price per unit ("price_per_unit"), on its delivery date.
+
+        Args:
+            orders (pandas.DataFrame or str): The order history, or the path of its CSV file (separated by "~").
+
+        Returns:
+            int: The number of change points in the history.
+        """
+
+        if isinstance(orders, str):
+            orders = pd.read_csv(orders, sep='~', index_col=0)
+        orders = orders[orders["product_code"].notna()]
+        codes = pd.to_numeric(orders["product_code"]).astype("int64").astype(str)
+        return self.add_observations(codes, orders["fecha"], orders["price_per_unit"])
+
+    def _search_keys(self):
+
+        # Every change point as a single sortable number (series index, then seconds), to look up many products at once with np.searchsorted
+        if self._keys is None:
+            series = np.repeat(np.arange(len(self.codes), dtype=np.int64), np.diff(self.offsets))
+            self._keys = (series << 36) + self.timestamps.astype(np.int64)
+        return self._keys
+
+    def price_at(self, code, when):
+
+        """
+        Look up the price of a product at a point in time.
+
+        Args:
+            code (str or int): The product code.
+            when (str or datetime): The point in time.
+
+        Returns:
+            dict: The "price", "unit_price" and the time "since" that price applied, or None if the product was not observed before that time.
+        """
+
+        series = np.searchsorted(self.codes, str(code))
+        if series == len(self.codes) or self.codes[series] != str(code):
+            return None
+        start, end = self.offsets[series], self.offsets[series + 1]
+        position = start + np.searchsorted(self.timestamps[start:end], np.datetime64(pd.Timestamp(when), 's'), side='right') - 1
+        if position < start:
+            return None
+        return {"price": round(float(self.prices[position]), PRICE_DECIMALS), "unit_price": round(float(self.unit_prices[position]), UNIT_PRICE_DECIMALS), "since": pd.Timestamp(self.timestamps[position])}
+
+    def prices_at(self, when, codes=None):
+
+        """
+        Look up the price of many products at a point in time, all at once.
+
+        Args:
+            when (str or datetime): The point in time.
+            codes (list, optional): The product codes. Defaults to None (every product in the history).
+
+        Returns:
+            pandas.DataFrame: The "price", "unit_price", "since" and "last_seen" of every product, indexed by product code. Products not observed before that time have missing values.
+        """
+
+        codes = self.codes if codes is None else np.array([str(code) for code in codes])
+        prices = pd.DataFrame({"price": np.nan, "unit_price": np.nan, "since": pd.NaT, "last_seen": pd.NaT}, index=pd.Index(codes, name="product_code"))
+        if not len(self):
+            return prices
+
+        # Series of every code (known codes only)
+        series = np.minimum(np.searchsorted(self.codes, codes), len(self.codes) - 1)
+        known = self.codes[series] == codes
+
+        # Last change point at or before that time, which must belong to the same series
+        query = (series.astype(np.int64) << 36) + np.datetime64(pd.Timestamp(when), 's').astype(np.int64)
+        position = np.searchsorted(self._search_keys(), query, side='right') - 1
+        found = known & (position >= self.offsets[series])
+
+        prices.loc[found, "price"] = self.prices[position[found]].astype(np.float64).round(PRICE_DECIMALS)
+        prices.loc[found, "unit_price"] = self.unit_prices[position[found]].astype(np.float64).round(UNIT_PRICE_DECIMALS)
+        prices.loc[found, "since"] = self.timestamps[position[found]]
+        prices.loc[known, "last_seen"] = self.last_seen[series[known]]
+        return prices
+
+    def series(self, code, start=None, end=None):
+
+        """
+        Read the change points of a product in a time range, including the one in effect at the start of the range.
+
+        Args:
+            code (str or int): The product code.
+            start (str or datetime, optional): Start of the range. Defaults to None (the first observation).
+            end (str or datetime, optional): End of the range. Defaults to None (the last observation).
+
+        Returns:
+            pandas.DataFrame: The "timestamp", "price" and "unit_price" of every change point.
+        """
+
+        series = np.searchsorted(self.codes, str(code))
+        if series == len(self.codes) or self.codes[series] != str(code):
+            return pd.DataFrame(columns=["timestamp", "price", "unit_price"])
+        first, last = self.offsets[series], self.offsets[series + 1]
+        timestamps = self.timestamps[first:last]
+
+        # The change point in effect at start, and every one until end
+        lower = 0 if start is None else max(np.searchsorted(timestamps, np.datetime64(pd.Timestamp(start), 's'), side='right') - 1, 0)
+        upper = len(timestamps) if end is None else np.searchsorted(timestamps, np.datetime64(pd.Timestamp(end), 's'), side='right')
+        return pd.DataFrame({
+            "timestamp": timestamps[lower:upper],
+            "price": self.prices[first + lower:first + upper],
+            "unit_price": self.unit_prices[first + lower:first + upper],
+        })
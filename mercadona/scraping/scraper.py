@@ -1,15 +1,13 @@
 # Import libraries
-import chromedriver_autoinstaller
-chromedriver_autoinstaller.install()
 from selenium import webdriver
 from selenium.webdriver.common.keys import Keys
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.chrome.options import Options
+from selenium.common.exceptions import TimeoutException
 
 # Time imports
-import random
 import datetime
 import time
 
@@ -17,30 +15,91 @@ import time
 import re as re
 import pandas as pd
 import sys
-
-from dotenv import load_dotenv
-load_dotenv()
+import os
+import json
+import queue
+import requests
+import threading
+
+from throttling import AdaptiveRateLimiter
+from output import CsvSink
+from checkpoint import CrawlCheckpoint
+from category_cache import load_category_tree, save_category_tree, tree_matches
+from http_engine import HttpEngine
+from metrics import CrawlMetrics, activate, count, timed, timed_function
+
+# Make the modules shared with the order history (in the mercadona folder) importable
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from driver import provision_chromedriver
+
+
+
+# Constants
+
+# Landing page where the postal code is entered and categories page used to navigate once the store is set
+MERCADONA_URL = 'https://www.mercadona.es/'
+CATEGORIES_URL = 'https://tienda.mercadona.es/categories'
+
+# Fields shown in the product grid that, when they differ from the previous snapshot, mean that a product changed and its detail must be scraped again
+CHANGE_SIGNALS = ["product", "product_type", "product_volume", "product_price", "product_unit"]
+
+# Script that reads every field of an open product detail in the browser and returns them as a dictionary (null when an element is not found)
+PRODUCT_DETAIL_SCRIPT = """
+const text = (selector) => {
+    const element = document.querySelector(selector);
+    return element === null ? null : element.innerText.trim();
+};
+return {
+    product: text('h1.title2-r.private-product-detail__description'),
+    product_type: text('span.headline1-r:nth-child(1)'),
+    product_volume: text('span.headline1-r:nth-child(2)'),
+    product_price_per_unit: text('span.headline1-r:nth-child(3)'),
+    product_price: text('p.product-price__unit-price.large-b'),
+    product_unit: text('p.product-price__extra-price.title1-r'),
+    product_category: text('span.subhead1-r'),
+    product_subcategory: text('span.subhead1-sb'),
+    product_url: window.location.href
+};
+"""
+
+# Script that reads the information shown in every cell of the product grid in one pass
+PRODUCT_GRID_SCRIPT = """
+return Array.from(document.querySelectorAll("div[data-test='product-cell']")).map((cell) => {
+    const text = (selector) => {
+        const element = cell.querySelector(selector);
+        return element === null ? null : element.innerText.trim();
+    };
+    const link = cell.querySelector('a[href*="/product/"]');
+    return {
+        product: text('.product-cell__description-name'),
+        product_format: Array.from(cell.querySelectorAll('.product-format span')).map((element) => element.innerText.trim()),
+        product_price: text('.product-price__unit-price'),
+        product_unit: text('.product-price__extra-price'),
+        product_url: link === null ? null : link.href
+    };
+});
+"""
 
 
 
 # Functions
 
-def get_categories(zip, headless=False):
+def start_session(zip, headless=False):
 
     """
-    Scrape the Mercadona website to get a list of all the categories available based on the input postal code.
+    Start a Chrome session configured for the Mercadona store that serves the given postal code.
+    The returned driver is left on the categories page with the cookies accepted, so it can be passed to the rest of the scraping functions and reused for the whole crawl.
 
     Args:
         zip (str): The postal code used to find the nearest Mercadona store.
         headless (bool, optional): Whether to run the browser in headless mode, which means that the browser will not display a user interface. Defaults to False.
 
     Returns:
-        list: A list of strings containing the name of each category available in the website.
+        selenium.webdriver.Chrome: A driver with the postal code already set and positioned in the categories page.
 
     Raises:
         TimeoutException: If the browser is unable to find any required element in the page within the allotted time.
         NoSuchElementException: If the browser is unable to find the element that matches the specified selector.
-        ElementClickInterceptedException: If the browser is unable to click on an element because another element is blocking it.
     """
 
     # Set options for headless (invisible) browsing
@@ -48,24 +107,120 @@ def get_categories(zip, headless=False):
     if headless:
         options.add_argument('--headless')
 
-    # Start the driver with the options
-    driver = webdriver.Chrome(options=options)
+    # Make sure the chromedriver is available (only checked the first time) and start the driver with the options
+    with timed("driver_start"):
+        provision_chromedriver()
+        driver = webdriver.Chrome(options=options)
+
+    with timed("postal_code"):
+
+        # Navigate to the landing page
+        driver.get(MERCADONA_URL)
+
+        # Enter the postal code and submit
+        postal_code = driver.find_element(By.CSS_SELECTOR, 'input[aria-label="Código postal"]').send_keys(zip)
+        submit_button = driver.find_element(By.CSS_SELECTOR, 'input.postal-code-form__button').click()
+
+        # Wait until categories is clickable and click it.
+        categorias_link = WebDriverWait(driver, 10).until(EC.visibility_of_element_located((By.LINK_TEXT, "Categorías"))).click()
+
+        # Wait for the "product-cell" element to be clickable (grid of porducts)
+        product_cell = WebDriverWait(driver, 10).until(EC.element_to_be_clickable((By.CSS_SELECTOR, "div[data-test='product-cell']")))
+
+        # Accept cookies
+        accept_button = driver.find_element(By.XPATH, "//button[contains(text(),'Aceptar todas')]").click()
+
+    return driver
+
+def open_categories(driver):
+
+    """
+    Bring an already configured session back to the categories page, with the category menu collapsed and the product grid loaded.
+    The postal code and the accepted cookies are kept by the browser, so this is a single page load instead of a full session start.
+
+    Args:
+        driver (selenium.webdriver.Chrome): A driver created with start_session().
+
+    Raises:
+        TimeoutException: If the product grid does not load within the allotted time.
+    """
+
+    # Reload the categories page and wait for the product grid
+    with timed("open_categories"):
+        driver.get(CATEGORIES_URL)
+        WebDriverWait(driver, 10).until(EC.element_to_be_clickable((By.CSS_SELECTOR, "div[data-test='product-cell']")))
+
+def session_is_alive(driver):
+
+    """
+    Check whether a session can still be used for scraping.
+    A session is considered dead when the browser no longer answers, and throttled when the "too many requests" dialog (with its "Entendido" button) is being displayed.
+
+    Args:
+        driver (selenium.webdriver.Chrome): The driver to check.
+
+    Returns:
+        bool: True if the session answers and is not being throttled, False otherwise.
+    """
+
+    try:
+        # Any command will fail if the browser was closed or crashed
+        driver.current_url
 
-    # Navigate to the login page
-    driver.get('https://www.mercadona.es/')
+        # If the throttling dialog is displayed the session should be replaced
+        return len(driver.find_elements(By.XPATH, '//button[contains(text(), "Entendido")]')) == 0
+    except:
+        return False
 
-    # Enter the postal code and submit
-    postal_code = driver.find_element(By.CSS_SELECTOR, 'input[aria-label="Código postal"]').send_keys(zip)
-    submit_button = driver.find_element(By.CSS_SELECTOR, 'input.postal-code-form__button').click()
+def recycle_session(driver, zip, headless=False):
 
-    # Wait until categories is clickable and click it.
-    categorias_link = WebDriverWait(driver, 10).until(EC.visibility_of_element_located((By.LINK_TEXT, "Categorías"))).click()
+    """
+    Close a dead or throttled session and start a new one for the same postal code.
+
+    Args:
+        driver (selenium.webdriver.Chrome): The driver to replace. It can be None or an already closed driver.
+        zip (str): The postal code used to find the nearest Mercadona store.
+        headless (bool, optional): Whether to run the browser in headless mode. Defaults to False.
+
+    Returns:
+        selenium.webdriver.Chrome: A new driver created with start_session().
+    """
 
-    # Wait for the "product-cell" element to be clickable (grid of porducts)
-    product_cell = WebDriverWait(driver, 10).until(EC.element_to_be_clickable((By.CSS_SELECTOR, "div[data-test='product-cell']")))
+    # Close the old browser, ignoring errors if it is already gone
+    if driver is not None:
+        with timed("session_close"):
+            try:
+                driver.quit()
+            except:
+                pass
 
-    # Accept cookies
-    accept_button = driver.find_element(By.XPATH, "//button[contains(text(),'Aceptar todas')]").click()
+    return start_session(zip, headless=headless)
+
+def get_categories(zip, headless=False, driver=None):
+
+    """
+    Scrape the Mercadona website to get a list of all the categories available based on the input postal code.
+
+    Args:
+        zip (str): The postal code used to find the nearest Mercadona store.
+        headless (bool, optional): Whether to run the browser in headless mode, which means that the browser will not display a user interface. Defaults to False.
+        driver (selenium.webdriver.Chrome, optional): A session created with start_session() to reuse. If not passed, a new session is started and closed when done. Defaults to None.
+
+    Returns:
+        list: A list of strings containing the name of each category available in the website.
+
+    Raises:
+        TimeoutException: If the browser is unable to find any required element in the page within the allotted time.
+        NoSuchElementException: If the browser is unable to find the element that matches the specified selector.
+        ElementClickInterceptedException: If the browser is unable to click on an element because another element is blocking it.
+    """
+
+    # Start a new session if none was passed, otherwise move the existing one back to the categories page
+    own_session = driver is None
+    if own_session:
+        driver = start_session(zip, headless=headless)
+    else:
+        open_categories(driver)
 
     # Find all the category links
     category_links = driver.find_elements(By.CSS_SELECTOR, "span[class='category-menu__header']")
@@ -74,12 +229,13 @@ def get_categories(zip, headless=False):
     for i in category_links:
         ret_list.append(i.text)
     
-    # Close the session
-    driver.quit()
+    # Close the session only if it was created here
+    if own_session:
+        driver.quit()
 
     return ret_list
 
-def get_subcategories(zip, category, headless=True):
+def get_subcategories(zip, category, headless=True, driver=None):
 
     """
     Retrieve the subcategories of a given category in the Mercadona website for a given postal code.
@@ -88,6 +244,7 @@ def get_subcategories(zip, category, headless=True):
         zip (str): The postal code of the location to browse. This is used to find the nearest Mercadona store.
         category (str): The name of the category to retrieve subcategories for.
         headless (bool, optional): If True, the function will run the web driver in headless mode, which means that the browser will not display a user interface. Defaults to True.
+        driver (selenium.webdriver.Chrome, optional): A session created with start_session() to reuse. If not passed, a new session is started and closed when done. Defaults to None.
 
     Returns:
         list: A list containing a string with the name of every subcategory of the given category.
@@ -98,43 +255,251 @@ def get_subcategories(zip, category, headless=True):
         ElementClickInterceptedException: If the browser is unable to click on an element because another element is blocking it.
     """
     
-    # Set options for headless (invisible) browsing
-    options = Options()
+    # Start a new session if none was passed, otherwise move the existing one back to the categories page
+    own_session = driver is None
+    if own_session:
+        driver = start_session(zip, headless=headless)
+    else:
+        open_categories(driver)
+
+    # Wait for the target category to be clickable and clicks it, then wait for the subcategories to load and save them
+    with timed("category_click"):
+        selected_category = WebDriverWait(driver, 10).until(EC.element_to_be_clickable((By.XPATH, f"//label[text()='{category}']"))).click()
+        subcategory_links = WebDriverWait(driver, 10).until(EC.presence_of_all_elements_located((By.CSS_SELECTOR, ".category-item__link")))
 
-    # add the headless argument if passed
-    if headless:
-        options.add_argument('--headless')
+    ret_list = []
+    for i in subcategory_links:
+        ret_list.append(i.text)
+    
+    # Close the session only if it was created here
+    if own_session:
+        driver.quit()
 
-    # Start the driver with the options
-    driver = webdriver.Chrome(options=options)
+    return ret_list
 
-    # Navigate to the login page
-    driver.get('https://www.mercadona.es/')
+def extract_product_detail(driver):
 
-    # Enter the postal code and submit, then wait for categories to be available and clicks it
-    postal_code = driver.find_element(By.CSS_SELECTOR, 'input[aria-label="Código postal"]').send_keys(zip)
-    submit_button = driver.find_element(By.CSS_SELECTOR, 'input.postal-code-form__button').click()
-    categorias_link = WebDriverWait(driver, 10).until(EC.visibility_of_element_located((By.LINK_TEXT, "Categorías"))).click()
+    """
+    Scrape the information of the product detail currently open in the browser.
+    Every field is read with a single execute_script call (one WebDriver round-trip) instead of one find_element call per field.
+    Fields that are not available are saved as "Not available" (or "Not Available"), as they always have been.
 
-    # Wait for the "product-cell" element to be clickable (grid of porducts) and accepts cookies.
-    product_cell = WebDriverWait(driver, 10).until(EC.element_to_be_clickable((By.CSS_SELECTOR, "div[data-test='product-cell']")))
-    accept_button = driver.find_element(By.XPATH, "//button[contains(text(),'Aceptar todas')]").click()
+    Args:
+        driver (selenium.webdriver.Chrome): A driver with a product detail open.
 
-    # Wait for the target category to be clickable and clicks it
-    selected_category = WebDriverWait(driver, 10).until(EC.element_to_be_clickable((By.XPATH, f"//label[text()='{category}']"))).click()
+    Returns:
+        dict: The product name, type, volume, price per unit, price, unit, category, subcategory, URL, product code (from URL) and the collected timestamp.
+    """
 
-    # Wait for the subcategories to load and save them
-    subcategory_links = WebDriverWait(driver, 10).until(EC.presence_of_all_elements_located((By.CSS_SELECTOR, ".category-item__link")))
+    # Read every field in one call
+    with timed("field_lookup"):
+        raw = driver.execute_script(PRODUCT_DETAIL_SCRIPT)
 
-    ret_list = []
-    for i in subcategory_links:
-        ret_list.append(i.text)
-    
-    driver.quit()
+    # Initialize the dictionary that will be appended to the list of already scraped product information (that will later be our DataFrame)
+    info_prod={}
 
-    return ret_list
+    # Text fields, cleaned the same way as before. When a field is missing it saves "Not available"
+    info_prod["product"] = raw["product"] if raw["product"] is not None else "Not available"
+    info_prod["product_type"] = raw["product_type"] if raw["product_type"] is not None else "Not available"
+    info_prod["product_volume"] = raw["product_volume"] if raw["product_volume"] is not None else "Not available"
+    info_prod["product_price_per_unit"] = raw["product_price_per_unit"].replace("| ","") if raw["product_price_per_unit"] is not None else "Not available"
+
+    # Product_price
+    try:
+        info_prod["product_price"] = float(raw["product_price"].replace("€","").strip().replace(",","."))
+    except:
+        info_prod["product_price"] = "Not Available"
+
+    # Product unit (e.g.: L), category and subcategory
+    info_prod["product_unit"] = raw["product_unit"].replace("/","").replace(".","") if raw["product_unit"] is not None else "Not Available"
+    info_prod["product_category"] = raw["product_category"].replace(" >","") if raw["product_category"] is not None else "Not Available"
+    info_prod["product_subcategory"] = raw["product_subcategory"] if raw["product_subcategory"] is not None else "Not Available"
+
+    # Url, Product code (from URL), and scraped time
+    info_prod["product_url"] = raw["product_url"]
+    info_prod["product_code"] = raw["product_url"].split("/")[4]
+    info_prod["collected_timestamp"] = datetime.datetime.now()
+
+    return info_prod
+
+def grid_key(product, product_type, product_volume):
+
+    """
+    Build the key used to recognise a product in the product grid, where the product code is not shown.
+
+    Args:
+        product (str): The product name.
+        product_type (str): The product type (e.g. "Garrafa").
+        product_volume (str): The product volume (e.g. "5 L").
+
+    Returns:
+        tuple: The key of the product.
+    """
+
+    return (str(product).strip(), str(product_type).strip(), str(product_volume).strip())
+
+def grid_is_complete(info_prod):
+
+    """
+    Check whether a product parsed from the grid already has every field of its detail, so that it does not need to be opened.
+    The website grid does not link to the products, so their URL and product code are only in the detail. Cells that link to the product and show its price per unit are complete.
+
+    Args:
+        info_prod (dict): A product parsed with parse_product_grid().
+
+    Returns:
+        bool: True if no field is missing.
+    """
+
+    return all(str(info_prod[field]) not in ("Not available", "Not Available") for field in ["product", "product_type", "product_volume", "product_price_per_unit", "product_price", "product_unit", "product_url", "product_code"])
+
+def index_known_products(products):
+
+    """
+    Index previously scraped products by their product code and by their grid key, so that get_product_info(mode="grid") can reuse their information instead of opening their detail.
+    Product cells that link to the product are looked up by its code, the rest by their grid key.
+
+    Args:
+        products (pandas.DataFrame): Products with the columns returned by get_product_info() (e.g. a previous scraping output).
+
+    Returns:
+        dict: A dictionary with the product code and the grid key of every product as keys and its row (as a dictionary) as values.
+    """
+
+    known_products = {}
+    for row in products.to_dict('records'):
+        known_products[grid_key(row["product"], row["product_type"], row["product_volume"])] = row
+        if str(row["product_code"]) != "Not available":
+            known_products[str(row["product_code"])] = row
+    return known_products
+
+def find_known_product(known_products, info_prod):
+
+    """
+    Look up a product parsed from the grid among the previously scraped ones, by product code if the grid shows it and otherwise by grid key.
+
+    Args:
+        known_products (dict): Products indexed with index_known_products().
+        info_prod (dict): A product parsed with parse_product_grid().
+
+    Returns:
+        dict: The previously scraped row of the product, or None if it is new.
+    """
+
+    known = known_products.get(str(info_prod["product_code"]))
+    if known is None:
+        known = known_products.get(grid_key(info_prod["product"], info_prod["product_type"], info_prod["product_volume"]))
+    return known
+
+def product_changed(known, info_prod):
+
+    """
+    Compare the cheap signals shown in the product grid (name, format, price and unit, see CHANGE_SIGNALS) with the previously scraped row of a product.
+
+    Args:
+        known (dict): The previously scraped row of the product.
+        info_prod (dict): The product parsed with parse_product_grid().
+
+    Returns:
+        bool: True if any signal changed, which means the product detail must be scraped again.
+    """
+
+    for field in CHANGE_SIGNALS:
+        previous, current = str(known[field]).strip(), str(info_prod[field]).strip()
+
+        # Older outputs saved the unit as shown in the website (e.g. "/ud.")
+        if field == "product_unit":
+            previous = previous.replace("/","").replace(".","")
+        if previous != current:
+            return True
+
+    # The grid only shows the price per unit of some products, compare it when it does
+    if info_prod["product_price_per_unit"] != "Not available" and info_prod["product_price_per_unit"] != known["product_price_per_unit"]:
+        return True
+    return False
+
+def load_previous_snapshot(snapshot=True, output_dir='scraping_output', exclude=None):
+
+    """
+    Load the products of a previous crawl, with a single row per product code (the last one scraped), to be used by a delta crawl.
+
+    Args:
+        snapshot (bool, str or pandas.DataFrame, optional): True loads the most recent CSV file in output_dir, a string loads that CSV file and a DataFrame is used as it is. Defaults to True.
+        output_dir (str, optional): The folder where the scraping outputs are saved. Defaults to 'scraping_output'.
+        exclude (str, optional): A CSV file of output_dir to ignore when looking for the most recent one (e.g. the one of the crawl being resumed). Defaults to None.
+
+    Returns:
+        pandas.DataFrame: The products of the previous crawl, or None if there is none.
+    """
+
+    # Find the most recent scraping output (file names contain the timestamp, so they sort chronologically)
+    if snapshot is True:
+        files = sorted(f for f in os.listdir(output_dir) if f.startswith("Mercadona Scraping") and f.endswith(".csv") and f != exclude) if os.path.isdir(output_dir) else []
+        if not files:
+            return None
+        snapshot = os.path.join(output_dir, files[-1])
+
+    # Read it with the product codes as strings, like the scraped ones
+    if isinstance(snapshot, str):
+        snapshot = pd.read_csv(snapshot, sep='~', dtype={"product_code": str}, parse_dates=["collected_timestamp"])
+
+    # Keep the last row of every product code (a product can be listed in more than one subcategory)
+    snapshot = snapshot.copy()
+    snapshot["product_code"] = snapshot["product_code"].astype(str)
+    known = snapshot[snapshot["product_code"] != "Not available"].drop_duplicates("product_code", keep="last")
+    return pd.concat([known, snapshot[snapshot["product_code"] == "Not available"]], ignore_index=True)
+
+def parse_product_grid(driver, category, subcategory):
+
+    """
+    Scrape the information shown in every cell of the product grid currently displayed, in a single round-trip to the browser.
+    The grid shows the name, format, price and unit of every product, but not the price per unit, URL and product code (saved as "Not available" unless the grid links to the product).
+
+    Args:
+        driver (selenium.webdriver.Chrome): A driver displaying a subcategory.
+        category (str): The category being displayed.
+        subcategory (str): The subcategory being displayed.
+
+    Returns:
+        list: A dictionary per product cell, in grid order, with the same keys as extract_product_detail().
+    """
+
+    # Read every cell in one call
+    with timed("grid_parse"):
+        cells = driver.execute_script(PRODUCT_GRID_SCRIPT)
+
+    list_of_dicts = []
+    for raw in cells:
+        info_prod = {}
+
+        # Name and format (type, volume and, when shown, price per unit)
+        info_prod["product"] = raw["product"] if raw["product"] is not None else "Not available"
+        product_format = raw["product_format"] + [None] * (3 - len(raw["product_format"]))
+        info_prod["product_type"] = product_format[0] if product_format[0] is not None else "Not available"
+        info_prod["product_volume"] = product_format[1] if product_format[1] is not None else "Not available"
+        info_prod["product_price_per_unit"] = product_format[2].replace("| ","") if product_format[2] is not None else "Not available"
+
+        # Product_price
+        try:
+            info_prod["product_price"] = float(raw["product_price"].replace("€","").strip().replace(",","."))
+        except:
+            info_prod["product_price"] = "Not Available"
+
+        # Product unit, category and subcategory (the ones being displayed)
+        info_prod["product_unit"] = raw["product_unit"].replace("/","").replace(".","") if raw["product_unit"] is not None else "Not Available"
+        info_prod["product_category"] = category
+        info_prod["product_subcategory"] = subcategory
+
+        # Url and Product code, if the cell links to the product, and scraped time
+        info_prod["product_url"] = raw["product_url"] if raw["product_url"] is not None else "Not available"
+        info_prod["product_code"] = raw["product_url"].split("/")[4] if raw["product_url"] is not None else "Not available"
+        info_prod["collected_timestamp"] = datetime.datetime.now()
 
-def get_product_info(zip, category, subcategory, wait=0, headless=False):
+        list_of_dicts.append(info_prod)
+
+    return list_of_dicts
+
+def get_product_info(zip, category, subcategory, wait=0, headless=False, driver=None, throttle=None, mode="detail", known_products=None, on_success=None):
 
     """
     Scrape product information from Mercadona website based on zip code, category, and subcategory.
@@ -146,47 +511,47 @@ def get_product_info(zip, category, subcategory, wait=0, headless=False):
         category (str): The category of products to search for.
         subcategory (str): The subcategory of products to search for.
         headless (bool, optional): Whether to run the Chrome webdriver in headless mode, which means the browser window will not be visible. Defaults to True.
+        driver (selenium.webdriver.Chrome, optional): A session created with start_session() to reuse. If not passed, a new session is started and closed when done. A passed session is never closed here. Defaults to None.
+        throttle (callable, optional): A function without arguments called before every product page request, used to respect a shared request rate (e.g. AdaptiveRateLimiter.acquire). Defaults to None.
+        on_success (callable, optional): A function without arguments called after every product page that loaded without being throttled, so that a shared request rate can speed up within the subcategory (e.g. AdaptiveRateLimiter.on_success). Defaults to None.
+        mode (str, optional): "detail" opens the detail of every product. "grid" parses every product cell of the subcategory in one pass and only opens the detail of the products that are not in known_products or whose name, format, price or unit changed (see product_changed()), unless their cell shows every field (see grid_is_complete()). The website grid does not show the product codes, so without known_products "grid" still opens every product: it is meant for delta crawls. Defaults to "detail".
+        known_products (dict, optional): Previously scraped products indexed with index_known_products(), used in "grid" mode to carry forward the unchanged products. Defaults to None.
         
     Returns:
         ret_df (pandas.DataFrame): A DataFrame with the following columns: 'product_name', 'product_type', 'volume', 'price_per_unit', 'price', 'unit', 'category', 'subcategory', 'url', 'product_code', 'timestamp'. Each row corresponds to a product scraped from the Mercadona website.
         product_count (int): The number of products scraped.
     """
 
-    # Create a ChromeOptions object
-    options = Options()
-
-    # Add the headless argument if passed
-    if headless:
-        options.add_argument('--headless')
-
-    # Specify the path to your web driver
-    driver = webdriver.Chrome(options=options)
+    # Start a new session if none was passed, otherwise move the existing one back to the categories page
+    own_session = driver is None
+    if own_session:
+        driver = start_session(zip, headless=headless)
+    else:
+        open_categories(driver)
 
-    # Navigate to the login page
-    driver.get('https://www.mercadona.es/')
+    with timed("category_click"):
 
-    # Enter the postal code and submit it
-    postal_code = driver.find_element(By.CSS_SELECTOR, 'input[aria-label="Código postal"]').send_keys(zip)
-    submit_button = driver.find_element(By.CSS_SELECTOR, 'input.postal-code-form__button').click()
+        # Wait for the passed category and subcategory to be clickable and clicks them
+        selected_category = WebDriverWait(driver, 10).until(EC.element_to_be_clickable((By.XPATH, f"//label[text()='{category}']"))).click()
+        selected_subcategory = WebDriverWait(driver, 10).until(EC.element_to_be_clickable((By.XPATH, f"//button[text()='{subcategory}']"))).click()
 
-    # Wait until categories is clickable and click it, then wait for the product grid to be clickable and accept cookies
-    categorias_link = WebDriverWait(driver, 10).until(EC.visibility_of_element_located((By.LINK_TEXT, "Categorías"))).click()
-    product_cell = WebDriverWait(driver, 10).until(EC.element_to_be_clickable((By.CSS_SELECTOR, "div[data-test='product-cell']")))
-    accept_button = driver.find_element(By.XPATH, "//button[contains(text(),'Aceptar todas')]").click()
+        # Wait for the products to load and saves them
+        WebDriverWait(driver, 10).until(EC.presence_of_all_elements_located((By.CSS_SELECTOR, ".product-cell")))
+        product_cells = driver.find_elements(By.CSS_SELECTOR, "div[data-test='product-cell']")
 
-    # Wait for the passed category and subcategory to be clickable and clicks them
-    selected_category = WebDriverWait(driver, 10).until(EC.element_to_be_clickable((By.XPATH, f"//label[text()='{category}']"))).click()
-    selected_subcategory = WebDriverWait(driver, 10).until(EC.element_to_be_clickable((By.XPATH, f"//button[text()='{subcategory}']"))).click()
-
-    # Wait for the products to load and saves them
-    WebDriverWait(driver, 10).until(EC.presence_of_all_elements_located((By.CSS_SELECTOR, ".product-cell")))
-    product_cells = driver.find_elements(By.CSS_SELECTOR, "div[data-test='product-cell']")
+    # In grid mode every cell is parsed at once and only the products that need it are opened
+    if mode == "grid":
+        ret = _get_grid_product_info(driver, category, subcategory, product_cells, known_products, wait=wait, throttle=throttle, on_success=on_success)
+        if own_session:
+            driver.quit()
+        return ret
 
     # Get the current URL of the page
     current_url = driver.current_url
 
     # Click on the frist "product-cell" element
-    product_cells[0].click()
+    with timed("product_click"):
+        product_cells[0].click()
 
     # Initialize list of dictionaries (to be turned into a dataframe) and product counter for feedback
     list_of_dicts = []
@@ -194,239 +559,552 @@ def get_product_info(zip, category, subcategory, wait=0, headless=False):
 
     # Iterate over the "product-cell" elements (products)
     for i in range(len(product_cells)):
-        # Scroll to the current product cell and wait for the "product-cell" element to be clickable
-        driver.execute_script("arguments[0].scrollIntoView();", product_cells[i])
-        product_cell = WebDriverWait(driver, 10).until(EC.element_to_be_clickable((By.CSS_SELECTOR, "div[data-test='product-cell']")))
+        with timed("product_load"):
 
-        # Wait for the description element to be present
-        descripcion = WebDriverWait(driver, 10).until(EC.presence_of_element_located((By.CSS_SELECTOR, '.private-product-detail__description')))
+            # Scroll to the current product cell and wait for the "product-cell" element to be clickable
+            driver.execute_script("arguments[0].scrollIntoView();", product_cells[i])
+            product_cell = WebDriverWait(driver, 10).until(EC.element_to_be_clickable((By.CSS_SELECTOR, "div[data-test='product-cell']")))
+
+            # Wait for the description element to be present
+            descripcion = WebDriverWait(driver, 10).until(EC.presence_of_element_located((By.CSS_SELECTOR, '.private-product-detail__description')))
 
         # Give feedback to user by printing the current product being scraped
         print(f'\rScraping "{i+1}: {product_cells[i].text[0:15]}..." product...                                                                              ', end='')
         sys.stdout.flush()
 
-        # Initialize the dictionary that will be appended to the list of already scraped product information (that will later be our DataFrame)
-        info_prod={}
-
-        # Scrapes data if available, when it is not, it saves "Not available"
-
-        # Product name
-        try:
-            info_prod["product"] = driver.find_element(By.CSS_SELECTOR, 'h1.title2-r.private-product-detail__description').text
-        except:
-            info_prod["product"] = "Not available"
-        
-        # Product_type
-        try:
-            info_prod["product_type"] = driver.find_element(By.CSS_SELECTOR, 'span.headline1-r:nth-child(1)').text
-        except:
-            info_prod["product_type"] = "Not available"
-        
-        # Product_volume
-        try:
-            info_prod["product_volume"] = driver.find_element(By.CSS_SELECTOR, 'span.headline1-r:nth-child(2)').text
-        except:
-            info_prod["product_volume"] = "Not available"
-        
-        # Price per unit (€ / L)
-        try:
-            info_prod["product_price_per_unit"] = driver.find_element(By.CSS_SELECTOR, 'span.headline1-r:nth-child(3)').text.replace("| ","")
-        except:
-            info_prod["product_price_per_unit"] = "Not available"
-        
-        # Product_price
-        try:
-            info_prod["product_price"] = float(driver.find_element(By.CSS_SELECTOR, 'p.product-price__unit-price.large-b').text.replace("€","").strip().replace(",","."))
-        except:
-            info_prod["product_price"] = "Not Available"
-        
-        # Product unit (e.g.: L)
-        try:
-            info_prod["product_unit"] = driver.find_element(By.CSS_SELECTOR, 'p.product-price__extra-price.title1-r').text.replace("/","").replace(".","")
-        except:
-            info_prod["product_unit"] = "Not Available"
-        
-        # Product category
-        try:
-            info_prod["product_category"] = driver.find_element(By.CSS_SELECTOR, 'span.subhead1-r').text.replace(" >","")
-        except:
-            info_prod["product_category"] = "Not Available"
-        
-        # Product Subcategory
-        try:
-            info_prod["product_subcategory"] = driver.find_element(By.CSS_SELECTOR, 'span.subhead1-sb').text
-        except:
-            info_prod["product_subcategory"] = "Not Available"
-        
-        # Url, Product code (from URL), and scraped time
-        info_prod["product_url"] = driver.current_url
-        info_prod["product_code"] = driver.current_url.split("/")[4]
-        info_prod["collected_timestamp"] = datetime.datetime.now()
+        # Scrape every field of the product detail in a single round-trip to the browser
+        info_prod = extract_product_detail(driver)
 
         # Appends the current row (product) to the list of dicts (will be turned to a DataFrame) and advances the counter
         list_of_dicts.append(info_prod)
         product_count += 1
         
         # Wait half of the time passed before going back to the product list
-        time.sleep(wait/2)
+        with timed("sleep"):
+            time.sleep(wait/2)
 
         # Send the 'esc' key and the back command to exit the product info page. Do it until we are moved back to the product grid (URL contains "categories")
-        while "categories" not in driver.current_url:
-            driver.back()
-            driver.find_element(By.CSS_SELECTOR, "body").send_keys(Keys.ESCAPE)
+        with timed("back_navigation"):
+            while "categories" not in driver.current_url:
+                driver.back()
+                driver.find_element(By.CSS_SELECTOR, "body").send_keys(Keys.ESCAPE)
         
         # Wait the second half of the time passed before clicking the next product
-        time.sleep(wait/2)
+        with timed("sleep"):
+            time.sleep(wait/2)
 
         # Click on the next "product-cell" element, if available
         if i < len(product_cells) - 1:
-            next_product_cell = product_cells[i+1]
-            next_product_cell.click()
 
-            # Wait for the page to load
-            WebDriverWait(driver, 10).until(EC.url_changes(current_url))
-
-            # If an error is thrwon because of too many requests, exit the function by returning "Error" and closing the browser window.
-            try:
-                len(driver.find_element(By.XPATH, '//button[contains(text(), "Entendido")]').text) > 0
-                driver.quit()
+            # Wait for our turn if the request rate is being limited
+            if throttle is not None:
+                throttle()
+
+            # Click it and wait for the page to load
+            with timed("product_click"):
+                next_product_cell = product_cells[i+1]
+                next_product_cell.click()
+                WebDriverWait(driver, 10).until(EC.url_changes(current_url))
+
+            # If an error is thrwon because of too many requests, exit the function by returning "Error" and closing the browser window (if it was created here).
+            with timed("throttle_check"):
+                throttled = len(driver.find_elements(By.XPATH, '//button[contains(text(), "Entendido")]')) > 0
+            if throttled:
+                if own_session:
+                    driver.quit()
                 return "error"
 
-            # If this error is not displayed the code in the previous block will fail so we can continue scraping
-            except:
-                continue
+            # Otherwise let the request rate speed up
+            if on_success is not None:
+                on_success()
         
-    # Creates the Data Frame to return from the list of dictionaries created and closes the browser window
+    # Creates the Data Frame to return from the list of dictionaries created and closes the browser window (if it was created here)
     ret_df = pd.DataFrame(list_of_dicts)
-    driver.quit()
+    if own_session:
+        driver.quit()
     
     return ret_df,product_count
 
-def mercadona_full_scraper(cod_postal,retry=4, wait_min=0.3, wait_max=0.5, e_wait_min=3, e_wait_max=5, max_error_wait = 5, prod_wait=0, headless=False):
+def _get_grid_product_info(driver, category, subcategory, product_cells, known_products, wait=0, throttle=None, on_success=None):
 
     """
-    Scrape all available product information from the Mercadona website for a given zip code. 
+    Scrape a subcategory in "grid" mode (see get_product_info()): parse the whole product grid in one pass and open the detail only of the products that need it.
+    Unchanged products are carried forward from known_products: their row is kept as it was scraped (including its collected_timestamp) and only its "last_verified" timestamp is updated.
+    New or changed products are kept as parsed from the grid when it shows every field (see grid_is_complete()), and only the rest are opened.
 
-    This function scrapes product information for all categories and subcategories in the specified zip code. It returns a pandas DataFrame with a row per each product scraped and the total amount of products scraped.
-    The product information includes the product name, type, volume, price per unit, price, unit, category, subcategory, URL, product code (from URL), and the collected timestamp.
+    Returns:
+        ret_df (pandas.DataFrame): A DataFrame with a row per product, with the same columns as get_product_info() plus "last_verified", the time the product was last checked against the website.
+        product_count (int): The number of products scraped.
+        If the website starts throttling requests, the string "error" is returned instead.
+    """
+
+    # Parse every cell of the grid
+    list_of_dicts = parse_product_grid(driver, category, subcategory)
+    known_products = known_products or {}
+
+    for i, info_prod in enumerate(list_of_dicts):
+        verified = datetime.datetime.now()
+
+        # Products already known that did not change are carried forward from the previous snapshot
+        known = find_known_product(known_products, info_prod)
+        if known is not None and not product_changed(known, info_prod):
+            list_of_dicts[i] = {**known, "product_category": category, "product_subcategory": subcategory, "last_verified": verified}
+            count("products_carried_forward")
+            continue
+
+        # Products whose cell shows every field are kept as parsed from the grid
+        if grid_is_complete(info_prod):
+            list_of_dicts[i] = {**info_prod, "last_verified": verified}
+            count("products_from_grid")
+            continue
+
+        # Otherwise open the product detail, waiting for our turn if the request rate is being limited
+        if throttle is not None:
+            throttle()
+
+        # Give feedback to user by printing the current product being scraped
+        print(f'\rScraping "{i+1}: {info_prod["product"][0:15]}..." product...                                                                              ', end='')
+        sys.stdout.flush()
+
+        # Click on the product and wait for its description
+        with timed("product_click"):
+            driver.execute_script("arguments[0].scrollIntoView();", product_cells[i])
+            product_cells[i].click()
+        with timed("product_load"):
+            WebDriverWait(driver, 10).until(EC.presence_of_element_located((By.CSS_SELECTOR, '.private-product-detail__description')))
+
+        # If an error is thrwon because of too many requests, exit the function by returning "Error"
+        with timed("throttle_check"):
+            throttled = len(driver.find_elements(By.XPATH, '//button[contains(text(), "Entendido")]')) > 0
+        if throttled:
+            return "error"
+
+        # Otherwise let the request rate speed up
+        if on_success is not None:
+            on_success()
+
+        # Replace the grid information with the one in the product detail
+        list_of_dicts[i] = {**extract_product_detail(driver), "last_verified": verified}
+        with timed("sleep"):
+            time.sleep(wait/2)
+
+        # Send the 'esc' key and the back command to exit the product info page. Do it until we are moved back to the product grid (URL contains "categories")
+        with timed("back_navigation"):
+            while "categories" not in driver.current_url:
+                driver.back()
+                driver.find_element(By.CSS_SELECTOR, "body").send_keys(Keys.ESCAPE)
+        with timed("sleep"):
+            time.sleep(wait/2)
+
+    # Creates the Data Frame to return from the list of dictionaries
+    return pd.DataFrame(list_of_dicts), len(list_of_dicts)
+
+class SeleniumEngine:
+
+    """
+    Scraping engine that drives a Chrome session, wrapping the functions of this module.
+
+    The session is started on first use, reused for every call and replaced when it dies or gets throttled.
+    It has the same methods as HttpEngine (see http_engine.py), so mercadona_full_scraper() can run with either of them.
 
     Args:
-        cod_postal (str): The zip code for the Mercadona website to search in. It is a string containing a 5 digit spanish zip code.
-        retry (int, optional): The number of times to retry scraping a subcategory if an error occurs. Defaults to 4.
-        wait_min (float, optional): The minimum amount of time to wait before each scrape, in seconds. Defaults to 0.3 (minutes).
-        wait_max (float, optional): The maximum amount of time to wait before each scrape, in seconds. Defaults to 0.5 (minutes).
-        e_wait_min (float, optional): The minimum amount of time to wait before retrying a failed scrape, in minutes. Defaults to 3.
-        e_wait_max (float, optional): The maximum amount of time to wait before retrying a failed scrape, in minutes. Defaults to 5.
-        max_error_wait (float, optional): The maximum amount of time to wait when an error occurs, in minutes. Defaults to 5. After every error, the random interval from which to pick a wait time increases, this parameter sets a max value.
-        prod_wait (float, optional): The amount of time to wait for the page to load before scraping product information, in seconds. Defaults to 0.
-        headless (bool, optional): Whether to run the Chrome webdriver in headless mode, which means the browser window will not be visible. Defaults to False.
-        
+        zip (str): The postal code used to find the nearest Mercadona store.
+        headless (bool, optional): Whether to run the browser in headless mode. Defaults to False.
+    """
+
+    name = "selenium"
+
+    def __init__(self, zip, headless=False):
+        self.zip = zip
+        self.headless = headless
+        self.driver = None
+
+    def is_alive(self):
+
+        """
+        Returns:
+            bool: True if the browser session answers and is not being throttled.
+        """
+
+        return session_is_alive(self.driver)
+
+    def restart(self):
+
+        """
+        Close the browser session (if any) and start a new one. Only replacing a session counts as a session restart, not starting the first one.
+        """
+
+        if self.driver is not None:
+            count("session_restarts")
+        self.driver = recycle_session(self.driver, self.zip, headless=self.headless)
+
+    def get_categories(self):
+
+        """
+        Returns:
+            list: A list of strings containing the name of each category. See get_categories().
+        """
+
+        if not self.is_alive():
+            self.restart()
+        return get_categories(self.zip, headless=self.headless, driver=self.driver)
+
+    def get_subcategories(self, category):
+
+        """
+        Returns:
+            list: A list of strings containing the name of every subcategory of the given category. See get_subcategories().
+        """
+
+        if not self.is_alive():
+            self.restart()
+        return get_subcategories(self.zip, category, headless=self.headless, driver=self.driver)
+
+    def get_product_info(self, category, subcategory, **kwargs):
+
+        """
+        Scrape the products of a subcategory, replacing the session first if it died or is being throttled (e.g. between two jobs of a worker). See get_product_info() for the arguments and return values.
+        """
+
+        if not self.is_alive():
+            self.restart()
+        return get_product_info(self.zip, category, subcategory, headless=self.headless, driver=self.driver, **kwargs)
+
+    def close(self):
+
+        """
+        Close the browser session.
+        """
+
+        try:
+            self.driver.quit()
+        except:
+            pass
+        self.driver = None
+
+def create_engine(engine, zip, headless=False, **engine_kwargs):
+
+    """
+    Create a scraping engine by name.
+
+    Args:
+        engine (str): "selenium" to drive a Chrome browser or "http" to read the JSON API behind the website.
+        zip (str): The postal code used to find the nearest Mercadona store.
+        headless (bool, optional): Whether to run the browser in headless mode (only used by the "selenium" engine). Defaults to False.
+        **engine_kwargs: Extra arguments for the engine (e.g. base_url for the "http" engine).
+
     Returns:
-        product_info (pandas.DataFrame): A pandas DataFrame with a row per each product scraped.
-        missing_subcategories (pandas.DataFrame): A pandas DataFrame with a list of subcategories that failed to scrape.
+        SeleniumEngine or HttpEngine: The engine, not started yet.
     """
-    
-    # Record start time and current time as timestamp
-    start_time=time.time()
-    timestamp = datetime.datetime.now().strftime('%Y-%m-%d_%H-%M-%S')
 
-    # Use timestamp to create unique session name
-    session_name = f"Mercadona Scraping {timestamp}"
+    if engine == "selenium":
+        return SeleniumEngine(zip, headless=headless, **engine_kwargs)
+    if engine == "http":
+        return HttpEngine(zip, **engine_kwargs)
+    raise ValueError(f'Unknown engine "{engine}", use "selenium" or "http"')
+
+def discover_jobs(engine, cod_postal, category_ttl_days=30):
+
+    """
+    Discover every (category, subcategory) pair to scrape for a postal code, reusing the cached category tree when it is fresh and still matches the categories listed by the website (see category_cache.py).
+
+    Args:
+        engine (SeleniumEngine or HttpEngine): The engine used to read the categories.
+        cod_postal (str): The postal code being scraped.
+        category_ttl_days (float, optional): How long a cached category tree is reused, in days. 0 or None always discovers the tree. Defaults to 30.
+
+    Returns:
+        list: The (category, subcategory) tuples, in website order.
+    """
 
     # Print message indicating that categories are being retrieved
     print(f"\rGetting categories...                                                      ", end='')
     sys.stdout.flush()
 
     # Retrieve categories from Mercadona website for given postal code
-    categories = get_categories(cod_postal, headless=headless)
+    categories = engine.get_categories()
 
-    # Create empty DataFrame to store product information
-    product_info = pd.DataFrame({})
+    # Use the cached category tree if it is fresh and the categories listed still match it
+    discovered_jobs = load_category_tree(cod_postal, ttl_days=category_ttl_days) if category_ttl_days else None
+    if discovered_jobs is not None and tree_matches(discovered_jobs, categories):
+        print(f"\rUsing the cached category tree ({len(discovered_jobs)} subcategories).                                  ")
 
-    # Set error count to 0 and create empty list to store missing subcategories
-    error_count = 0
-    missing_subcats = []
+    # Otherwise loop through each category
+    else:
+        discovered_jobs = []
+        for i in categories:
 
-    # Loop through each category
-    for i in categories:
+            # Print message indicating that subcategories for current category are being retrieved
+            print(f'\rGetting subcategories for the "{i}" category...                                                      ', end='')
+            sys.stdout.flush()
 
-        # Print message indicating that subcategories for current category are being retrieved
-        print(f'\rGetting subcategories for the "{i}" category...                                                      ', end='')
+            # Retrieve subcategories for current category
+            for x in engine.get_subcategories(i):
+                discovered_jobs.append((i, x))
+
+        # Cache the tree for the next crawls of this postal code
+        if category_ttl_days:
+            save_category_tree(cod_postal, discovered_jobs)
+
+    return discovered_jobs
+
+def _scrape_worker(engine, jobs, crawl, limiter, retry, product_kwargs):
+
+    """
+    Take (category, subcategory) jobs from a shared queue and scrape them with an engine (and its browser or HTTP session) owned by this worker, until the queue is empty.
+    Used by mercadona_full_scraper() both for sequential (one worker) and concurrent crawls.
+
+    Args:
+        engine (SeleniumEngine or HttpEngine): The engine used by this worker. It is closed when the queue is empty.
+        jobs (queue.Queue): Queue of (category, subcategory) tuples to scrape.
+        crawl (dict): State shared by all the workers: a "lock", the output "sink" (CsvSink), the "checkpoint" (CrawlCheckpoint), the "missing_subcats" list, the "start_time", the "price_alerts" detector (PriceChangeDetector or None), the "metrics" (CrawlMetrics) and the "metrics_path" where they are saved after every subcategory.
+        limiter (AdaptiveRateLimiter): Request rate controller shared by all the workers.
+        retry (int): The number of times to try scraping a subcategory.
+        product_kwargs (dict): Extra arguments passed to every get_product_info() call (e.g. wait or mode).
+    """
+
+    start_time = crawl["start_time"]
+
+    # Time spent waiting for the rate limiter, before a subcategory and before every product inside it
+    acquire = timed_function("rate_limit_wait", limiter.acquire)
+
+    while True:
+
+        # Take the next job, finishing when there are none left
+        try:
+            i, x = jobs.get_nowait()
+        except queue.Empty:
+            break
+
+        # Print message indicating that products for current subcategory are being retrieved
+        print(f'\rGetting products for the "{x}" subcategory in the "{i}" category...                                                ')
         sys.stdout.flush()
 
-        # Retrieve subcategories for current category
-        subcategories = get_subcategories(cod_postal, i, headless=headless)
+        # Start the set number of retries to scrape the product information
+        for attempt in range(retry):
+            result = None
+            if attempt > 0:
+                count("retries")
+            try:
+
+                # Wait for the rate limiter before opening the subcategory, and before every product inside it (every product that loads lets it speed up). The engine starts the session, or replaces it if it died or is being throttled (a failed replacement counts as a failed attempt)
+                acquire()
+                result = engine.get_product_info(i, x, throttle=acquire, on_success=limiter.on_success, **product_kwargs)
 
-        # Loop through each subcategory
-        for x in subcategories:
+            # A timeout usually means the website is slowing us down, anything else is just a failed attempt
+            except (TimeoutException, requests.Timeout):
+                count("throttle_events")
+                pause = limiter.on_throttle()
+            except:
+                count("errors")
+                pause = limiter.on_error()
+
+            # The "Entendido" too-many-requests dialog was displayed
+            if isinstance(result, str):
+                count("throttle_events")
+                pause = limiter.on_throttle()
+
+            # Success
+            elif result is not None:
+                products, product_count = result
+
+                # The subcategory page loaded too, let the rate limiter speed up (its products were reported as they loaded)
+                limiter.on_success()
+
+                # Append only the new rows to the CSV file so that nothing is lost in case the scraping is interrupted
+                with timed("csv_append"):
+                    rows_written = crawl["sink"].append(products)
+
+                # Report the price changes of the subcategory right away
+                if crawl["price_alerts"] is not None:
+                    with timed("price_alerts"):
+                        crawl["price_alerts"].check(products)
+
+                # Record the subcategory as done in the checkpoint so that a resumed crawl skips it, and save the metrics so far
+                crawl["checkpoint"].mark_completed(i, x)
+                count("subcategories")
+                count("products", product_count)
+                crawl["metrics"].save(crawl["metrics_path"])
+
+                # Print message indicating successful retrieval of current subcategory's products
+                print(f"\n---------------\nTime:{round((time.time()-start_time)/60,2)}\nFinished '{x}' subcateogry succesfully. \n{product_count} products registered.\nCurrent number of products captured: {rows_written}\nCurrent rate: {round(limiter.rate*60,1)} requests/minute\n---------------\n")
+                break
+
+            # Record the failed attempt in the checkpoint
+            crawl["checkpoint"].record_failure(i, x)
+            print(f'\n\nTime: {round((time.time()-start_time)/60,2)}')
+
+            # If no more retries are left, add the subcategory to the list of missing subcategories and move to the next job
+            if attempt == retry - 1:
+                print(f"!!! An error occurred in subcategory '{x}'... Again... Adding it to the list of missing subcategories...\nRequests paused {round(pause/60,2)} minutes, rate lowered to {round(limiter.rate*60,1)} requests/minute so that we don't get caught... ")
+                missed_subcat={}
+                missed_subcat["category"]=i
+                missed_subcat["subcategory"]=x
+                with crawl["lock"]:
+                    crawl["missing_subcats"].append(missed_subcat)
+                crawl["checkpoint"].mark_missing(i, x)
+                count("missing_subcategories")
+                crawl["metrics"].save(crawl["metrics_path"])
+                break
+
+            # Retry the current subcategory, the rate limiter makes the next attempt wait
+            print(f'!!! An error occurred in subcategory "{x}". Retrying in {round(pause/60,2)} minutes at {round(limiter.rate*60,1)} requests/minute...\n')
+
+    # Close this worker's session
+    with timed("session_close"):
+        engine.close()
+
+def mercadona_full_scraper(cod_postal,retry=4, wait_min=None, wait_max=0.5, e_wait_min=3, e_wait_max=5, max_error_wait = 5, prod_wait=0, headless=False, workers=1, max_requests_per_minute=60, resume=None, mode="detail", engine="selenium", engine_kwargs=None, previous_snapshot=None, category_ttl_days=30, snapshot_dir='scraping_output/snapshots', price_alerts=None, metrics_port=None):
 
-            # Print message indicating that products for current subcategory are being retrieved
-            print(f'\rGetting products for the "{x}" subcategory in the "{i}" category...                                                ')
-            sys.stdout.flush()
-            
-            # Set number of retries to maximum number allowed
-            retries = retry
-
-            # Start the set number of retries to scrape the product information
-            while retries > 0:
-                try:
-
-                    # Retrieve product information for current subcategory
-                    products, product_count =  get_product_info(cod_postal, i, x, wait=prod_wait, headless=headless)
-
-                    # Concatenate product information to previously retrieved information
-                    product_info = pd.concat([product_info,products], ignore_index=True)
-
-                    # Write product information to CSV file with unique session name in order to avoid losing information in case the scraping is interrupted.
-                    product_info.to_csv(f'scraping_output/{session_name}.csv', index=False, mode='w', sep='~')
-
-                    # Generate random wait time between specified minimum and maximum values
-                    random_time = random.randint((wait_min*60*1000), (wait_max*60*1000)) /1000
-
-                    # If random wait time is greater than specified maximum error wait time, generate random wait time within error range
-                    if random_time > max_error_wait*60:
-                        random_time = random.randint((((max_error_wait*60)-30)*1000), (((max_error_wait*60)+30)*1000)) /1000
-                    
-                    # Print message indicating successful retrieval of current subcategory's products
-                    print(f"\n---------------\nTime:{round((time.time()-start_time)/60,2)}\nFinished '{x}' subcateogry succesfully. \n{product_count} products registered.\nWaiting {round(random_time/60,2)} minutes so that we don't get caught...\nCurrent size of data captured: {product_info.shape}\n---------------\n")
-                    
-                    # Wait for random wait time before moving on to next subcategory
-                    time.sleep(random_time)
-                    break
-
-                # Error handling for failed product information retrieval
-                except:
-
-                    # Print the time at which the error occurred
-                    print(f'\n\nTime: {round((time.time()-start_time)/60,2)}')
-
-                    # Calculate a random amount of time to wait before retrying, based on the error count
-                    random_time = random.randint((((e_wait_min*60)+(error_count*10))*1000), (((e_wait_max*60)+(error_count*10))*1000)) /1000
-                    
-                    # If the random time is greater than the maximum error wait time, cap it at the maximum
-                    if random_time > max_error_wait*60:
-                        random_time = random.randint((((max_error_wait*60)-30)*1000), (((max_error_wait*60)+30)*1000)) /1000
-                    
-                    # Increment the error count
-                    error_count +=1
-
-                    # If no more retries are left, add the subcategory to the list of missing subcategories and wait before breaking out of the for loop
-                    if retries == 1:
-                        print(f"!!! An error occurred in subcategory '{x}'... Again... Adding it to the list of missing subcategories...\Waiting {round(random_time/60,2)} minutes so that we don't get caught... ")
-                        missed_subcat={}
-                        missed_subcat["category"]=i
-                        missed_subcat["subcategory"]=x
-                        missing_subcats.append(missed_subcat)
-                        time.sleep(random_time)
-                        break
-
-                    # Decrement the number of retries left and wait before retrying the current subcategory
-                    retries -=1
-                    print(f'!!! An error occurred in subcategory "{x}". Retrying in {round(random_time/60,2)} minutes...\n')
-                    time.sleep(random_time)
+    """
+    Scrape all available product information from the Mercadona website for a given zip code. 
+
+    This function scrapes product information for all categories and subcategories in the specified zip code. It returns a pandas DataFrame with a row per each product scraped and the total amount of products scraped.
+    The product information includes the product name, type, volume, price per unit, price, unit, category, subcategory, URL, product code (from URL), and the collected timestamp.
+
+    Categories and subcategories are discovered first with a single session. Then every (category, subcategory) pair is put in a queue that is consumed by `workers` threads, each one owning its own session that is reused for all of its subcategories and only replaced when it dies or gets throttled.
+    The sessions are browser sessions with the "selenium" engine (SeleniumEngine) or pooled HTTP sessions against the JSON API with the "http" engine (HttpEngine); both produce the same columns.
+    Every subcategory scraped is appended to "scraping_output/Mercadona Scraping <timestamp>.csv" as soon as it finishes, and the returned DataFrame is read from that file once at the end of the crawl.
+    Progress is recorded in a checkpoint manifest next to the CSV ("<session_name>.checkpoint.json", see CrawlCheckpoint). With `resume`, an interrupted crawl skips the category discovery and the subcategories already completed, and keeps appending to the same CSV file.
+    Every page request (opening a subcategory or a product) goes through a rate limiter shared by all the workers (see AdaptiveRateLimiter). It starts at half of `max_requests_per_minute` (or one request every `wait_min` minutes), speeds up with every page that loads, up to `max_requests_per_minute`, and when the website throttles us ("Entendido" dialog or timeouts) it halves the rate, down to one request every `wait_max` minutes, and pauses every worker between `e_wait_min` and `max_error_wait` minutes (doubling on consecutive errors).
+    The time spent in every stage of the crawl (driver startup, postal code, category clicks, product clicks and loads, field lookups, back navigation, sleeps, rate limiter waits...) and its events (products, retries, throttle events, session restarts, missing subcategories) are recorded in "<session_name>.metrics.json" after every subcategory (see CrawlMetrics in metrics.py), and summarized stage by stage at the end of the crawl.
+
+    Args:
+        cod_postal (str): The zip code for the Mercadona website to search in. It is a string containing a 5 digit spanish zip code.
+        retry (int, optional): The number of times to retry scraping a subcategory if an error occurs. Defaults to 4.
+        wait_min (float, optional): The initial time between two requests (across all workers), in minutes. Defaults to None: the crawl starts at half of max_requests_per_minute, or at one product per prod_wait seconds per worker if that is slower.
+        wait_max (float, optional): The longest time between two requests the rate limiter can slow down to, in minutes. Defaults to 0.5.
+        e_wait_min (float, optional): The pause of every request after the first error in a row, in minutes. It doubles with every consecutive error. Defaults to 3.
+        e_wait_max (float, optional): The random time added to every pause after an error is up to e_wait_max - e_wait_min minutes. Defaults to 5.
+        max_error_wait (float, optional): The longest pause after consecutive errors, in minutes. Defaults to 5.
+        prod_wait (float, optional): The amount of time to wait for the page to load before scraping product information, in seconds. Defaults to 0.
+        headless (bool, optional): Whether to run the Chrome webdriver in headless mode, which means the browser window will not be visible. Defaults to False.
+        workers (int, optional): The number of browser sessions scraping subcategories at the same time. Defaults to 1.
+        max_requests_per_minute (float, optional): Ceiling for the number of page requests per minute across all workers. Defaults to 60.
+        resume (bool or str, optional): Resume an interrupted crawl. If True, the most recent unfinished crawl for this zip code is resumed; if a string, the crawl with that session name (e.g. "Mercadona Scraping 2023-03-16_15-10-02"). If nothing is found to resume, a new crawl is started. Defaults to None.
+        mode (str, optional): How every subcategory is scraped, "detail" (open every product) or "grid" (parse the product grid and only open the products that need it). The website grid does not show the product codes, so "grid" only saves page loads in a delta crawl (see previous_snapshot), which uses it anyway. See get_product_info(). Only used by the "selenium" engine. Defaults to "detail".
+        engine (str, optional): "selenium" to drive Chrome or "http" to read the JSON API behind the website. Defaults to "selenium".
+        engine_kwargs (dict, optional): Extra arguments for the engines (e.g. {"base_url": ...} for the "http" engine). Defaults to None.
+        previous_snapshot (bool, str or pandas.DataFrame, optional): Run a delta crawl against a previous snapshot: True for the most recent file in "scraping_output", or the path of a CSV file or a DataFrame (see load_previous_snapshot()). Subcategories are scraped in "grid" mode and only new or changed products are opened, the rest are carried forward with an updated "last_verified" timestamp. Only used by the "selenium" engine. Defaults to None.
+        category_ttl_days (float, optional): How long the discovered category tree of a postal code is reused, in days (see category_cache.py). A cached tree is only used if the categories listed by the website still match it, which takes a single page instead of a page per category. 0 or None always discovers the tree. Defaults to 30.
+        snapshot_dir (str, optional): The snapshot store where the products are also written, as a Parquet file partitioned by scrape date (see snapshot_store.py). None only writes the CSV file. Defaults to 'scraping_output/snapshots'.
+        price_alerts (PriceChangeDetector, optional): Checks the products of every subcategory as soon as it is scraped and emits an event for every price change (see price_alerts.py). Defaults to None.
+        metrics_port (int, optional): If set, the metrics are also served in the Prometheus text format at http://127.0.0.1:<metrics_port>/metrics while the crawl runs. Defaults to None.
+        
+    Returns:
+        product_info (pandas.DataFrame): A pandas DataFrame with a row per each product scraped, with compact dtypes (see typed_products() in output.py).
+        missing_subcategories (pandas.DataFrame): A pandas DataFrame with a list of subcategories that failed to scrape.
+    """
+
+    # The rate limiter works in requests per second, the arguments are in minutes. Unless wait_min is given, it starts at half of the ceiling, or at the pace prod_wait allows every worker if that is slower
+    max_rate = max_requests_per_minute / 60
+    initial_rate = min(max_rate / 2, max(workers, 1) / prod_wait) if prod_wait > 0 else max_rate / 2
+    if wait_min is not None:
+        initial_rate = 1/(max(wait_min, 1/600)*60)
+    wait_max = max(wait_max, 1/600)
     
-    # Convert the list of missing subcategories to a DataFrame
-    mising_subcategories = pd.DataFrame(missing_subcats)
+    # Record start time and current time as timestamp
+    start_time=time.time()
+    timestamp = datetime.datetime.now().strftime('%Y-%m-%d_%H-%M-%S')
+
+    # Look for the checkpoint of the crawl to resume, if asked for
+    checkpoint = None
+    if resume:
+        checkpoint = CrawlCheckpoint.find('scraping_output', cod_postal, session_name=None if resume is True else resume)
+        if checkpoint is not None:
+            print(f'Resuming "{checkpoint.session_name}": {len(checkpoint.completed)} of {len(checkpoint.jobs)} subcategories already completed.')
+
+    # Otherwise use timestamp to create unique session name and start a new checkpoint
+    if checkpoint is None:
+        session_name = f"Mercadona Scraping {timestamp}"
+        checkpoint = CrawlCheckpoint.create('scraping_output', session_name, cod_postal)
+    session_name = checkpoint.session_name
+
+    # Collect the timers and counters of the crawl, reported by the scraping functions while it is active
+    metrics = CrawlMetrics(session_name, workers=max(workers, 1))
+    previous_metrics = activate(metrics)
+
+    # Whatever happens (even failing to serve the metrics), stop recording, free the metrics port and close the sessions, so that the crawl can be resumed in the same process
+    metrics_server = None
+    engines = []
+    try:
+        if metrics_port is not None:
+            metrics_server = metrics.serve(metrics_port)
+
+        # One engine per worker, the first one is also used for discovery
+        for n in range(max(workers, 1)):
+            engines.append(create_engine(engine, cod_postal, headless=headless, **(engine_kwargs or {})))
+
+        # Discover the categories and subcategories, unless they are already recorded in the checkpoint (so that a resumed crawl does not need to discover them again)
+        if not checkpoint.jobs:
+            checkpoint.set_jobs(discover_jobs(engines[0], cod_postal, category_ttl_days=category_ttl_days))
+
+        # Queue of (category, subcategory) jobs not completed yet, to be consumed by the workers
+        jobs = queue.Queue()
+        for job in checkpoint.pending_jobs():
+            jobs.put(job)
+
+        # State shared by all the workers: output file, missing subcategories and error count
+        crawl = {
+            "lock": threading.Lock(),
+            "sink": CsvSink(f'scraping_output/{session_name}.csv'),
+            "checkpoint": checkpoint,
+            "missing_subcats": [],
+            "start_time": start_time,
+            "price_alerts": price_alerts,
+            "metrics": metrics,
+            "metrics_path": f'scraping_output/{session_name}.metrics.json',
+        }
+
+        # Request rate controller shared by all the workers
+        limiter = AdaptiveRateLimiter(initial_rate, min(1/(wait_max*60), max_rate), max_rate, backoff_min=e_wait_min*60, backoff_max=max_error_wait*60, jitter=max(e_wait_max-e_wait_min, 0)*60)
+
+        # In a delta crawl, index the previous snapshot so that only new or changed products are opened
+        product_kwargs = {"wait": prod_wait, "mode": mode}
+        if previous_snapshot is not None and previous_snapshot is not False:
+            snapshot = load_previous_snapshot(previous_snapshot, output_dir='scraping_output', exclude=f"{session_name}.csv")
+            if snapshot is not None:
+                print(f"Delta crawl against a previous snapshot of {len(snapshot)} products.")
+                product_kwargs = {"wait": prod_wait, "mode": "grid", "known_products": index_known_products(snapshot)}
+
+        # Run the workers, each one with its own engine
+        worker_args = (jobs, crawl, limiter, retry, product_kwargs)
+        if workers <= 1:
+            _scrape_worker(engines[0], *worker_args)
+        else:
+            threads = [threading.Thread(target=_scrape_worker, args=(worker_engine,) + worker_args) for worker_engine in engines]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        # Mark the crawl as finished if every subcategory was scraped, otherwise it can still be resumed to retry the missing ones
+        if not checkpoint.pending_jobs():
+            checkpoint.finish()
+
+        # Convert the list of missing subcategories to a DataFrame
+        mising_subcategories = pd.DataFrame(crawl["missing_subcats"])
+
+        # Build the DataFrame with all the product information from the output file, only once and with compact dtypes
+        with timed("output_read"):
+            product_info = crawl["sink"].read(typed=True)
+
+        # Add the crawl to the snapshot store (pyarrow is only needed here)
+        if snapshot_dir is not None:
+            from snapshot_store import write_snapshot
+            with timed("snapshot_write"):
+                write_snapshot(product_info, root=snapshot_dir, started=checkpoint.created)
+
+        # Save the metrics and show where the time went
+        metrics.save(crawl["metrics_path"])
+        print(metrics.summary())
+    finally:
+        activate(previous_metrics)
+        if metrics_server is not None:
+            metrics_server.shutdown()
+            metrics_server.server_close()
+        for worker_engine in engines:
+            worker_engine.close()
 
     # Return the DataFrame containing all product information and the DataFrame containing missing subcategories
-    return product_info, mising_subcategories
\ No newline at end of file
+    return product_info, mising_subcategories
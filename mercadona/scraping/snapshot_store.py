@@ -0,0 +1,233 @@
+# Import libraries
+import os
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from output import typed_products
+
+# Folder of the snapshot store, with a "scrape_date=YYYY-MM-DD" folder per day
+SNAPSHOT_DIR = 'scraping_output/snapshots'
+
+# Price per unit as the website shows it (e.g. "| 1,20 €/L", "0,90 €/100 ml" or "1.234,50 €/kg")
+UNIT_PRICE_PATTERN = r'(?P<price>\d{1,3}(?:\.\d{3})*(?:,\d+)?|\d+(?:,\d+)?)\s*€\s*/\s*(?P<unit>.+?)\s*$'
+
+# Columns of a snapshot. Product codes are strings (some products have variants, e.g. "3505.2"), stored as plain strings because the reader only skips row groups by the statistics of non-dictionary columns (read_snapshots() returns them as categoricals). The other text columns are dictionary encoded, since they repeat every day (they are read back as categoricals)
+SNAPSHOT_SCHEMA = pa.schema([
+    ("product_code", pa.string()),
+    ("product", pa.dictionary(pa.int32(), pa.string())),
+    ("product_type", pa.dictionary(pa.int16(), pa.string())),
+    ("product_volume", pa.dictionary(pa.int32(), pa.string())),
+    ("product_price", pa.float32()),
+    ("product_unit", pa.dictionary(pa.int16(), pa.string())),
+    ("unit_price", pa.float32()),
+    ("unit_price_unit", pa.dictionary(pa.int16(), pa.string())),
+    ("product_category", pa.dictionary(pa.int16(), pa.string())),
+    ("product_subcategory", pa.dictionary(pa.int16(), pa.string())),
+    ("product_url", pa.dictionary(pa.int32(), pa.string())),
+    ("collected_timestamp", pa.timestamp("s")),
+    ("last_verified", pa.timestamp("s")),
+    ("postal_code", pa.dictionary(pa.int16(), pa.string())),
+    ("warehouse", pa.dictionary(pa.int16(), pa.string())),
+])
+
+# Rows per row group. A daily crawl (about 5,000 products) is split in three row groups, each with the min and max product code it contains, so that readers looking for a few codes skip the others
+ROW_GROUP_SIZE = 2048
+
+# Partitioning of the store: a folder per scrape date
+PARTITIONING = ds.partitioning(pa.schema([("scrape_date", pa.date32())]), flavor="hive")
+
+
+
+# Functions
+
+def parse_unit_price(price_per_unit):
+
+    """
+    Parse the prices per unit shown by the website into numbers and units (e.g. "| 1,20 €/L" -> 1.2 and "L").
+
+    Args:
+        price_per_unit (pandas.Series): The "product_price_per_unit" column of a scraping output.
+
+    Returns:
+        unit_price (pandas.Series): The price per unit as a float, missing when there is none (e.g. "Not available").
+        unit (pandas.Series): The unit of that price (e.g. "L", "kg" or "100 ml").
+    """
+
+    # Every distinct text is only parsed once (the catalogue repeats them every day)
+    positions, texts = pd.factorize(price_per_unit.astype(str))
+    parts = pd.Series(texts).str.extract(UNIT_PRICE_PATTERN)
+    unit_price = pd.to_numeric(parts["price"].str.replace(".", "", regex=False).str.replace(",", ".", regex=False), errors="coerce")
+    return pd.Series(unit_price.to_numpy()[positions], index=price_per_unit.index), pd.Series(parts["unit"].to_numpy()[positions], index=price_per_unit.index)
+
+def snapshot_table(products):
+
+    """
+    Clean and type scraped products as a snapshot (see SNAPSHOT_SCHEMA): the same cleaning as get_categories_from_scraping() in order_history_retrieving.py, numeric prices per unit and dictionary encoded categories.
+
+    Args:
+        products (pandas.DataFrame): Products with the columns returned by get_product_info() in scraper.py (and optionally "postal_code" and "warehouse").
+
+    Returns:
+        pyarrow.Table: The snapshot, sorted by product code as stored (text, e.g. "10000" before "9592"), which is how the min and max statistics of the row groups are compared, so that readers can skip the row groups that do not contain the codes they look for.
+    """
+
+    df = pd.DataFrame(index=products.index)
+    df["product_code"] = typed_products(products[["product_code"]])["product_code"].astype(object)
+    df["product"] = products["product"].astype(str)
+    df["product_type"] = products["product_type"].astype(str)
+    df["product_volume"] = products["product_volume"].astype(str)
+    df["product_price"] = pd.to_numeric(products["product_price"], errors="coerce").astype("float32")
+
+    # Older outputs have units like "/ud." and categories ending in " >"
+    df["product_unit"] = products["product_unit"].astype(str).str.replace("/", "", regex=False).str.replace(".", "", regex=False)
+    df["unit_price"], df["unit_price_unit"] = parse_unit_price(products["product_price_per_unit"])
+    df["unit_price"] = df["unit_price"].astype("float32")
+    df["product_category"] = products["product_category"].astype(str).str.replace(" >", "", regex=False)
+    df["product_subcategory"] = products["product_subcategory"].astype(str)
+    df["product_url"] = products["product_url"].astype(str)
+
+    # Timestamps, and the store columns of a multi-store crawl
+    df["collected_timestamp"] = pd.to_datetime(products["collected_timestamp"]).dt.floor("s")
+    df["last_verified"] = pd.to_datetime(products["last_verified"]).dt.floor("s") if "last_verified" in products.columns else pd.NaT
+    for column in ["postal_code", "warehouse"]:
+        df[column] = products[column].astype(str) if column in products.columns else None
+
+    df = df.sort_values("product_code", kind="stable")
+    return pa.Table.from_pandas(df, schema=SNAPSHOT_SCHEMA, preserve_index=False)
+
+def crawl_start(products):
+
+    """
+    Estimate when the crawl of a set of products started: the earliest time a product was checked against the website.
+    A row carried forward by a delta crawl keeps the collected_timestamp of the crawl that scraped it, but its last_verified is the time it was checked again, so the later of both is used for every row.
+
+    Args:
+        products (pandas.DataFrame): Products with the columns returned by get_product_info() in scraper.py (and optionally "last_verified").
+
+    Returns:
+        pandas.Timestamp: The start of the crawl.
+    """
+
+    checked = pd.to_datetime(products["collected_timestamp"])
+    if "last_verified" in products.columns:
+        checked = pd.concat([checked, pd.to_datetime(products["last_verified"])], axis=1).max(axis=1)
+    return pd.Timestamp(checked.min())
+
+def write_snapshot(products, root=SNAPSHOT_DIR, started=None):
+
+    """
+    Write the products of a crawl to the snapshot store, as a compressed Parquet file in the folder of its scrape date (the date the crawl started).
+    The file is named after the start of the crawl, so writing the same crawl again (e.g. after resuming it) replaces it.
+
+    Args:
+        products (pandas.DataFrame or str): The products of a crawl, or the path of a scraping output (CSV file separated by "~").
+        root (str, optional): The folder of the store. Defaults to SNAPSHOT_DIR.
+        started (str or datetime, optional): When the crawl started. Defaults to None (estimated from the products with crawl_start()).
+
+    Returns:
+        str: The path of the file written, or None if there were no products.
+    """
+
+    if isinstance(products, str):
+        products = pd.read_csv(products, sep='~')
+    if products is None or len(products) == 0:
+        return None
+
+    table = snapshot_table(products)
+    started = crawl_start(products) if started is None else pd.Timestamp(started)
+    folder = os.path.join(root, f"scrape_date={started.date().isoformat()}")
+    os.makedirs(folder, exist_ok=True)
+
+    # Write a temporary file and replace the old one, so that readers never see a half-written snapshot
+    path = os.path.join(folder, f"snapshot_{started.strftime('%H-%M-%S')}.parquet")
+    pq.write_table(table, path + ".tmp", compression="zstd", row_group_size=ROW_GROUP_SIZE)
+    os.replace(path + ".tmp", path)
+    return path
+
+def convert_csv_outputs(output_dir='scraping_output', root=SNAPSHOT_DIR):
+
+    """
+    Add the scraping outputs (CSV files) of output_dir to the snapshot store.
+
+    Args:
+        output_dir (str, optional): The folder where the scraping outputs are saved. Defaults to 'scraping_output'.
+        root (str, optional): The folder of the store. Defaults to SNAPSHOT_DIR.
+
+    Returns:
+        list: The paths of the files written.
+    """
+
+    files = sorted(f for f in os.listdir(output_dir) if f.startswith("Mercadona") and f.endswith(".csv"))
+    return [path for path in (write_snapshot(os.path.join(output_dir, f), root=root) for f in files) if path is not None]
+
+def snapshot_filter(product_codes=None, start=None, end=None):
+
+    """
+    Build the filter of read_snapshots(), which the reader applies to the scrape dates of the folders and to the product code statistics of the row groups before reading them.
+
+    Args:
+        product_codes (list, optional): Only read these product codes. Defaults to None.
+        start (str or datetime.date, optional): First scrape date to read. Defaults to None.
+        end (str or datetime.date, optional): Last scrape date to read. Defaults to None.
+
+    Returns:
+        pyarrow.dataset.Expression: The filter, or None to read everything.
+    """
+
+    conditions = []
+    if start is not None:
+        conditions.append(ds.field("scrape_date") >= pa.scalar(pd.Timestamp(start).date(), pa.date32()))
+    if end is not None:
+        conditions.append(ds.field("scrape_date") <= pa.scalar(pd.Timestamp(end).date(), pa.date32()))
+    if product_codes is not None:
+        conditions.append(ds.field("product_code").isin(pa.array([str(code) for code in product_codes], pa.string())))
+    condition = None
+    for part in conditions:
+        condition = part if condition is None else condition & part
+    return condition
+
+def open_snapshots(root=SNAPSHOT_DIR):
+
+    """
+    Open the snapshot store as a dataset partitioned by scrape date.
+
+    Args:
+        root (str, optional): The folder of the store. Defaults to SNAPSHOT_DIR.
+
+    Returns:
+        pyarrow.dataset.Dataset: The dataset, with the columns of SNAPSHOT_SCHEMA plus "scrape_date".
+    """
+
+    return ds.dataset(root, format="parquet", schema=SNAPSHOT_SCHEMA.append(pa.field("scrape_date", pa.date32())), partitioning=PARTITIONING)
+
+def read_snapshots(root=SNAPSHOT_DIR, columns=None, product_codes=None, start=None, end=None):
+
+    """
+    Read products from the snapshot store. Only the requested columns are read, and the filters are applied while
+    reading: days outside [start, end] are not opened and row groups without the requested product codes are skipped.
+
+    Args:
+        root (str, optional): The folder of the store. Defaults to SNAPSHOT_DIR.
+        columns (list, optional): The columns to read (see SNAPSHOT_SCHEMA, plus "scrape_date"). Defaults to None (all of them).
+        product_codes (list, optional): Only read these product codes. Defaults to None.
+        start (str or datetime.date, optional): First scrape date to read. Defaults to None.
+        end (str or datetime.date, optional): Last scrape date to read. Defaults to None.
+
+    Returns:
+        pandas.DataFrame: The products, with categoricals for the text columns (product code included) and float32 prices.
+    """
+
+    if not os.path.isdir(root):
+        return pd.DataFrame(columns=columns)
+
+    # The filter is pushed down to the reader
+    table = open_snapshots(root).to_table(columns=columns, filter=snapshot_filter(product_codes, start, end))
+
+    # Product codes as a categorical, like the other text columns
+    if "product_code" in table.column_names:
+        position = table.column_names.index("product_code")
+        table = table.set_column(position, "product_code", table.column("product_code").dictionary_encode())
+    return table.to_pandas(date_as_object=False)
@@ -0,0 +1,172 @@
+# Import libraries
+import asyncio
+import random
+import threading
+import time
+
+
+
+# Classes
+
+class AdaptiveRateLimiter:
+
+    """
+    Request rate controller shared by every worker of a crawl.
+
+    Requests take tokens from a token bucket that refills at the current rate. The rate follows AIMD (additive increase,
+    multiplicative decrease): every successful request raises it a little, up to max_rate, and every throttling signal (the
+    "Entendido" too-many-requests dialog, an HTTP 429 or a timeout) cuts it sharply, down to min_rate, and pauses every
+    request for a backoff that doubles with each consecutive failure. The crawl then settles around the highest rate the
+    website accepts, instead of sleeping for fixed conservative amounts of time.
+
+    Args:
+        initial_rate (float): The starting rate, in requests per second.
+        min_rate (float): The lowest rate allowed, in requests per second.
+        max_rate (float): The highest rate allowed, in requests per second.
+        increase (float, optional): The rate added after every successful request, in requests per second. Defaults to 0.005.
+        decrease (float, optional): The factor applied to the rate after a throttling signal. Defaults to 0.5.
+        backoff_min (float, optional): The pause after the first failure in a row, in seconds. Defaults to 180.
+        backoff_max (float, optional): The longest pause after consecutive failures, in seconds. Defaults to 300.
+        jitter (float, optional): The maximum random time added to every pause, in seconds. Defaults to 30.
+        burst (int, optional): The number of requests that can be made at once after being idle. Defaults to 1.
+    """
+
+    def __init__(self, initial_rate, min_rate, max_rate, increase=0.005, decrease=0.5, backoff_min=180, backoff_max=300, jitter=30, burst=1):
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.decrease = decrease
+        self.backoff_min = backoff_min
+        self.backoff_max = backoff_max
+        self.jitter = jitter
+        self.burst = burst
+
+        self._rate = min(max(initial_rate, min_rate), max_rate)
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._blocked_until = 0
+        self._consecutive_failures = 0
+        self._counts = {"requests": 0, "successes": 0, "throttles": 0, "errors": 0}
+        self._lock = threading.Lock()
+
+    @property
+    def rate(self):
+
+        """
+        float: The current rate, in requests per second.
+        """
+
+        return self._rate
+
+    def reserve(self):
+
+        """
+        Take a token for a request without waiting.
+
+        Returns:
+            float: The time the caller must wait before making the request, in seconds.
+        """
+
+        with self._lock:
+            now = time.monotonic()
+
+            # Nothing can start before the current backoff pause ends
+            start = max(now, self._blocked_until)
+
+            # Refill the bucket up to the start time and take a token, going into debt if there are none left
+            self._tokens = min(self.burst, self._tokens + max(0, start - self._updated) * self._rate)
+            self._updated = max(self._updated, start)
+            self._tokens -= 1
+            self._counts["requests"] += 1
+
+            # A debt is paid back at the current rate
+            wait = start - now
+            if self._tokens < 0:
+                wait += -self._tokens / self._rate
+            return wait
+
+    def acquire(self):
+
+        """
+        Block until a request can be made.
+
+        Returns:
+            float: The time waited, in seconds.
+        """
+
+        wait = self.reserve()
+        time.sleep(wait)
+        return wait
+
+    async def acquire_async(self):
+
+        """
+        Wait without blocking the event loop until a request can be made.
+
+        Returns:
+            float: The time waited, in seconds.
+        """
+
+        wait = self.reserve()
+        await asyncio.sleep(wait)
+        return wait
+
+    def on_success(self, requests=1):
+
+        """
+        Report successful requests: the rate increases additively.
+
+        Args:
+            requests (int, optional): The number of successful requests. Defaults to 1.
+        """
+
+        with self._lock:
+            self._consecutive_failures = 0
+            self._counts["successes"] += requests
+            self._rate = min(self.max_rate, self._rate + self.increase * requests)
+
+    def on_throttle(self):
+
+        """
+        Report that the website is throttling us (too-many-requests dialog, HTTP 429 or a timeout): the rate is cut multiplicatively and every request is paused.
+
+        Returns:
+            float: The pause imposed, in seconds.
+        """
+
+        with self._lock:
+            self._counts["throttles"] += 1
+            self._rate = max(self.min_rate, self._rate * self.decrease)
+            self._tokens = min(self._tokens, 0)
+            return self._pause()
+
+    def on_error(self):
+
+        """
+        Report a failed request that is not a throttling signal: the rate is kept, but every request is paused.
+
+        Returns:
+            float: The pause imposed, in seconds.
+        """
+
+        with self._lock:
+            self._counts["errors"] += 1
+            return self._pause()
+
+    def _pause(self):
+
+        # Exponential backoff on consecutive failures, capped, plus some jitter. Must be called holding the lock.
+        self._consecutive_failures += 1
+        pause = min(self.backoff_min * 2 ** (self._consecutive_failures - 1), self.backoff_max) + random.uniform(0, self.jitter)
+        self._blocked_until = max(self._blocked_until, time.monotonic() + pause)
+        return pause
+
+    def stats(self):
+
+        """
+        Returns:
+            dict: The current "rate" (requests per second) and the number of "requests", "successes", "throttles" and "errors" so far.
+        """
+
+        with self._lock:
+            return {"rate": self._rate, **self._counts}
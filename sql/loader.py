@@ -0,0 +1,411 @@
+# Import libraries
+import pandas as pd
+import sqlalchemy as alch
+from sqlalchemy.dialects import mysql, sqlite
+
+# Number of rows sent in every multi-row INSERT
+CHUNK_SIZE = 500
+
+# Typed schema of the "mercadona" database
+metadata = alch.MetaData()
+
+scraping = alch.Table(
+    'scraping', metadata,
+    alch.Column('product_code', alch.Numeric(12, 2, asdecimal=False), primary_key=True, autoincrement=False),
+    alch.Column('collected_timestamp', alch.DateTime, primary_key=True),
+    alch.Column('product', alch.String(255), nullable=False),
+    alch.Column('product_type', alch.String(64)),
+    alch.Column('product_volume', alch.String(64)),
+    alch.Column('product_price_per_unit', alch.String(64)),
+    alch.Column('product_price', alch.Numeric(8, 2, asdecimal=False)),
+    alch.Column('product_unit', alch.String(16)),
+    alch.Column('product_category', alch.String(128)),
+    alch.Column('product_subcategory', alch.String(128)),
+    alch.Column('product_url', alch.String(512)),
+    alch.Column('last_verified', alch.DateTime),
+    alch.Index('ix_scraping_collected_timestamp', 'collected_timestamp'),
+)
+
+order_history = alch.Table(
+    'order_history', metadata,
+    alch.Column('order_number', alch.BigInteger, primary_key=True, autoincrement=False),
+    alch.Column('line', alch.SmallInteger, primary_key=True, autoincrement=False),
+    alch.Column('product', alch.String(255), nullable=False),
+    alch.Column('units', alch.Integer, nullable=False),
+    alch.Column('price', alch.Numeric(8, 2, asdecimal=False), nullable=False),
+    alch.Column('fecha', alch.Date),
+    alch.Column('product_code', alch.Numeric(12, 2, asdecimal=False)),
+    alch.Column('price_per_unit', alch.Numeric(10, 4, asdecimal=False)),
+    alch.Column('match_confidence', alch.Float),
+    alch.Column('match_method', alch.String(16)),
+    alch.Index('ix_order_history_product_code', 'product_code'),
+    alch.Index('ix_order_history_fecha', 'fecha'),
+)
+
+# Price variation of every product in the orders, kept up to date by refresh_variations(). Keyed by product code and name, since order lines with different names can be assigned the same product code. Product codes have the type of the "scraping" ones in every table, so that variants (e.g. "3505.2") are not merged with their product
+price_variations = alch.Table(
+    'price_variations', metadata,
+    alch.Column('product_code', alch.Numeric(12, 2, asdecimal=False), primary_key=True, autoincrement=False),
+    alch.Column('product', alch.String(255), primary_key=True),
+    alch.Column('category', alch.String(128)),
+    alch.Column('subcategory', alch.String(128)),
+    alch.Column('min_price', alch.Numeric(10, 4, asdecimal=False)),
+    alch.Column('max_price', alch.Numeric(10, 4, asdecimal=False)),
+    alch.Column('first_price', alch.Numeric(10, 4, asdecimal=False)),
+    alch.Column('last_price', alch.Numeric(10, 4, asdecimal=False)),
+    alch.Column('orders', alch.Integer, nullable=False),
+    alch.Column('first_date', alch.Date),
+    alch.Column('last_date', alch.Date),
+    alch.Column('last_changed', alch.Date),
+    alch.Column('variation', alch.Float),
+    alch.Column('updated_at', alch.DateTime, nullable=False),
+    alch.Index('ix_price_variations_variation', 'variation'),
+)
+
+# Products left out of the price variations (e.g. fresh products sold by weight, whose price per unit depends on the piece)
+variation_exclusions = alch.Table(
+    'variation_exclusions', metadata,
+    alch.Column('product_code', alch.Numeric(12, 2, asdecimal=False), primary_key=True, autoincrement=False),
+    alch.Column('reason', alch.String(255)),
+)
+
+# Columns of the exported variations (outputs/variations.csv), with the names the dashboards read
+EXPORT_COLUMNS = {"product": "product", "product_code": "product_code", "category": "category", "subcategory": "subcategory", "min_price": "min", "max_price": "max", "variation": "var"}
+
+
+
+# Functions
+
+def create_schema(engine):
+
+    """
+    Create the "scraping", "order_history", "price_variations" and "variation_exclusions" tables with their primary keys and indexes, if they do not exist yet.
+
+    Args:
+        engine (sqlalchemy.engine.Engine): The database connection (e.g. MySQL, or SQLite to test locally).
+    """
+
+    # The price variations are computed from the other tables, so a "price_variations" table created with an older primary key or with integer product codes is dropped and rebuilt
+    inspector = alch.inspect(engine)
+    rebuild = inspector.has_table('price_variations') and (
+        inspector.get_pk_constraint('price_variations')["constrained_columns"] != [column.name for column in price_variations.primary_key.columns]
+        or _integer_product_codes(inspector, price_variations)
+    )
+    if rebuild:
+        price_variations.drop(engine)
+
+    # Older schemas truncated the variant codes of the order history and the exclusions to integers. MySQL columns are widened to the type of the "scraping" codes (SQLite does not enforce column types)
+    if engine.dialect.name == "mysql":
+        with engine.begin() as connection:
+            for table in [order_history, variation_exclusions]:
+                if inspector.has_table(table.name) and _integer_product_codes(inspector, table):
+                    connection.execute(alch.text(f"ALTER TABLE {table.name} MODIFY product_code DECIMAL(12, 2){' NOT NULL' if table.c.product_code.primary_key else ''}"))
+
+    metadata.create_all(engine)
+    if rebuild:
+        refresh_variations(engine)
+
+def _integer_product_codes(inspector, table):
+
+    # Whether the product_code column of an existing table was created as an integer
+    return any(column["name"] == "product_code" and isinstance(column["type"], alch.Integer) for column in inspector.get_columns(table.name))
+
+def prepare_scraping(products):
+
+    """
+    Clean scraped products and convert them to the types of the "scraping" table. Product codes are numbers with decimals, since some products have variants (e.g. "3505.2"). Products without a product code can not be keyed and are left out.
+
+    Args:
+        products (pandas.DataFrame or str): The products, or the path of a scraping output (CSV file separated by "~").
+
+    Returns:
+        pandas.DataFrame: The rows to load, with the columns of the "scraping" table.
+    """
+
+    if isinstance(products, str):
+        products = pd.read_csv(products, sep='~')
+    products = products.copy()
+
+    # Same cleaning as the older outputs needed (" >" after the category, "|" before the price per unit and "/ud." units)
+    for column in ["product", "product_type", "product_volume", "product_price_per_unit", "product_unit", "product_category", "product_subcategory", "product_url"]:
+        products[column] = products[column].astype(str)
+    products["product_category"] = products["product_category"].str.replace(" >", "", regex=False)
+    products["product_price_per_unit"] = products["product_price_per_unit"].str.replace("|", "", regex=False).str.strip()
+    products["product_unit"] = products["product_unit"].str.replace("/", "", regex=False).str.replace(".", "", regex=False)
+
+    # Typed columns
+    products["product_code"] = pd.to_numeric(products["product_code"], errors="coerce")
+    products["product_price"] = pd.to_numeric(products["product_price"], errors="coerce")
+    products["collected_timestamp"] = pd.to_datetime(products["collected_timestamp"])
+    products["last_verified"] = pd.to_datetime(products["last_verified"]) if "last_verified" in products.columns else pd.NaT
+
+    products = products[products["product_code"].notna()]
+    return products[[column.name for column in scraping.columns]]
+
+def prepare_order_history(orders):
+
+    """
+    Convert an order history to the types of the "order_history" table. Every row gets its position in its order as "line", since an order can have the same product twice (e.g. weighed products).
+
+    Args:
+        orders (pandas.DataFrame or str): The order history (see assign_product_codes()), or the path of its CSV file (separated by "~").
+
+    Returns:
+        pandas.DataFrame: The rows to load, with the columns of the "order_history" table.
+    """
+
+    if isinstance(orders, str):
+        orders = pd.read_csv(orders, sep='~', index_col=0)
+    orders = orders.copy()
+
+    orders["product"] = orders["product"].astype(str)
+    orders["order_number"] = pd.to_numeric(orders["order_number"].astype(str)).astype("int64")
+    orders["fecha"] = pd.to_datetime(orders["fecha"]).dt.date
+    orders["product_code"] = pd.to_numeric(orders["product_code"], errors="coerce").round(2)
+    orders["line"] = orders.groupby("order_number").cumcount()
+    for column in ["match_confidence", "match_method"]:
+        if column not in orders.columns:
+            orders[column] = None
+
+    return orders[[column.name for column in order_history.columns]]
+
+def _records(df):
+
+    # Rows as dictionaries with plain Python values (None for missing values), as the database drivers expect them
+    df = df.astype(object).where(df.notna(), None)
+    return df.to_dict('records')
+
+def upsert(engine, table, rows, chunk_size=CHUNK_SIZE):
+
+    """
+    Insert rows in chunks of multi-row INSERT statements, updating the rows whose primary key already exists.
+    Uses "ON DUPLICATE KEY UPDATE" on MySQL and "ON CONFLICT DO UPDATE" on SQLite. On other databases, rows whose key already exists are skipped.
+
+    Args:
+        engine (sqlalchemy.engine.Engine): The database connection.
+        table (sqlalchemy.Table): The table (scraping or order_history).
+        rows (pandas.DataFrame): The rows, with the columns of the table.
+        chunk_size (int, optional): The number of rows per statement. Defaults to CHUNK_SIZE.
+
+    Returns:
+        int: The number of rows sent.
+    """
+
+    records = _records(rows)
+    keys = [column.name for column in table.primary_key.columns]
+    updates = [column.name for column in table.columns if column.name not in keys]
+
+    with engine.begin() as connection:
+
+        # Keys already in the table, only needed when the database has no upsert
+        existing = None
+        if engine.dialect.name not in ("mysql", "sqlite"):
+            existing = set(connection.execute(alch.select(*[table.c[key] for key in keys])).fetchall())
+
+        for start in range(0, len(records), chunk_size):
+            chunk = records[start:start + chunk_size]
+            if engine.dialect.name == "mysql":
+                statement = mysql.insert(table).values(chunk)
+                statement = statement.on_duplicate_key_update({column: statement.inserted[column] for column in updates})
+            elif engine.dialect.name == "sqlite":
+                statement = sqlite.insert(table).values(chunk)
+                statement = statement.on_conflict_do_update(index_elements=keys, set_={column: statement.excluded[column] for column in updates})
+            else:
+                chunk = [record for record in chunk if tuple(record[key] for key in keys) not in existing]
+                if not chunk:
+                    continue
+                statement = table.insert().values(chunk)
+            connection.execute(statement)
+
+    return len(records)
+
+def load_scraping(engine, products, only_new=True, chunk_size=CHUNK_SIZE):
+
+    """
+    Load a scraping output into the "scraping" table, creating the schema if needed.
+    With only_new, rows collected before the latest collected_timestamp already loaded are skipped, so a daily load only sends that day's snapshot.
+    The price variations of the ordered products in the snapshot are refreshed (see refresh_variations()).
+
+    Args:
+        engine (sqlalchemy.engine.Engine): The database connection.
+        products (pandas.DataFrame or str): The products, or the path of a scraping output.
+        only_new (bool, optional): Skip the rows older than the ones already loaded. Defaults to True.
+        chunk_size (int, optional): The number of rows per statement. Defaults to CHUNK_SIZE.
+
+    Returns:
+        int: The number of rows loaded.
+    """
+
+    create_schema(engine)
+    rows = prepare_scraping(products)
+
+    if only_new:
+        with engine.connect() as connection:
+            latest = connection.execute(alch.select(alch.func.max(scraping.c.collected_timestamp))).scalar()
+        if latest is not None:
+            rows = rows[rows["collected_timestamp"] > pd.Timestamp(latest)]
+
+    loaded = upsert(engine, scraping, rows, chunk_size=chunk_size)
+
+    # The category of the ordered products comes from the latest snapshot
+    refresh_variations(engine, rows["product_code"].unique().tolist(), chunk_size=chunk_size)
+    return loaded
+
+def load_order_history(engine, orders, only_new=True, chunk_size=CHUNK_SIZE):
+
+    """
+    Load an order history into the "order_history" table, creating the schema if needed.
+    With only_new, the orders already loaded are skipped, so only the orders fetched since the last load are sent.
+    The price variations of the products in the loaded orders are refreshed (see refresh_variations()).
+
+    Args:
+        engine (sqlalchemy.engine.Engine): The database connection.
+        orders (pandas.DataFrame or str): The order history, or the path of its CSV file.
+        only_new (bool, optional): Skip the orders already loaded. Defaults to True.
+        chunk_size (int, optional): The number of rows per statement. Defaults to CHUNK_SIZE.
+
+    Returns:
+        int: The number of rows loaded.
+    """
+
+    create_schema(engine)
+    rows = prepare_order_history(orders)
+
+    if only_new:
+        with engine.connect() as connection:
+            loaded = {row[0] for row in connection.execute(alch.select(order_history.c.order_number).distinct())}
+        rows = rows[~rows["order_number"].isin(loaded)]
+
+    loaded = upsert(engine, order_history, rows, chunk_size=chunk_size)
+
+    # Only the products in the new orders can have a different price variation
+    refresh_variations(engine, rows["product_code"].dropna().unique().tolist(), chunk_size=chunk_size)
+    return loaded
+
+def _select_in(connection, statement, column, values, chunk_size=CHUNK_SIZE):
+
+    # Run a SELECT for chunks of values (databases limit the number of parameters of a statement) and return a single DataFrame
+    frames = [pd.DataFrame(connection.execute(statement.where(column.in_(values[start:start + chunk_size]))).mappings().all()) for start in range(0, len(values), chunk_size)]
+    frames = [frame for frame in frames if not frame.empty]
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+def compute_variations(orders, products=None):
+
+    """
+    Compute the price variation of every product of an order history. Products are told apart by product code and name, like the variations were computed before the "price_variations" table, so that order lines with different names assigned the same product code (e.g. two sizes of a product) are not compared with each other.
+
+    Args:
+        orders (pandas.DataFrame): Order rows with the "order_number", "line", "product", "fecha", "product_code" and "price_per_unit" columns.
+        products (pandas.DataFrame, optional): Scraped products with the "product_code", "product_category", "product_subcategory" and "collected_timestamp" columns. The latest category of every product is used. Defaults to None.
+
+    Returns:
+        pandas.DataFrame: A row per product code and name, with the columns of the "price_variations" table. "last_changed" is the first date of the last price paid, or missing if it never changed.
+    """
+
+    orders = orders[orders["product_code"].notna()].sort_values(["fecha", "order_number", "line"])
+    orders = orders.assign(price_per_unit=orders["price_per_unit"].astype(float))
+    grouped = orders.groupby(["product_code", "product"])
+
+    # A price change is a row whose price per unit differs from the previous row of the same product
+    changed = grouped["price_per_unit"].diff().fillna(0).abs() > 0.001
+    last_changed = orders[changed].groupby(["product_code", "product"])["fecha"].last()
+
+    variations = grouped.agg(
+        min_price=("price_per_unit", "min"), max_price=("price_per_unit", "max"),
+        first_price=("price_per_unit", "first"), last_price=("price_per_unit", "last"), orders=("order_number", "nunique"),
+        first_date=("fecha", "first"), last_date=("fecha", "last"),
+    )
+    variations["last_changed"] = last_changed
+    variations["variation"] = ((variations["max_price"] - variations["min_price"]) / variations["min_price"] * 100).round(2)
+
+    # Category and subcategory of the latest snapshot of every product
+    variations["category"] = None
+    variations["subcategory"] = None
+    if products is not None and not products.empty:
+        latest = products.sort_values("collected_timestamp").drop_duplicates("product_code", keep="last").set_index("product_code")
+        codes = variations.index.get_level_values("product_code")
+        variations["category"] = latest["product_category"].reindex(codes).to_numpy()
+        variations["subcategory"] = latest["product_subcategory"].reindex(codes).to_numpy()
+
+    variations["updated_at"] = pd.Timestamp.now().floor('s')
+    return variations.reset_index()[[column.name for column in price_variations.columns]]
+
+def refresh_variations(engine, product_codes=None, chunk_size=CHUNK_SIZE):
+
+    """
+    Recompute the "price_variations" rows of some products from their orders and their latest snapshot. Only the rows of those products are read (through the product_code indexes) and written.
+
+    Args:
+        engine (sqlalchemy.engine.Engine): The database connection.
+        product_codes (list, optional): The product codes to refresh. Defaults to None (every product in the orders, to build the table the first time).
+        chunk_size (int, optional): The number of product codes per query and rows per statement. Defaults to CHUNK_SIZE.
+
+    Returns:
+        int: The number of products refreshed.
+    """
+
+    create_schema(engine)
+    with engine.connect() as connection:
+        if product_codes is None:
+            product_codes = [row[0] for row in connection.execute(alch.select(order_history.c.product_code).where(order_history.c.product_code.isnot(None)).distinct())]
+        product_codes = [round(float(code), 2) for code in product_codes]
+        orders = _select_in(connection, alch.select(order_history), order_history.c.product_code, product_codes, chunk_size)
+        if orders.empty:
+            return 0
+        ordered_codes = orders["product_code"].dropna().astype(float).unique().tolist()
+        latest = alch.select(scraping.c.product_code, scraping.c.product_category, scraping.c.product_subcategory, scraping.c.collected_timestamp)
+        products = _select_in(connection, latest, scraping.c.product_code, ordered_codes, chunk_size)
+
+    return upsert(engine, price_variations, compute_variations(orders, products), chunk_size=chunk_size)
+
+def export_variations(variations, path):
+
+    """
+    Export price variations to a CSV file (separated by "~") with the columns the dashboards read: product, product_code, category, subcategory, min, max and var.
+
+    Args:
+        variations (pandas.DataFrame): The variations returned by read_variations().
+        path (str): The path of the CSV file.
+    """
+
+    # Product codes as the website shows them (e.g. "35615" or "3505.2")
+    variations = variations.assign(product_code=variations["product_code"].map(lambda code: f"{code:.2f}".rstrip("0").rstrip(".")))
+    variations[list(EXPORT_COLUMNS)].rename(columns=EXPORT_COLUMNS).to_csv(path, sep="~")
+
+def exclude_products(engine, product_codes, reason=None):
+
+    """
+    Leave products out of read_variations() (the "variation_exclusions" table). The price variations are still maintained, so they can be included again at any time.
+
+    Args:
+        engine (sqlalchemy.engine.Engine): The database connection.
+        product_codes (list): The product codes to exclude.
+        reason (str, optional): Why they are excluded. Defaults to None.
+    """
+
+    create_schema(engine)
+    upsert(engine, variation_exclusions, pd.DataFrame({"product_code": [round(float(code), 2) for code in product_codes], "reason": reason}))
+
+def read_variations(engine, min_variation=0):
+
+    """
+    Read the precomputed price variations, without the excluded products and the products that are not in any snapshot, highest variation first.
+
+    Args:
+        engine (sqlalchemy.engine.Engine): The database connection.
+        min_variation (float, optional): Only products whose variation (in percent) is higher than this. Defaults to 0.
+
+    Returns:
+        pandas.DataFrame: The "price_variations" rows.
+    """
+
+    excluded = alch.select(variation_exclusions.c.product_code)
+    statement = (
+        alch.select(price_variations)
+        .where(price_variations.c.variation > min_variation)
+        .where(price_variations.c.category.isnot(None))
+        .where(price_variations.c.product_code.not_in(excluded))
+        .order_by(price_variations.c.variation.desc())
+    )
+    with engine.connect() as connection:
+        return pd.DataFrame(connection.execute(statement).mappings().all(), columns=[column.name for column in price_variations.columns])